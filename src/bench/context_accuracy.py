@@ -0,0 +1,115 @@
+import os
+import json
+import argparse
+from typing import Dict, Any
+from src.extractors.text_extractor import extract_full_text
+from src.utils.context import select_context, estimate_tokens
+from src.utils.text import decompose
+
+TEST_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "test")
+
+
+def normalize(value: Any) -> str:
+    """Normalize a value for comparison (case, accents and spacing)."""
+    return " ".join(decompose(str(value)))
+
+
+def value_in_context(value: Any, context: str) -> bool:
+    """Check that every token of a reference value is present in the context."""
+    context_tokens = set(decompose(context.replace(",", " ")))
+    return all(token in context_tokens for token in decompose(str(value).replace(",", " ")))
+
+
+def load_reference(path: str) -> Dict[str, Dict[str, Any]]:
+    """Load the reference extracted data of each PDF from a results file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return {result["pdf_path"]: result["extracted_data"] for result in json.load(f)}
+
+
+def run(test_dir: str, reference_path: str, budget: int, use_llm: bool) -> None:
+    """
+    Compare trimmed context with full-text mode on a dataset.
+
+    The offline metric is the recall of the reference values: the share of
+    non-null reference values whose tokens are all still present in the
+    context sent to the LLM. With use_llm, both contexts are also sent to the
+    LLM and the exact-match accuracy against the reference is reported.
+
+    Args:
+        test_dir (str): Directory containing dataset.json and files/
+        reference_path (str): Results file with the expected values
+        budget (int): Token budget for the trimmed context
+        use_llm (bool): Also query the LLM in both modes (uses the API)
+    """
+    with open(os.path.join(test_dir, "dataset.json"), 'r', encoding='utf-8') as f:
+        dataset = json.load(f)
+    reference = load_reference(reference_path)
+
+    query_llm = None
+    if use_llm:
+        from src.extractors.llm_extractor import query_llm_fallback
+        query_llm = query_llm_fallback
+
+    totals = {"full_tokens": 0, "trimmed_tokens": 0, "values": 0, "full_recall": 0, "trimmed_recall": 0,
+              "full_correct": 0, "trimmed_correct": 0}
+
+    print(f"{'arquivo':<22}{'tokens (full)':>14}{'tokens (trim)':>14}{'recall (full)':>15}{'recall (trim)':>15}")
+    for item in dataset:
+        pdf_path = item["pdf_path"]
+        schema = item["extraction_schema"]
+        expected = reference.get(pdf_path, {})
+        full_text = extract_full_text(os.path.join(test_dir, "files", pdf_path))
+        trimmed = select_context(full_text, schema, budget)
+
+        values = {name: value for name, value in expected.items() if value is not None and name in schema}
+        full_recall = sum(value_in_context(value, full_text) for value in values.values())
+        trimmed_recall = sum(value_in_context(value, trimmed) for value in values.values())
+
+        totals["full_tokens"] += estimate_tokens(full_text)
+        totals["trimmed_tokens"] += estimate_tokens(trimmed)
+        totals["values"] += len(values)
+        totals["full_recall"] += full_recall
+        totals["trimmed_recall"] += trimmed_recall
+        print(f"{pdf_path:<22}{estimate_tokens(full_text):>14}{estimate_tokens(trimmed):>14}"
+              f"{full_recall:>11}/{len(values):<3}{trimmed_recall:>11}/{len(values):<3}")
+
+        if query_llm is not None:
+            for mode, context_budget in (("full", 0), ("trimmed", budget)):
+                answer = query_llm(schema, full_text, use_cache=False, context_budget=context_budget)
+                totals[f"{mode}_correct"] += _count_correct(answer, expected, schema)
+
+    print("-" * 80)
+    reduction = 1 - totals["trimmed_tokens"] / max(1, totals["full_tokens"])
+    print(f"Tokens de contexto: {totals['full_tokens']} -> {totals['trimmed_tokens']} (-{reduction:.0%})")
+    print(f"Recall dos valores de referência: full {_ratio(totals['full_recall'], totals['values'])}, "
+          f"trimmed {_ratio(totals['trimmed_recall'], totals['values'])}")
+    if query_llm is not None:
+        fields = sum(len(item["extraction_schema"]) for item in dataset)
+        print(f"Acurácia da LLM (campos corretos): full {_ratio(totals['full_correct'], fields)}, "
+              f"trimmed {_ratio(totals['trimmed_correct'], fields)}")
+
+
+def _count_correct(answer: Dict[str, Any], expected: Dict[str, Any], schema: Dict[str, Any]) -> int:
+    """Count the fields of an answer equal to the reference (after normalization)."""
+    correct = 0
+    for field_name in schema:
+        value, reference_value = answer.get(field_name), expected.get(field_name)
+        if (value is None and reference_value is None) or (
+                value is not None and reference_value is not None and normalize(value) == normalize(reference_value)):
+            correct += 1
+    return correct
+
+
+def _ratio(part: int, total: int) -> str:
+    return f"{part}/{total} ({part / max(1, total):.0%})"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara o contexto reduzido por relevância com o texto completo.")
+    parser.add_argument("--dir", type=str, help="Diretório com dataset.json e files/.", default=TEST_DIR)
+    parser.add_argument("--reference", type=str, help="Resultados de referência.",
+                        default=os.path.join(TEST_DIR, "resultados.json"))
+    parser.add_argument("--budget", type=int, help="Orçamento de tokens do contexto reduzido.", default=40)
+    parser.add_argument("--llm", action="store_true", help="Também consulta a LLM nos dois modos (usa a API).")
+    args = parser.parse_args()
+    run(args.dir, args.reference, args.budget, args.llm)
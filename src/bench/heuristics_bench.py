@@ -0,0 +1,75 @@
+import os
+import glob
+import time
+import argparse
+from typing import Dict, List, Callable
+from src.extractors.text_extractor import extract_full_text
+from src.utils.regex_library import REGEX_LIBRARY, is_valid_value
+from src.utils.token_index import build_token_index
+
+FILES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "test", "files")
+
+
+def legacy_matches(full_text: str, rule_names: List[str]) -> Dict[str, List[str]]:
+    """Previous heuristic loop: re-split the text and fullmatch every word for each field."""
+    results = {}
+    for rule_name in rule_names:
+        pattern = REGEX_LIBRARY[rule_name]
+        matches = []
+        for word in full_text.split():
+            # Same validation as the token index, so both return the same candidates
+            if pattern.fullmatch(word.strip()) and is_valid_value(rule_name, word.strip()):
+                matches.append(word.strip())
+        results[rule_name] = matches
+    return results
+
+
+def indexed_matches(full_text: str, rule_names: List[str]) -> Dict[str, List[str]]:
+    """Single-pass token index over the rules in use, then one dict lookup per field."""
+    index = build_token_index(full_text, {name: REGEX_LIBRARY[name] for name in set(rule_names)})
+    return {rule_name: [word for _, _, word in index.get(rule_name, [])] for rule_name in rule_names}
+
+
+def best_time(func: Callable, *args, repeat: int = 5, number: int = 200) -> float:
+    """Best average time (seconds) of a call over several repetitions."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(*args)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def run(files_dir: str, fields: int, replicate: int) -> None:
+    """
+    Compare the legacy heuristic loop with the token index on the PDFs of a directory.
+    
+    Args:
+        files_dir (str): Directory containing the PDF files
+        fields (int): Number of schema fields with a rule (cycles through REGEX_LIBRARY)
+        replicate (int): Number of times the text of each PDF is repeated, to simulate longer documents
+    """
+    library_rules = list(REGEX_LIBRARY)
+    rule_names = [library_rules[i % len(library_rules)] for i in range(fields)]
+
+    print(f"{'arquivo':<22}{'tokens':>8}{'legacy (ms)':>14}{'index (ms)':>14}{'speedup':>10}")
+    for pdf_path in sorted(glob.glob(os.path.join(files_dir, "*.pdf"))):
+        full_text = "\n".join([extract_full_text(pdf_path)] * replicate)
+
+        # Both approaches must find exactly the same candidates
+        assert legacy_matches(full_text, rule_names) == indexed_matches(full_text, rule_names)
+
+        legacy = best_time(legacy_matches, full_text, rule_names)
+        indexed = best_time(indexed_matches, full_text, rule_names)
+        print(f"{os.path.basename(pdf_path):<22}{len(full_text.split()):>8}"
+              f"{legacy * 1000:>14.3f}{indexed * 1000:>14.3f}{legacy / indexed:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark das heurísticas: loop por campo vs. índice de tokens.")
+    parser.add_argument("--files", type=str, help="Diretório com os PDFs.", default=FILES_DIR)
+    parser.add_argument("--fields", type=int, help="Número de campos com regra no schema.", default=len(REGEX_LIBRARY))
+    parser.add_argument("--replicate", type=int, help="Repete o texto de cada PDF N vezes.", default=1)
+    args = parser.parse_args()
+    run(args.files, args.fields, args.replicate)
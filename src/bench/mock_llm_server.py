@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, Tuple, List, Optional
+
+SCHEMA_MARKER = "Schema (campo: descrição):"
+TEXT_MARKER = "Texto:"
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the OpenAI chat completions API.
+
+    Point the pipeline at it with OPENAI_BASE_URL=http://host:port/v1. Every
+    field of the schema found in the prompt is answered with null, unless
+    canned answers are given: each is (document text, extracted data), and
+    the prompt is answered with the data of the document sharing the most
+    lines with it. Latency and failures (HTTP 429/5xx, optionally with a
+    Retry-After header) can be injected to exercise the client's concurrency
+    limit, rate limiter and retries.
+    Streamed requests are answered with server-sent events, the content split
+    in chunks of stream_chunk characters sent stream_delay seconds apart.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], latency: float = 0.0, fail_first: int = 0,
+                 fail_status: int = 429, fail_rate: float = 0.0, retry_after: Optional[float] = None,
+                 answers: Optional[List[Tuple[str, Dict[str, Any]]]] = None,
+                 stream_chunk: int = 16, stream_delay: float = 0.0):
+        super().__init__(address, MockLLMHandler)
+        self.latency = latency
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.fail_rate = fail_rate
+        self.retry_after = retry_after
+        self.answers = [(_lines(text), data) for text, data in answers or []]
+        self.stream_chunk = max(1, stream_chunk)
+        self.stream_delay = stream_delay
+        self.stats = {"requests": 0, "failures": 0, "in_flight": 0, "max_in_flight": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def answer(self, fields: Dict[str, Any], text: str) -> Dict[str, Any]:
+        """Build the JSON answer for a prompt (null for fields without a canned answer)."""
+        data = {}
+        prompt_lines = _lines(text)
+        best = 0
+        for document_lines, document_data in self.answers:
+            shared = len(prompt_lines & document_lines)
+            if shared > best:
+                best, data = shared, document_data
+        return {field_name: data.get(field_name) for field_name in fields}
+
+    def _begin(self) -> bool:
+        """Register a request; return True if it must fail."""
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+            fail = self.stats["requests"] <= self.fail_first or random.random() < self.fail_rate
+            if fail:
+                self.stats["failures"] += 1
+            return fail
+
+    def _end(self) -> None:
+        with self._lock:
+            self.stats["in_flight"] -= 1
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        fail = self.server._begin()
+        try:
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            if fail:
+                headers = {} if self.server.retry_after is None else {"Retry-After": str(self.server.retry_after)}
+                self._send_json(self.server.fail_status, {"error": {"message": "mock failure", "type": "mock"}},
+                                headers)
+                return
+
+            prompt = body["messages"][-1]["content"]
+            fields, text = parse_prompt(prompt)
+            content = json.dumps(self.server.answer(fields, text), ensure_ascii=False)
+            usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                     "total_tokens": (len(prompt) + len(content)) // 4}
+            if body.get("stream"):
+                self._send_stream(body.get("model"), content, usage)
+                return
+            self._send_json(200, {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            })
+        finally:
+            self.server._end()
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, model: str, content: str, usage: Dict[str, Any]) -> None:
+        """Send the content as chat.completion.chunk events, then the usage and [DONE]."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        chunk_size = self.server.stream_chunk
+        pieces = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+        for index, piece in enumerate(pieces):
+            if index and self.server.stream_delay:
+                time.sleep(self.server.stream_delay)
+            last = index == len(pieces) - 1
+            self._send_event({"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                              "model": model, "choices": [{"index": 0, "delta": {"content": piece},
+                                                           "finish_reason": "stop" if last else None}]})
+        self._send_event({"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                          "model": model, "choices": [], "usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_event(self, payload: Dict[str, Any]) -> None:
+        self.wfile.write(b"data: " + json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        # Keep the benchmark output clean
+        pass
+
+
+def parse_prompt(prompt: str) -> Tuple[Dict[str, Any], str]:
+    """
+    Recover the field schema and the document text from a query_llm_fallback prompt.
+
+    Args:
+        prompt (str): Prompt sent to the LLM
+
+    Returns:
+        Tuple[Dict[str, Any], str]: Field schema and document text
+    """
+    schema_start = prompt.find(SCHEMA_MARKER)
+    text_start = prompt.find(TEXT_MARKER, schema_start)
+    if schema_start < 0 or text_start < 0:
+        return {}, prompt
+    try:
+        fields = json.loads(prompt[schema_start + len(SCHEMA_MARKER):text_start])
+    except json.JSONDecodeError:
+        fields = {}
+    return fields, prompt[text_start + len(TEXT_MARKER):]
+
+
+def _lines(text: str) -> set:
+    """Non-empty lines of a text, stripped."""
+    return {line.strip() for line in text.splitlines() if line.strip()}
+
+
+def load_answers(dataset_path: str, reference_path: str, files_dir: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Build canned answers from a dataset and a results file (e.g. test/resultados.json).
+
+    Args:
+        dataset_path (str): Dataset file ('dataset.json' or 'dataset.jsonl')
+        reference_path (str): Results file with the expected extracted data of each PDF
+        files_dir (str): Directory containing the PDF files
+
+    Returns:
+        List[Tuple[str, Dict[str, Any]]]: (document text, extracted data) of each PDF
+    """
+    from src.extractors.text_extractor import extract_full_text
+    from src.utils.dataset_io import iter_dataset
+
+    with open(reference_path, 'r', encoding='utf-8') as f:
+        reference = {result["pdf_path"]: result["extracted_data"] for result in json.load(f)}
+
+    answers = []
+    seen = set()
+    for item in iter_dataset(dataset_path):
+        pdf_path = item.get("pdf_path")
+        if pdf_path in seen or pdf_path not in reference:
+            continue
+        seen.add(pdf_path)
+        answers.append((extract_full_text(os.path.join(files_dir, pdf_path)), reference[pdf_path]))
+    return answers
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 0, server_class=MockLLMServer,
+                      **options) -> MockLLMServer:
+    """
+    Start a mock server in a background thread.
+
+    Args:
+        host (str): Interface to bind
+        port (int): Port to bind (0 picks a free port)
+        server_class: MockLLMServer or a subclass
+        **options: Server options (latency, fail_first, fail_status, fail_rate, retry_after, answers,
+            stream_chunk, stream_delay, ...)
+
+    Returns:
+        MockLLMServer: The running server (see base_url); call shutdown() to stop it
+    """
+    server = server_class((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local compatível com a API de chat da OpenAI, para testes sem custo.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, help="Latência de cada resposta, em segundos.", default=0.0)
+    parser.add_argument("--fail-first", type=int, help="Número de requisições iniciais que falham.", default=0)
+    parser.add_argument("--fail-status", type=int, help="Status HTTP das falhas (ex: 429, 500, 503).", default=429)
+    parser.add_argument("--fail-rate", type=float, help="Probabilidade de falha de cada requisição.", default=0.0)
+    parser.add_argument("--retry-after", type=float, help="Valor do cabeçalho Retry-After das falhas, em segundos.")
+    parser.add_argument("--stream-chunk", type=int, default=16,
+                        help="Caracteres por evento das respostas em streaming.")
+    parser.add_argument("--stream-delay", type=float, default=0.0,
+                        help="Intervalo entre os eventos das respostas em streaming, em segundos.")
+    parser.add_argument("--answers", type=str, metavar="DIR",
+                        help="Responde com os resultados de referência de um diretório de teste "
+                             "(dataset.json, resultados.json e files/).")
+    args = parser.parse_args()
+
+    answers = None
+    if args.answers:
+        from src.utils.dataset_io import find_dataset
+        answers = load_answers(find_dataset(args.answers), os.path.join(args.answers, "resultados.json"),
+                               os.path.join(args.answers, "files"))
+
+    server = MockLLMServer((args.host, args.port), latency=args.latency, fail_first=args.fail_first,
+                           fail_status=args.fail_status, fail_rate=args.fail_rate, retry_after=args.retry_after,
+                           answers=answers, stream_chunk=args.stream_chunk, stream_delay=args.stream_delay)
+    print(f"Mock LLM server running on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,163 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+from typing import Dict, Any, List
+from src.bench.mock_llm_server import start_mock_server, load_answers
+from src.utils.dataset_io import find_dataset, iter_dataset
+
+TEST_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "test")
+
+# Pipeline stages, in execution order (see process_item)
+STAGES = ("read", "cache", "text", "regex", "near_dup", "layout", "llm", "learn")
+SOURCES = ("regex", "near_dup", "layout", "llm", "cache", "pending", "unresolved")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a list of values (0 if empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), int(round(fraction * len(ordered) + 0.5))))
+    return ordered[rank - 1]
+
+
+def write_replicated_dataset(dataset_path: str, files_dir: str, replicate: int, work_dir: str) -> int:
+    """
+    Write a dataset repeating the items of another one, pointing at the same PDF files.
+
+    Args:
+        dataset_path (str): Original dataset file
+        files_dir (str): Directory containing the PDF files
+        replicate (int): Number of copies of the dataset
+        work_dir (str): Directory receiving dataset.jsonl and a link to the files
+
+    Returns:
+        int: Number of items written
+    """
+    items = list(iter_dataset(dataset_path))
+    os.symlink(os.path.abspath(files_dir), os.path.join(work_dir, "files"))
+    with open(os.path.join(work_dir, "dataset.jsonl"), 'w', encoding='utf-8') as f:
+        for _ in range(replicate):
+            for item in items:
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+    return len(items) * replicate
+
+
+def run(test_dir: str, reference_path: str, replicate: int, workers: int, latency: float,
+        use_caches: bool, verbose: bool) -> Dict[str, Any]:
+    """
+    Run the whole pipeline on a dataset against a local mock LLM server.
+
+    The run uses a scratch rule database, so every run starts from the same
+    (empty) state and the tracked template_cache.db is left untouched. The
+    mock server answers with the reference results, so rules and positions
+    are learned as they would be with the real LLM.
+
+    Args:
+        test_dir (str): Directory containing the dataset and files/
+        reference_path (str): Results file used as canned LLM answers
+        replicate (int): Number of copies of the dataset to process
+        workers (int): Number of documents processed concurrently
+        latency (float): Latency of each mock LLM response, in seconds
+        use_caches (bool): Enable the LLM, text and result caches
+        verbose (bool): Keep the pipeline logs
+
+    Returns:
+        Dict[str, Any]: Benchmark summary
+    """
+    dataset_path = find_dataset(test_dir)
+    if dataset_path is None:
+        raise FileNotFoundError(f"No dataset file found in '{test_dir}'")
+    files_dir = os.path.join(test_dir, "files")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        total = write_replicated_dataset(dataset_path, files_dir, replicate, work_dir)
+
+        # The configuration is read at import time, so the pipeline is imported
+        # only after pointing it at the scratch database and the mock server
+        os.environ["TEMPLATE_DB_PATH"] = os.path.join(work_dir, "bench.db")
+        server = start_mock_server(latency=latency, answers=load_answers(dataset_path, reference_path, files_dir))
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "mock")
+        from src.main import iter_dataset_results
+
+        results = []
+        logs = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+        start = time.perf_counter()
+        with logs:
+            for result in iter_dataset_results(work_dir, workers=workers, use_llm_cache=use_caches,
+                                               use_doc_cache=use_caches, use_result_cache=use_caches):
+                results.append(result)
+        elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    durations = [result["duration"] for result in results]
+    stages = {stage: sum(result["timings"].get(stage, 0.0) for result in results) for stage in STAGES}
+    sources = {source: sum(result["sources"].get(source, 0) for result in results) for source in SOURCES}
+    return {
+        "documents": len(results),
+        "failed": total - len(results),
+        "workers": workers,
+        "replicate": replicate,
+        "llm_latency": latency,
+        "caches": use_caches,
+        "elapsed": elapsed,
+        "docs_per_second": len(results) / elapsed if elapsed else 0.0,
+        "latency": {name: percentile(durations, fraction)
+                    for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))},
+        "stages": stages,
+        "sources": sources,
+        "llm_requests": server.stats["requests"],
+        "llm_max_in_flight": server.stats["max_in_flight"]
+    }
+
+
+def print_report(summary: Dict[str, Any]) -> None:
+    """Print a benchmark summary as tables."""
+    print(f"Documentos: {summary['documents']} ({summary['failed']} com erro), workers={summary['workers']}, "
+          f"replicate={summary['replicate']}, latência da LLM={summary['llm_latency']}s, "
+          f"caches={'sim' if summary['caches'] else 'não'}")
+    print(f"Tempo total: {summary['elapsed']:.2f}s ({summary['docs_per_second']:.2f} docs/s)")
+    latency = summary["latency"]
+    print(f"Latência por documento: p50 {latency['p50'] * 1000:.1f}ms, p95 {latency['p95'] * 1000:.1f}ms, "
+          f"p99 {latency['p99'] * 1000:.1f}ms")
+
+    print(f"\n{'etapa':<10}{'total (s)':>12}{'média (ms)':>12}{'% do tempo':>12}")
+    stage_total = sum(summary["stages"].values()) or 1
+    documents = max(1, summary["documents"])
+    for stage, seconds in summary["stages"].items():
+        print(f"{stage:<10}{seconds:>12.3f}{seconds * 1000 / documents:>12.2f}{seconds / stage_total:>12.0%}")
+
+    print(f"\n{'origem':<10}{'campos':>12}{'%':>12}")
+    field_total = sum(summary["sources"].values()) or 1
+    for source, count in summary["sources"].items():
+        print(f"{source:<10}{count:>12}{count / field_total:>12.0%}")
+    print(f"\nRequisições à LLM: {summary['llm_requests']} (máximo simultâneo: {summary['llm_max_in_flight']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o desempenho do pipeline completo contra um servidor local "
+                                                 "que simula a LLM (sem custo de API).")
+    parser.add_argument("--dir", type=str, help="Diretório com o dataset e files/.", default=TEST_DIR)
+    parser.add_argument("--reference", type=str, help="Resultados usados como respostas da LLM simulada.",
+                        default=os.path.join(TEST_DIR, "resultados.json"))
+    parser.add_argument("--replicate", type=int, help="Número de cópias do dataset processadas.", default=1)
+    parser.add_argument("--workers", type=int, help="Número de documentos processados em paralelo.", default=1)
+    parser.add_argument("--latency", type=float, help="Latência de cada resposta da LLM simulada, em segundos.",
+                        default=0.5)
+    parser.add_argument("--caches", action="store_true", help="Ativa os caches da LLM, de textos e de resultados.")
+    parser.add_argument("--json", type=str, help="Também salva o resumo em JSON (para comparar versões).")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os logs do pipeline.")
+    args = parser.parse_args()
+
+    summary = run(args.dir, args.reference, args.replicate, args.workers, args.latency, args.caches, args.verbose)
+    print_report(summary)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        print(f"Resumo salvo em: {args.json}")
+    sys.exit(1 if summary["failed"] else 0)
@@ -11,6 +11,10 @@ def clean_db():
         except Exception as e:
             print(f"[clean] Falha ao remover o DB '{DB_PATH}': {e}")
             return
+        # Arquivos auxiliares do modo WAL (ver init_db)
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(DB_PATH + suffix):
+                os.remove(DB_PATH + suffix)
     else:
         print(f"[clean] Nenhum banco de dados encontrado em: {DB_PATH}")
 
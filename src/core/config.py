@@ -11,3 +11,59 @@ def get_openai_api_key():
     if not api_key:
         raise ValueError("A variável de ambiente OPENAI_API_KEY não foi definida.")
     return api_key
+
+# Rule store: idle connections kept by the pool, and how long a connection waits for the write lock (seconds)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "30"))
+# Seconds the rule writer gathers learned rules before writing them in one transaction
+# (0 writes each document's rules before it is returned)
+RULE_WRITE_INTERVAL = float(os.getenv("RULE_WRITE_INTERVAL", "0"))
+
+# LLM response cache (stored next to the rule store in template_cache.db)
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_MAX_AGE_DAYS = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30"))
+
+# Content-addressed cache of extracted PDF text and final results (total size in bytes)
+DOC_CACHE_MAX_BYTES = int(os.getenv("DOC_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# LLM client: base URL (e.g. a local OpenAI-compatible stub), concurrency, rate limit, retries and timeout
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "0"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+# Stream LLM answers, publishing each field as soon as it is received, when progress events are consumed (0 disables)
+LLM_STREAM = os.getenv("LLM_STREAM", "1") != "0"
+
+# Token budget of the context sent to the LLM fallback (0 sends the full text)
+LLM_CONTEXT_TOKEN_BUDGET = int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", "2000"))
+
+# Near-duplicate documents: estimated text similarity (0..1) from which the values of a
+# previously extracted document of the same label are reused (0 disables), and documents kept in memory
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))
+NEAR_DUP_MAX_DOCS = int(os.getenv("NEAR_DUP_MAX_DOCS", "2000"))
+
+# Positional templates: allowed shift (fraction of the page size) and observations required before use
+LAYOUT_TOLERANCE = float(os.getenv("LAYOUT_TOLERANCE", "0.03"))
+LAYOUT_MIN_HITS = int(os.getenv("LAYOUT_MIN_HITS", "2"))
+
+# Synthesized patterns: distinct values of a field needed before a pattern is generalized
+# from them (a single value becomes a literal after as many documents), and values kept per field
+SYNTH_MIN_EXAMPLES = int(os.getenv("SYNTH_MIN_EXAMPLES", "2"))
+SYNTH_MAX_EXAMPLES = int(os.getenv("SYNTH_MAX_EXAMPLES", "20"))
+
+# Webapp jobs: concurrent jobs, jobs waiting for a worker, and how long finished jobs are kept (seconds)
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "2"))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "8"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+# Largest PDF accepted by the /extract endpoint (bytes, held in memory)
+EXTRACT_MAX_UPLOAD_BYTES = int(os.getenv("EXTRACT_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+
+# Per-document deadline (seconds): past it, documents are returned without waiting for the LLM (0 disables)
+DOCUMENT_DEADLINE_SECONDS = float(os.getenv("DOCUMENT_DEADLINE_SECONDS", "0"))
+
+# Profiling (--profile): directory receiving the reports, and latency (seconds) from which
+# the detailed trace of a document is saved (0 disables the slow document traces)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profile")
+PROFILE_SLOW_SECONDS = float(os.getenv("PROFILE_SLOW_SECONDS", "5"))
@@ -0,0 +1,173 @@
+import time
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from src.core.metrics import JOBS
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while every worker is busy and the queue is full."""
+
+
+class JobConflict(Exception):
+    """Raised when a job is submitted while another one with the same parameters is active."""
+
+
+class Job:
+    """
+    A background processing job and the progress events it produced.
+
+    The job can be passed as the progress_queue of process_dataset: events
+    are appended with put() and read incrementally with events_since(), which
+    blocks on a condition (instead of polling) until new events arrive.
+    """
+
+    def __init__(self, job_id: str, params: Dict[str, Any]):
+        self.id = job_id
+        self.params = params
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._events: List[Dict[str, Any]] = []
+        self._condition = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "error")
+
+    def put(self, event: Dict[str, Any]) -> None:
+        """Append a progress event (same interface as queue.Queue.put)."""
+        with self._condition:
+            self._events.append(event)
+            self._condition.notify_all()
+
+    def finish(self, error: Optional[str] = None) -> None:
+        """Mark the job as finished and wake up the waiting readers."""
+        with self._condition:
+            self.status = "error" if error else "done"
+            self.error = error
+            self.finished_at = time.time()
+            self._condition.notify_all()
+
+    def events_since(self, since: int, timeout: float = 0) -> Tuple[List[Dict[str, Any]], int, bool]:
+        """
+        Return the events after a cursor, waiting up to timeout seconds for new ones.
+
+        Args:
+            since (int): Number of events already received by the caller
+            timeout (float): Maximum time to wait when there is no new event (0 returns at once)
+
+        Returns:
+            Tuple[List[Dict[str, Any]], int, bool]: New events, the cursor to use in the
+                next call, and whether the job is finished and every event was read
+        """
+        since = max(0, since)
+        with self._condition:
+            if timeout > 0:
+                self._condition.wait_for(lambda: len(self._events) > since or self.done, timeout)
+            events = self._events[since:]
+            cursor = since + len(events)
+            return events, cursor, self.done and cursor >= len(self._events)
+
+    def describe(self) -> Dict[str, Any]:
+        """Status of the job, without its events."""
+        return {"job_id": self.id, "status": self.status, "error": self.error, "done": self.done,
+                "created_at": self.created_at, "finished_at": self.finished_at, "events": len(self._events)}
+
+
+class JobManager:
+    """
+    Runs jobs on a bounded pool of worker threads.
+
+    At most max_workers jobs run at once and at most max_queued wait for a
+    worker; further submissions are rejected with JobQueueFull. Finished jobs
+    are kept for retention_seconds so clients can read their last events, and
+    are evicted afterwards (lazily, on the next submit or lookup).
+    """
+
+    def __init__(self, max_workers: int = 2, max_queued: int = 8, retention_seconds: float = 3600):
+        self.max_workers = max(1, max_workers)
+        self.max_queued = max(0, max_queued)
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, run: Callable[[Job], None], **params) -> Job:
+        """
+        Queue a job.
+
+        Args:
+            run (Callable[[Job], None]): Function doing the work; receives the job to
+                publish its events. An exception marks the job as failed.
+            **params: Parameters of the job (e.g. the directory it writes to); only
+                one queued or running job may have the same parameters
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            JobConflict: If an active job has the same parameters
+            JobQueueFull: If max_workers jobs are running and max_queued are waiting
+        """
+        with self._lock:
+            self._evict_expired()
+            if self._find_active(params) is not None:
+                raise JobConflict(f"A job is already active for {params}")
+            pending = sum(1 for job in self._jobs.values() if not job.done)
+            if pending >= self.max_workers + self.max_queued:
+                raise JobQueueFull(f"{pending} jobs pending")
+            job = Job(uuid.uuid4().hex, params)
+            self._jobs[job.id] = job
+            self._update_gauges()
+
+        self._executor.submit(self._run, job, run)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Find a job that was not evicted yet."""
+        with self._lock:
+            self._evict_expired()
+            return self._jobs.get(job_id)
+
+    def _find_active(self, params: Dict[str, Any]) -> Optional[Job]:
+        """Find a queued or running job submitted with the given parameters (lock held)."""
+        for job in self._jobs.values():
+            if not job.done and job.params == params:
+                return job
+        return None
+
+    def _run(self, job: Job, run: Callable[[Job], None]) -> None:
+        with self._lock:
+            job.status = "running"
+            self._update_gauges()
+        error = None
+        try:
+            run(job)
+        except Exception as e:
+            print(f"Error in job {job.id}: {e}")
+            print(traceback.format_exc())
+            error = str(e)
+        with self._lock:
+            job.finish(error)
+            self._update_gauges()
+
+    def _evict_expired(self) -> None:
+        """Drop the finished jobs older than the retention period (lock held)."""
+        limit = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < limit]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if expired:
+            self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        """Publish the number of jobs in each state (lock held)."""
+        counts = {"queued": 0, "running": 0, "done": 0, "error": 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        for state, count in counts.items():
+            JOBS.set(count, state=state)
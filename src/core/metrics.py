@@ -0,0 +1,196 @@
+import bisect
+import threading
+from typing import Dict, Any, Tuple, List, Optional
+
+# Histogram buckets (seconds) shared by the latency metrics
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRIC_PREFIX = "extractor_"
+
+
+class _Metric:
+    """Base of the metric types: a named family of values indexed by label values."""
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = METRIC_PREFIX + name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _label_text(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.label_names, key))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def items(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+
+class Counter(_Metric):
+    """Monotonic counter."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{self._label_text(key)} {value}" for key, value in self.items()]
+
+    def summary(self) -> Dict[str, Any]:
+        return {_summary_key(key): value for key, value in self.items()}
+
+
+class Gauge(Counter):
+    """Value that goes up and down (e.g. queue depth)."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket counts (the last one is +Inf), sum and count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{self._label_text(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {total}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+        return lines
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            _summary_key(key): {"count": count, "sum": round(total, 6), "mean": round(total / count, 6) if count else 0.0,
+                                "p95_upper_bound": self._quantile_bound(counts, count, 0.95)}
+            for key, (counts, total, count) in self.items()
+        }
+
+    def _quantile_bound(self, counts: List[int], count: int, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding a quantile (None if beyond the last bucket)."""
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            if cumulative >= fraction * count:
+                return bound
+        return None
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text exposition format."""
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _summary_key(key: Tuple[str, ...]) -> str:
+    """Label values joined into a readable JSON key."""
+    return "/".join(key) if key else "total"
+
+
+# Pipeline
+STAGE_SECONDS = Histogram("stage_seconds", "Time spent in each stage of the pipeline.", ("stage",))
+DOCUMENT_SECONDS = Histogram("document_seconds", "Total processing time of each document.")
+DOCUMENTS = Counter("documents_total", "Documents processed, by outcome.", ("status",))
+FIELDS = Counter("fields_total", "Fields resolved, by source.", ("source",))
+QUEUE_DEPTH = Gauge("queue_depth", "Documents in the processing window, running or waiting for their turn.", ("state",))
+DEADLINE_MISSES = Counter("deadline_misses_total", "Documents returned at their deadline, before the LLM answered.")
+JOBS = Gauge("jobs", "Webapp jobs, by state (queued, running, done, error).", ("state",))
+
+# Heuristics
+PDF_PAGES = Counter("pdf_pages_total", "PDF pages, by whether their text was parsed or skipped after "
+                    "every field was resolved.", ("state",))
+REGEX_LOOKUPS = Counter("regex_lookups_total", "Regex rule lookups by label, field and outcome "
+                        "(hit, miss, no_rule, conflict).", ("label", "field", "outcome"))
+
+# LLM
+LLM_REQUESTS = Counter("llm_requests_total", "LLM requests, by outcome (success, retry, error).", ("outcome",))
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens reported by the API.", ("kind",))
+LLM_SECONDS = Histogram("llm_request_seconds", "Duration of LLM requests, retries included.")
+LLM_FIRST_FIELD_SECONDS = Histogram("llm_first_field_seconds", "Time until the first field of a streamed LLM "
+                                    "answer was received.")
+LLM_IN_FLIGHT = Gauge("llm_in_flight", "LLM requests currently in flight.")
+
+# Rule store and caches
+RULE_UPDATES = Counter("rule_updates_total", "Learned rule store updates, by kind.", ("kind",))
+SNAPSHOT_LOADS = Counter("rule_snapshot_loads_total", "Rule snapshots rebuilt from the database.")
+RULE_TRANSACTIONS = Counter("rule_transactions_total", "Write transactions applying batches of rule updates.")
+RULE_WRITE_QUEUE = Gauge("rule_write_queue", "Batches of rule updates waiting for the rule writer.")
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups, by cache and result (hit, miss).", ("cache", "result"))
+CACHE_EVICTIONS = Counter("cache_evictions_total", "Entries evicted from the caches.", ("cache",))
+
+REGISTRY = (STAGE_SECONDS, DOCUMENT_SECONDS, DOCUMENTS, FIELDS, DEADLINE_MISSES, QUEUE_DEPTH, JOBS,
+            PDF_PAGES, REGEX_LOOKUPS,
+            LLM_REQUESTS, LLM_TOKENS, LLM_SECONDS, LLM_FIRST_FIELD_SECONDS, LLM_IN_FLIGHT,
+            RULE_UPDATES, SNAPSHOT_LOADS, RULE_TRANSACTIONS, RULE_WRITE_QUEUE, CACHE_LOOKUPS, CACHE_EVICTIONS)
+
+
+def render_prometheus() -> str:
+    """
+    Render every metric in the Prometheus text exposition format.
+
+    Returns:
+        str: Metrics page (content type text/plain; version=0.0.4)
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def summary() -> Dict[str, Any]:
+    """
+    Summarize every metric as JSON-serializable data, with the cache hit ratios.
+
+    Returns:
+        Dict[str, Any]: Metric names (without prefix) to their values by label
+    """
+    data = {metric.name[len(METRIC_PREFIX):]: metric.summary() for metric in REGISTRY}
+    lookups = CACHE_LOOKUPS.summary()
+    ratios = {}
+    for cache in sorted({key.split("/")[0] for key in lookups}):
+        hits, misses = lookups.get(f"{cache}/hit", 0), lookups.get(f"{cache}/miss", 0)
+        ratios[cache] = round(hits / (hits + misses), 4) if hits + misses else None
+    data["cache_hit_ratio"] = ratios
+    return data
@@ -0,0 +1,217 @@
+import io
+import os
+import re
+import json
+import time
+import pstats
+import cProfile
+import threading
+import contextlib
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+
+# Functions listed in the reports, by cumulative and by own time
+REPORT_FUNCTIONS = 30
+
+
+class DocumentTrace:
+    """Spans and annotations (text length, prompt size, ...) of one document."""
+
+    def __init__(self, name: str, label: str):
+        self.name = name
+        self.label = label
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.spans: List[Dict[str, Any]] = []
+        self.annotations: Dict[str, Any] = {}
+        self.profile: Optional[cProfile.Profile] = None
+
+    def describe(self) -> Dict[str, Any]:
+        return {"document": self.name, "label": self.label, "duration": round(self.duration, 6),
+                "spans": list(self.spans), **self.annotations}
+
+
+class Profiler:
+    """
+    Collects the traces of the documents processed while profiling is enabled.
+
+    Every document gets its stage spans (start offset and duration) and a
+    cProfile of the thread processing it; the profiles are aggregated by
+    function. Documents slower than slow_seconds are dumped to
+    output_dir/slow/ with their spans, annotations and own profile.
+    """
+
+    def __init__(self, output_dir: str, slow_seconds: float):
+        self.output_dir = output_dir
+        self.slow_seconds = slow_seconds
+        self.traces: List[Dict[str, Any]] = []
+        self.slow_traces: List[str] = []
+        self._stats: Optional[pstats.Stats] = None
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def document(self, name: str, label: str):
+        trace = DocumentTrace(name, label)
+        token = _current.set(trace)
+        trace.profile = cProfile.Profile()
+        try:
+            trace.profile.enable()
+        except ValueError:
+            # Another profiler is active on this thread (or, on Python 3.12+, in the process)
+            trace.profile = None
+        try:
+            yield trace
+        finally:
+            if trace.profile is not None:
+                trace.profile.disable()
+            trace.duration = time.perf_counter() - trace.start
+            _current.reset(token)
+            self._finish(trace)
+
+    def _finish(self, trace: DocumentTrace) -> None:
+        """Aggregate the trace of a finished document and dump it if it was slow."""
+        with self._lock:
+            self.traces.append(trace.describe())
+            if trace.profile is not None:
+                if self._stats is None:
+                    self._stats = pstats.Stats(trace.profile)
+                else:
+                    self._stats.add(trace.profile)
+        if self.slow_seconds > 0 and trace.duration >= self.slow_seconds:
+            self._dump_slow(trace)
+
+    def _dump_slow(self, trace: DocumentTrace) -> None:
+        slow_dir = os.path.join(self.output_dir, "slow")
+        os.makedirs(slow_dir, exist_ok=True)
+        name = re.sub(r"[^\w.-]+", "_", os.path.basename(trace.name)) or "document"
+        path = os.path.join(slow_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{id(trace):x}.json")
+        data = trace.describe()
+        if trace.profile is not None:
+            data["profile"] = _format_stats(pstats.Stats(trace.profile), "cumulative", REPORT_FUNCTIONS)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        with self._lock:
+            self.slow_traces.append(path)
+        print(f"Slow document ({trace.duration:.2f}s >= {self.slow_seconds}s), trace saved to {path}")
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the profiled documents.
+
+        Returns:
+            Dict[str, Any]: Number of documents, total and mean seconds of each stage,
+                the slowest documents, the slow traces dumped and the functions with
+                the highest own time
+        """
+        with self._lock:
+            traces = list(self.traces)
+            functions = _top_functions(self._stats, REPORT_FUNCTIONS) if self._stats is not None else []
+            slow_traces = list(self.slow_traces)
+        stages: Dict[str, List[float]] = {}
+        for trace in traces:
+            for span in trace["spans"]:
+                stages.setdefault(span["stage"], []).append(span["duration"])
+        return {
+            "documents": len(traces),
+            "stages": {stage: {"total": round(sum(values), 6), "mean": round(sum(values) / len(values), 6)}
+                       for stage, values in stages.items()},
+            "slowest": sorted(traces, key=lambda trace: trace["duration"], reverse=True)[:5],
+            "slow_traces": slow_traces,
+            "functions": functions
+        }
+
+    def report(self) -> str:
+        """Aggregated cProfile report of every document, by cumulative and own time."""
+        with self._lock:
+            if self._stats is None:
+                return ""
+            return (_format_stats(self._stats, "cumulative", REPORT_FUNCTIONS)
+                    + _format_stats(self._stats, "tottime", REPORT_FUNCTIONS))
+
+    def save(self) -> List[str]:
+        """
+        Write the aggregated profile (profile.pstats, for pstats or snakeviz), its text
+        report (profile.txt) and the spans of every document (spans.jsonl) to output_dir.
+
+        Returns:
+            List[str]: Paths written
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        paths = []
+        with self._lock:
+            traces = list(self.traces)
+            if self._stats is not None:
+                paths.append(os.path.join(self.output_dir, "profile.pstats"))
+                self._stats.dump_stats(paths[-1])
+        if paths:
+            paths.append(os.path.join(self.output_dir, "profile.txt"))
+            with open(paths[-1], 'w', encoding='utf-8') as f:
+                f.write(self.report())
+        paths.append(os.path.join(self.output_dir, "spans.jsonl"))
+        with open(paths[-1], 'w', encoding='utf-8') as f:
+            for trace in traces:
+                f.write(json.dumps(trace, ensure_ascii=False) + "\n")
+        return paths
+
+
+def _format_stats(stats: pstats.Stats, sort: str, limit: int) -> str:
+    """Text report of a profile, sorted by the given key."""
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def _top_functions(stats: pstats.Stats, limit: int) -> List[Dict[str, Any]]:
+    """Functions with the highest own time, as JSON-serializable data."""
+    rows = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({"function": f"{filename}:{line}({function})", "calls": calls,
+                     "tottime": round(own, 6), "cumtime": round(cumulative, 6)})
+    rows.sort(key=lambda row: row["tottime"], reverse=True)
+    return rows[:limit]
+
+
+# Enabled profiler (None when profiling is off) and the trace of the document being processed.
+# The trace is a context variable, so it follows the document into the threads that run
+# its work with contextvars.copy_context().
+profiler: Optional[Profiler] = None
+_current: ContextVar[Optional[DocumentTrace]] = ContextVar("document_trace", default=None)
+
+
+def enable(output_dir: str, slow_seconds: float) -> Profiler:
+    """
+    Turn profiling on for the whole process.
+
+    Args:
+        output_dir (str): Directory receiving the reports and slow document traces
+        slow_seconds (float): Latency from which a document's trace is dumped (0 disables the dumps)
+
+    Returns:
+        Profiler: The enabled profiler
+    """
+    global profiler
+    profiler = Profiler(output_dir, slow_seconds)
+    return profiler
+
+
+def document(name: str, label: str):
+    """Trace the processing of a document (a no-op context when profiling is off)."""
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.document(name, label)
+
+
+def record_span(stage: str, start: float, end: float) -> None:
+    """Add a stage span (perf_counter times) to the trace of the current document, if any."""
+    trace = _current.get()
+    if trace is not None:
+        trace.spans.append({"stage": stage, "start": round(start - trace.start, 6),
+                            "duration": round(end - start, 6)})
+
+
+def annotate(**values) -> None:
+    """Attach values (text length, prompt size, ...) to the trace of the current document, if any."""
+    trace = _current.get()
+    if trace is not None:
+        trace.annotations.update(values)
@@ -1,39 +1,256 @@
 import sqlite3
 import os
-from typing import Optional
+import json
+import threading
+import atexit
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Tuple, List, Iterator
+from src.core.config import (
+    DB_POOL_SIZE, DB_BUSY_TIMEOUT, RULE_WRITE_INTERVAL, SYNTH_MIN_EXAMPLES, SYNTH_MAX_EXAMPLES
+)
+from src.core.metrics import RULE_UPDATES, SNAPSHOT_LOADS, RULE_TRANSACTIONS, RULE_WRITE_QUEUE
+from src.utils.regex_synthesis import merge_examples, synthesize_pattern
 
-# Use absolute path to avoid issues with different working directories (Docker, Flask, CLI)
+# Use absolute path to avoid issues with different working directories (Docker, Flask, CLI).
+# TEMPLATE_DB_PATH points the pipeline at another database (e.g. a scratch one for benchmarks).
 DB_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(DB_DIR, "template_cache.db")
+DB_PATH = os.getenv("TEMPLATE_DB_PATH") or os.path.join(DB_DIR, "template_cache.db")
 
 # Ensure the directory exists
 os.makedirs(DB_DIR, exist_ok=True)
 
+# Stored in place of an anchor / ordinal when documents disagree on it
+CONFLICTING_ANCHOR = "\x00conflict"
+CONFLICTING_ORDINAL = -1
+
+# In-process snapshots of the rules of each label, validated against rule_versions
+_rule_snapshots: Dict[str, Dict[str, Any]] = {}
+_snapshot_lock = threading.Lock()
+
+def _connect(path: str) -> sqlite3.Connection:
+    """Open a connection that waits for the write lock instead of failing at once."""
+    # check_same_thread=False: pooled connections move between threads, one at a time
+    conn = sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT, check_same_thread=False)
+    # Safe with WAL: a crash may lose the last commits, never corrupt the database
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+class ConnectionPool:
+    """
+    Pool of connections to the database.
+
+    A borrowed connection is used by a single thread until it is returned.
+    Connections are opened on demand, so borrowing never blocks, and up to
+    `size` idle ones are kept for reuse.
+    """
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = max(1, size)
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection; pending changes are committed on exit (rolled back on error)."""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = _connect(self.path)
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+_pool = ConnectionPool(DB_PATH, DB_POOL_SIZE)
+
+def connection():
+    """
+    Borrow a connection to the database from the shared pool.
+    
+    Usage:
+        with connection() as conn:
+            snapshot = get_rule_snapshot(conn, label)
+    """
+    return _pool.connection()
+
+@contextmanager
+def _write_transaction(conn) -> Iterator[sqlite3.Cursor]:
+    """
+    Run statements in a write transaction.
+    BEGIN IMMEDIATE takes the database's write lock before the first read, so
+    the checks done to detect conflicts and the writes depending on them are
+    atomic, even when other processes learn at the same time.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn.cursor()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
 def init_db():
     """Initialize the database and create tables if they don't exist."""
-    # check_same_thread=False allows SQLite to be used from different threads
-    with sqlite3.connect(DB_PATH, check_same_thread=False) as conn:
-        cursor = conn.cursor()
-        # Table for current regex rules
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS regex_rules (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                label TEXT NOT NULL,
-                field_name TEXT NOT NULL,
-                rule_name TEXT NOT NULL,
-                UNIQUE(label, field_name)
-            )
-        """)
-        # Table for tracking rule conflicts
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS regex_conflicts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                label TEXT NOT NULL,
-                field_name TEXT NOT NULL,
-                UNIQUE(label, field_name)
-            )
-        """)
-        conn.commit()
+    with connection() as conn:
+        # Readers never block the writer (and vice versa); the mode is stored in the file
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Processes starting at the same time create and migrate the tables one after the other
+        with _write_transaction(conn) as cursor:
+            # Table for current regex rules
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS regex_rules (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    label TEXT NOT NULL,
+                    field_name TEXT NOT NULL,
+                    rule_name TEXT NOT NULL,
+                    UNIQUE(label, field_name)
+                )
+            """)
+            # Disambiguators for rules that match several tokens: the label keyword
+            # preceding the value and its position among the candidates
+            cursor.execute("PRAGMA table_info(regex_rules)")
+            columns = {row[1] for row in cursor.fetchall()}
+            if "anchor" not in columns:
+                cursor.execute("ALTER TABLE regex_rules ADD COLUMN anchor TEXT")
+            if "ordinal" not in columns:
+                cursor.execute("ALTER TABLE regex_rules ADD COLUMN ordinal INTEGER")
+            # Table for tracking rule conflicts
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS regex_conflicts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    label TEXT NOT NULL,
+                    field_name TEXT NOT NULL,
+                    UNIQUE(label, field_name)
+                )
+            """)
+            # Table for positional templates: normalized region of each field's value,
+            # number of consistent observations, and whether observations disagreed
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS layout_rules (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    label TEXT NOT NULL,
+                    field_name TEXT NOT NULL,
+                    page INTEGER NOT NULL,
+                    x0 REAL NOT NULL,
+                    y0 REAL NOT NULL,
+                    x1 REAL NOT NULL,
+                    y1 REAL NOT NULL,
+                    lines INTEGER NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 1,
+                    conflicting INTEGER NOT NULL DEFAULT 0,
+                    UNIQUE(label, field_name)
+                )
+            """)
+            # Table for synthesized patterns: the single-token values seen for each field
+            # (with what is needed to validate a pattern in their documents) and the
+            # pattern generalized from them, if any
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS synthesized_rules (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    label TEXT NOT NULL,
+                    field_name TEXT NOT NULL,
+                    examples TEXT NOT NULL,
+                    pattern TEXT,
+                    UNIQUE(label, field_name)
+                )
+            """)
+            # Table for the version of the rules of each label, bumped on every change
+            # so that in-process snapshots held by other workers can be invalidated
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS rule_versions (
+                    label TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )
+            """)
+            # Table for cached LLM responses, keyed by a hash of (model, fields, text)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            # Tables for the content-addressed document cache (extracted text and final results)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS document_cache (
+                    content_hash TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS result_cache (
+                    content_hash TEXT NOT NULL,
+                    label TEXT NOT NULL,
+                    schema_hash TEXT NOT NULL,
+                    extracted_data TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY(content_hash, label, schema_hash)
+                )
+            """)
+
+# A rule update is a tuple (kind, label, field_name, *args), with kind one of:
+#   ("regex", label, field_name, rule_name)
+#   ("conflict", label, field_name)
+#   ("disambiguator", label, field_name, anchor, ordinal)
+#   ("layout", label, field_name, region, lines, tolerance)
+#   ("layout_rule", label, field_name, region, lines, hits, conflicting, tolerance)
+#     (a whole positional template learned elsewhere, see rule_updates_from_store)
+#   ("example", label, field_name, example)
+#     (a value seen in a new document, see regex_synthesis.describe_example)
+#   ("examples", label, field_name, examples)
+#     (every example learned elsewhere, see rule_updates_from_store)
+RuleUpdate = Tuple[Any, ...]
+
+def apply_rule_updates(conn, updates: List[RuleUpdate]) -> int:
+    """
+    Apply rule updates in a single write transaction.
+    Each update is checked against the rules as they are inside the
+    transaction, so conflicts are detected correctly when several threads or
+    processes write at the same time. The rule version of each changed label
+    is bumped once.
+    
+    Args:
+        conn: Database connection object
+        updates (List[RuleUpdate]): Updates to apply, in order
+
+    Returns:
+        int: Number of updates that changed the store
+    """
+    if not updates:
+        return 0
+    changes = []
+    with _write_transaction(conn) as cursor:
+        changed_labels = set()
+        for kind, label, field_name, *args in updates:
+            change = _APPLIERS[kind](cursor, label, field_name, *args)
+            if change is not None:
+                changes.append(change)
+                changed_labels.add(label)
+        for label in changed_labels:
+            _bump_rule_version(cursor, label)
+    RULE_TRANSACTIONS.inc()
+    for change in changes:
+        RULE_UPDATES.inc(kind=change)
+    return len(changes)
 
 def save_regex_rule(conn, label: str, field_name: str, rule_name: str) -> None:
     """
@@ -46,11 +263,13 @@ def save_regex_rule(conn, label: str, field_name: str, rule_name: str) -> None:
         field_name (str): Name of the field
         rule_name (str): Name of the regex rule (e.g., "CPF", "DATA_BR")
     """
+    apply_rule_updates(conn, [("regex", label, field_name, rule_name)])
+
+def _apply_regex_rule(cursor, label: str, field_name: str, rule_name: str) -> Optional[str]:
     # First check if this field is already marked as conflicting
-    if is_field_conflicting(conn, label, field_name):
-        return
-        
-    cursor = conn.cursor()
+    if _is_conflicting(cursor, label, field_name):
+        return None
+
     # Check if a different rule already exists
     cursor.execute("""
         SELECT rule_name FROM regex_rules
@@ -63,16 +282,63 @@ def save_regex_rule(conn, label: str, field_name: str, rule_name: str) -> None:
         if existing_rule != rule_name:
             # Different rule found - mark as conflicting
             print(f"[DB] Found conflicting rules for field '{field_name}' in label '{label}': {existing_rule} vs {rule_name}")
-            mark_field_as_conflicting(conn, label, field_name)
-            return
-    
+            return _apply_conflict(cursor, label, field_name)
+        # Same rule already saved - nothing changes
+        return None
+
     # No conflict - save the rule
     cursor.execute("""
         INSERT OR REPLACE INTO regex_rules (label, field_name, rule_name)
         VALUES (?, ?, ?)
     """, (label, field_name, rule_name))
-    conn.commit()
     print(f"[DB] Saved rule '{rule_name}' for field '{field_name}' in label '{label}'")
+    return "regex"
+
+def save_rule_disambiguator(conn, label: str, field_name: str, anchor: Optional[str], ordinal: Optional[int]) -> None:
+    """
+    Save how to pick the right candidate when a field's rule matches several tokens.
+    An anchor or ordinal that differs from the saved one is marked as
+    conflicting and no longer used; the other one is kept.
+    
+    Args:
+        conn: Database connection object
+        label (str): Document type identifier
+        field_name (str): Name of the field (must already have a regex rule)
+        anchor (Optional[str]): Normalized label keyword preceding the value
+        ordinal (Optional[int]): Position of the value among the rule's candidates
+    """
+    apply_rule_updates(conn, [("disambiguator", label, field_name, anchor, ordinal)])
+
+def _apply_disambiguator(cursor, label: str, field_name: str, anchor: Optional[str],
+                         ordinal: Optional[int]) -> Optional[str]:
+    cursor.execute("""
+        SELECT anchor, ordinal FROM regex_rules
+        WHERE label = ? AND field_name = ?
+    """, (label, field_name))
+    result = cursor.fetchone()
+    if result is None:
+        return None
+
+    saved_anchor, saved_ordinal = result
+    new_anchor = _merge_disambiguator(saved_anchor, anchor, CONFLICTING_ANCHOR)
+    new_ordinal = _merge_disambiguator(saved_ordinal, ordinal, CONFLICTING_ORDINAL)
+    if (new_anchor, new_ordinal) == (saved_anchor, saved_ordinal):
+        return None
+
+    cursor.execute("""
+        UPDATE regex_rules SET anchor = ?, ordinal = ?
+        WHERE label = ? AND field_name = ?
+    """, (new_anchor, new_ordinal, label, field_name))
+    print(f"[DB] Saved disambiguator (anchor={new_anchor!r}, ordinal={new_ordinal}) for field '{field_name}' in label '{label}'")
+    return "disambiguator"
+
+def _merge_disambiguator(saved, new, conflicting):
+    """Combine a saved disambiguator with a new observation."""
+    if new is None or saved == conflicting:
+        return saved
+    if saved is None or saved == new:
+        return new
+    return conflicting
 
 def get_regex_rule(conn, label: str, field_name: str) -> Optional[str]:
     """
@@ -107,7 +373,13 @@ def mark_field_as_conflicting(conn, label: str, field_name: str) -> None:
         label (str): Document type identifier
         field_name (str): Name of the field
     """
-    cursor = conn.cursor()
+    apply_rule_updates(conn, [("conflict", label, field_name)])
+
+def _apply_conflict(cursor, label: str, field_name: str) -> Optional[str]:
+    # Already conflicting (e.g. a conflict merged from another store twice) - nothing changes
+    if _is_conflicting(cursor, label, field_name):
+        return None
+
     # Delete any existing regex rule for this field
     cursor.execute("""
         DELETE FROM regex_rules
@@ -119,8 +391,8 @@ def mark_field_as_conflicting(conn, label: str, field_name: str) -> None:
         INSERT OR REPLACE INTO regex_conflicts (label, field_name)
         VALUES (?, ?)
     """, (label, field_name))
-    conn.commit()
     print(f"[DB] Marked field '{field_name}' in label '{label}' as having conflicting patterns")
+    return "conflict"
 
 def is_field_conflicting(conn, label: str, field_name: str) -> bool:
     """
@@ -134,12 +406,357 @@ def is_field_conflicting(conn, label: str, field_name: str) -> bool:
     Returns:
         bool: True if the field has conflicting patterns, False otherwise
     """
-    cursor = conn.cursor()
+    return _is_conflicting(conn.cursor(), label, field_name)
+
+def _is_conflicting(cursor, label: str, field_name: str) -> bool:
     cursor.execute("""
         SELECT 1 FROM regex_conflicts
         WHERE label = ? AND field_name = ?
     """, (label, field_name))
     return cursor.fetchone() is not None
 
-# Don't initialize at import time - let process_dataset handle it
-# This avoids race conditions when multiple threads/processes start up
+def save_layout_observation(conn, label: str, field_name: str, region: Tuple[int, float, float, float, float],
+                            lines: int, tolerance: float) -> None:
+    """
+    Record where a field's value was found in a document of a specific type.
+    An observation that starts at the same place as the saved one (same page,
+    top-left corner within tolerance) confirms it and widens the region; a
+    different place marks the field's layout as conflicting.
+    
+    Args:
+        conn: Database connection object
+        label (str): Document type identifier
+        field_name (str): Name of the field
+        region (Tuple[int, float, float, float, float]): Page and normalized bounding box of the value
+        lines (int): Number of text lines the value spans
+        tolerance (float): Allowed shift, as a fraction of the page size
+    """
+    apply_rule_updates(conn, [("layout", label, field_name, region, lines, tolerance)])
+
+def _apply_layout_observation(cursor, label: str, field_name: str, region: Tuple[int, float, float, float, float],
+                              lines: int, tolerance: float) -> Optional[str]:
+    page, x0, y0, x1, y1 = region
+    cursor.execute("""
+        SELECT page, x0, y0, x1, y1, lines, conflicting FROM layout_rules
+        WHERE label = ? AND field_name = ?
+    """, (label, field_name))
+    result = cursor.fetchone()
+
+    if result is None:
+        cursor.execute("""
+            INSERT INTO layout_rules (label, field_name, page, x0, y0, x1, y1, lines)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (label, field_name, page, x0, y0, x1, y1, lines))
+        return "layout"
+
+    saved_page, saved_x0, saved_y0, saved_x1, saved_y1, saved_lines, conflicting = result
+    if conflicting:
+        return None
+    if _same_place((saved_page, saved_x0, saved_y0), region, tolerance):
+        cursor.execute("""
+            UPDATE layout_rules
+            SET x0 = ?, y0 = ?, x1 = ?, y1 = ?, lines = ?, hits = hits + 1
+            WHERE label = ? AND field_name = ?
+        """, (min(saved_x0, x0), min(saved_y0, y0), max(saved_x1, x1), max(saved_y1, y1),
+              max(saved_lines, lines), label, field_name))
+        return "layout"
+
+    print(f"[DB] Found conflicting positions for field '{field_name}' in label '{label}'")
+    cursor.execute("""
+        UPDATE layout_rules SET conflicting = 1
+        WHERE label = ? AND field_name = ?
+    """, (label, field_name))
+    return "layout_conflict"
+
+def _apply_layout_rule(cursor, label: str, field_name: str, region: Tuple[int, float, float, float, float],
+                       lines: int, hits: int, conflicting: bool, tolerance: float) -> Optional[str]:
+    # Like an observation, but the hits are not added up: merging the same
+    # template twice (or templates that share their history) changes nothing
+    page, x0, y0, x1, y1 = region
+    cursor.execute("""
+        SELECT page, x0, y0, x1, y1, lines, hits, conflicting FROM layout_rules
+        WHERE label = ? AND field_name = ?
+    """, (label, field_name))
+    result = cursor.fetchone()
+
+    if result is None:
+        cursor.execute("""
+            INSERT INTO layout_rules (label, field_name, page, x0, y0, x1, y1, lines, hits, conflicting)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (label, field_name, page, x0, y0, x1, y1, lines, hits, int(conflicting)))
+        return "layout_conflict" if conflicting else "layout"
+
+    saved_page, saved_x0, saved_y0, saved_x1, saved_y1, saved_lines, saved_hits, saved_conflicting = result
+    if saved_conflicting:
+        return None
+    if conflicting or not _same_place((saved_page, saved_x0, saved_y0), region, tolerance):
+        print(f"[DB] Found conflicting positions for field '{field_name}' in label '{label}'")
+        cursor.execute("""
+            UPDATE layout_rules SET conflicting = 1
+            WHERE label = ? AND field_name = ?
+        """, (label, field_name))
+        return "layout_conflict"
+
+    merged = (min(saved_x0, x0), min(saved_y0, y0), max(saved_x1, x1), max(saved_y1, y1),
+              max(saved_lines, lines), max(saved_hits, hits))
+    if merged == (saved_x0, saved_y0, saved_x1, saved_y1, saved_lines, saved_hits):
+        return None
+    cursor.execute("""
+        UPDATE layout_rules
+        SET x0 = ?, y0 = ?, x1 = ?, y1 = ?, lines = ?, hits = ?
+        WHERE label = ? AND field_name = ?
+    """, (*merged, label, field_name))
+    return "layout"
+
+def _same_place(saved: Tuple[int, float, float], region: Tuple[int, float, float, float, float],
+                tolerance: float) -> bool:
+    """Whether a region starts where a saved one does (same page, top-left corner within tolerance)."""
+    return saved[0] == region[0] and abs(saved[1] - region[1]) <= tolerance and abs(saved[2] - region[2]) <= tolerance
+
+def _apply_example(cursor, label: str, field_name: str, example: Dict[str, Any]) -> Optional[str]:
+    return _merge_examples(cursor, label, field_name, [example], accumulate=True)
+
+def _apply_examples(cursor, label: str, field_name: str, examples: List[Dict[str, Any]]) -> Optional[str]:
+    return _merge_examples(cursor, label, field_name, examples, accumulate=False)
+
+def _merge_examples(cursor, label: str, field_name: str, examples: List[Dict[str, Any]],
+                    accumulate: bool) -> Optional[str]:
+    # The pattern is synthesized again from every example, so it widens as values
+    # are seen and disappears when they stop agreeing (see synthesize_pattern)
+    cursor.execute("""
+        SELECT examples, pattern FROM synthesized_rules
+        WHERE label = ? AND field_name = ?
+    """, (label, field_name))
+    result = cursor.fetchone()
+    saved, saved_pattern = (json.loads(result[0]), result[1]) if result else ([], None)
+
+    merged = merge_examples(saved, examples, SYNTH_MAX_EXAMPLES, accumulate)
+    if merged == saved:
+        return None
+    pattern = synthesize_pattern(merged, SYNTH_MIN_EXAMPLES)
+    cursor.execute("""
+        INSERT INTO synthesized_rules (label, field_name, examples, pattern) VALUES (?, ?, ?, ?)
+        ON CONFLICT(label, field_name) DO UPDATE SET examples = excluded.examples, pattern = excluded.pattern
+    """, (label, field_name, json.dumps(merged, ensure_ascii=False), pattern))
+    if pattern == saved_pattern:
+        return None
+    if pattern is None:
+        print(f"[DB] Dropped synthesized pattern for field '{field_name}' in label '{label}'")
+    else:
+        print(f"[DB] Synthesized pattern '{pattern}' for field '{field_name}' in label '{label}'")
+    return "pattern"
+
+def rule_updates_from_store(conn, tolerance: float) -> List[RuleUpdate]:
+    """
+    Read every rule learned in a database as rule updates.
+    Applying them to another database (see apply_rule_updates) merges the
+    two with the usual conflict semantics: different rules or positions for
+    the same field become conflicts. Merging is idempotent, so the same
+    database can be merged again, e.g. after a retried run.
+    
+    Args:
+        conn: Connection to the database to read
+        tolerance (float): Allowed shift between positions, as a fraction of the page size
+        
+    Returns:
+        List[RuleUpdate]: Rules, conflicts, disambiguators, positional templates and
+            synthesis examples, in that order
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT label, field_name, rule_name, anchor, ordinal FROM regex_rules ORDER BY id")
+    rows = cursor.fetchall()
+    updates: List[RuleUpdate] = [("regex", label, field_name, rule_name) for label, field_name, rule_name, _, _ in rows]
+    cursor.execute("SELECT label, field_name FROM regex_conflicts ORDER BY id")
+    updates.extend(("conflict", label, field_name) for label, field_name in cursor.fetchall())
+    updates.extend(("disambiguator", label, field_name, anchor, ordinal)
+                   for label, field_name, _, anchor, ordinal in rows if anchor is not None or ordinal is not None)
+    cursor.execute("""
+        SELECT label, field_name, page, x0, y0, x1, y1, lines, hits, conflicting FROM layout_rules ORDER BY id
+    """)
+    updates.extend(("layout_rule", label, field_name, (page, x0, y0, x1, y1), lines, hits, bool(conflicting), tolerance)
+                   for label, field_name, page, x0, y0, x1, y1, lines, hits, conflicting in cursor.fetchall())
+    cursor.execute("SELECT label, field_name, examples FROM synthesized_rules ORDER BY id")
+    updates.extend(("examples", label, field_name, json.loads(examples))
+                   for label, field_name, examples in cursor.fetchall())
+    return updates
+
+def _bump_rule_version(cursor, label: str) -> None:
+    """Increment the rule version of a label and drop its local snapshot."""
+    cursor.execute("""
+        INSERT INTO rule_versions (label, version) VALUES (?, 1)
+        ON CONFLICT(label) DO UPDATE SET version = version + 1
+    """, (label,))
+    with _snapshot_lock:
+        _rule_snapshots.pop(label, None)
+
+def get_rule_snapshot(conn, label: str) -> Dict[str, Any]:
+    """
+    Retrieve all regex rules, conflicts and positional templates of a document type.
+    The snapshot is loaded once and reused until the label's rule version
+    changes, so a document costs a single SELECT instead of one per field.
+    Changes made by other connections or processes are detected through
+    the rule_versions table.
+    
+    Args:
+        conn: Database connection object
+        label (str): Document type identifier
+        
+    Returns:
+        Dict[str, Any]: Snapshot with keys:
+            - version: Rule version the snapshot was built from
+            - rules: Dictionary of field names to regex rule names
+            - conflicts: Set of field names with conflicting patterns
+            - disambiguators: Dictionary of field names to (anchor, ordinal) for rules
+              that match several tokens (conflicting values replaced by None)
+            - layouts: Dictionary of field names to positional templates
+              ({"region": (page, x0, y0, x1, y1), "lines": int, "hits": int}),
+              without the conflicting ones
+            - patterns: Dictionary of field names to their synthesized pattern
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT version FROM rule_versions WHERE label = ?", (label,))
+    result = cursor.fetchone()
+    version = result[0] if result else 0
+
+    with _snapshot_lock:
+        snapshot = _rule_snapshots.get(label)
+    if snapshot is not None and snapshot["version"] == version:
+        return snapshot
+
+    cursor.execute("""
+        SELECT field_name, rule_name, anchor, ordinal FROM regex_rules
+        WHERE label = ?
+    """, (label,))
+    rules = {}
+    disambiguators = {}
+    for field_name, rule_name, anchor, ordinal in cursor.fetchall():
+        rules[field_name] = rule_name
+        anchor = None if anchor == CONFLICTING_ANCHOR else anchor
+        ordinal = None if ordinal == CONFLICTING_ORDINAL else ordinal
+        if anchor is not None or ordinal is not None:
+            disambiguators[field_name] = (anchor, ordinal)
+    cursor.execute("""
+        SELECT field_name FROM regex_conflicts
+        WHERE label = ?
+    """, (label,))
+    conflicts = {row[0] for row in cursor.fetchall()}
+    cursor.execute("""
+        SELECT field_name, page, x0, y0, x1, y1, lines, hits FROM layout_rules
+        WHERE label = ? AND conflicting = 0
+    """, (label,))
+    layouts = {
+        field_name: {"region": (page, x0, y0, x1, y1), "lines": lines, "hits": hits}
+        for field_name, page, x0, y0, x1, y1, lines, hits in cursor.fetchall()
+    }
+    cursor.execute("""
+        SELECT field_name, pattern FROM synthesized_rules
+        WHERE label = ? AND pattern IS NOT NULL
+    """, (label,))
+    patterns = dict(cursor.fetchall())
+
+    snapshot = {"version": version, "rules": rules, "conflicts": conflicts,
+                "disambiguators": disambiguators, "layouts": layouts, "patterns": patterns}
+    with _snapshot_lock:
+        _rule_snapshots[label] = snapshot
+    print(f"[DB] Loaded {len(rules)} rules and {len(conflicts)} conflicts for label '{label}' (version {version})")
+    SNAPSHOT_LOADS.inc()
+    return snapshot
+
+def preload_rule_snapshots(conn) -> int:
+    """
+    Load the rule snapshot of every label that has learned rules.
+    
+    Args:
+        conn: Database connection object
+        
+    Returns:
+        int: Number of labels loaded
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT label FROM rule_versions")
+    labels = [row[0] for row in cursor.fetchall()]
+    for label in labels:
+        get_rule_snapshot(conn, label)
+    return len(labels)
+
+_APPLIERS = {
+    "regex": _apply_regex_rule,
+    "conflict": _apply_conflict,
+    "disambiguator": _apply_disambiguator,
+    "layout": _apply_layout_observation,
+    "layout_rule": _apply_layout_rule,
+    "example": _apply_example,
+    "examples": _apply_examples,
+}
+
+class RuleWriter:
+    """
+    Write-behind queue of rule updates.
+
+    Each document submits its updates as one batch. A background thread
+    applies every batch waiting in the queue in a single transaction, on a
+    pooled connection, so concurrent documents share one commit.
+
+    With an interval, the thread gathers batches for that long before
+    writing and submit() returns at once: the pipeline never waits for the
+    database, and rules reach the other documents (and processes) after at
+    most one interval. Without one, submit() waits until its batch is
+    committed, so the next document already sees the learned rules.
+    """
+
+    def __init__(self, interval: float = 0):
+        self.interval = interval
+        self._pending: List[Tuple[List[RuleUpdate], threading.Event]] = []
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, updates: List[RuleUpdate], wait: Optional[bool] = None) -> None:
+        """
+        Queue the rule updates of a document.
+        
+        Args:
+            updates (List[RuleUpdate]): Updates to apply in one transaction (see apply_rule_updates)
+            wait (Optional[bool]): Wait until they are committed (default: only without an interval)
+        """
+        done = threading.Event()
+        with self._condition:
+            if not updates and not self._pending and self._thread is None:
+                return
+            self._pending.append((updates, done))
+            RULE_WRITE_QUEUE.set(len(self._pending))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rule-writer", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+        if wait if wait is not None else self.interval <= 0:
+            done.wait()
+
+    def flush(self) -> None:
+        """Wait until every update submitted so far is committed."""
+        # Batches are written in order, so an empty one is done after all of them
+        self.submit([], wait=True)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending)
+                if self.interval > 0:
+                    # Gather more batches, unless someone is waiting for a flush
+                    self._condition.wait_for(lambda: any(not updates for updates, _ in self._pending),
+                                             timeout=self.interval)
+                batches, self._pending = self._pending, []
+                RULE_WRITE_QUEUE.set(0)
+
+            updates = [update for batch, _ in batches for update in batch]
+            try:
+                with connection() as conn:
+                    apply_rule_updates(conn, updates)
+            except Exception as e:
+                print(f"[DB] Failed to write {len(updates)} rule updates: {e}")
+            finally:
+                for _, done in batches:
+                    done.set()
+
+# Shared by every thread of the process; pending updates are written before exit
+rule_writer = RuleWriter(RULE_WRITE_INTERVAL)
+atexit.register(rule_writer.flush)
@@ -0,0 +1,157 @@
+import json
+import hashlib
+import threading
+import time
+from typing import Dict, Any, Optional
+from src.core.config import DOC_CACHE_MAX_BYTES
+from src.core.metrics import CACHE_LOOKUPS, CACHE_EVICTIONS
+from src.database.db import connection
+
+# Hit/miss counters for the current process
+doc_cache_stats = {"text_hits": 0, "text_misses": 0, "result_hits": 0, "result_misses": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+_LOOKUP_RESULTS = {"hits": "hit", "misses": "miss"}
+
+
+def _count(name: str, amount: int = 1) -> None:
+    with _stats_lock:
+        doc_cache_stats[name] += amount
+    if name == "evictions":
+        CACHE_EVICTIONS.inc(amount, cache="document")
+    else:
+        cache, result = name.split("_")
+        CACHE_LOOKUPS.inc(amount, cache=cache, result=_LOOKUP_RESULTS[result])
+
+
+def hash_content(data: bytes) -> str:
+    """Return the SHA-256 hex digest of a file content."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_schema(schema: Dict[str, Any]) -> str:
+    """Return the SHA-256 hex digest of an extraction schema, independent of key order."""
+    payload = json.dumps(schema, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_cached_text(content_hash: str) -> Optional[str]:
+    """
+    Retrieve the extracted text of a PDF by its content hash.
+    
+    Args:
+        content_hash (str): SHA-256 of the PDF bytes
+        
+    Returns:
+        Optional[str]: The cached text or None on a miss
+    """
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT text FROM document_cache WHERE content_hash = ?", (content_hash,))
+        result = cursor.fetchone()
+        if result:
+            cursor.execute("UPDATE document_cache SET last_access = ? WHERE content_hash = ?",
+                           (time.time(), content_hash))
+            conn.commit()
+
+    _count("text_hits" if result else "text_misses")
+    return result[0] if result else None
+
+
+def store_text(content_hash: str, text: str) -> None:
+    """
+    Store the extracted text of a PDF and evict least recently used entries.
+    
+    Args:
+        content_hash (str): SHA-256 of the PDF bytes
+        text (str): Extracted text
+    """
+    size = len(text.encode("utf-8"))
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO document_cache (content_hash, text, size, last_access)
+            VALUES (?, ?, ?, ?)
+        """, (content_hash, text, size, time.time()))
+        evicted = _evict(cursor)
+        conn.commit()
+    if evicted:
+        _count("evictions", evicted)
+
+
+def get_cached_result(content_hash: str, label: str, schema_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Retrieve the final extracted data of a PDF for a (label, schema) pair.
+    
+    Args:
+        content_hash (str): SHA-256 of the PDF bytes
+        label (str): Document type identifier
+        schema_hash (str): Hash of the extraction schema (see hash_schema)
+        
+    Returns:
+        Optional[Dict[str, Any]]: The cached extracted data or None on a miss
+    """
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT extracted_data FROM result_cache
+            WHERE content_hash = ? AND label = ? AND schema_hash = ?
+        """, (content_hash, label, schema_hash))
+        result = cursor.fetchone()
+        if result:
+            cursor.execute("""
+                UPDATE result_cache SET last_access = ?
+                WHERE content_hash = ? AND label = ? AND schema_hash = ?
+            """, (time.time(), content_hash, label, schema_hash))
+            conn.commit()
+
+    _count("result_hits" if result else "result_misses")
+    return json.loads(result[0]) if result else None
+
+
+def store_result(content_hash: str, label: str, schema_hash: str, extracted_data: Dict[str, Any]) -> None:
+    """
+    Store the final extracted data of a PDF and evict least recently used entries.
+    
+    Args:
+        content_hash (str): SHA-256 of the PDF bytes
+        label (str): Document type identifier
+        schema_hash (str): Hash of the extraction schema (see hash_schema)
+        extracted_data (Dict[str, Any]): Final extracted data
+    """
+    payload = json.dumps(extracted_data, ensure_ascii=False)
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO result_cache (content_hash, label, schema_hash, extracted_data, size, last_access)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (content_hash, label, schema_hash, payload, len(payload.encode("utf-8")), time.time()))
+        evicted = _evict(cursor)
+        conn.commit()
+    if evicted:
+        _count("evictions", evicted)
+
+
+def _evict(cursor) -> int:
+    """Delete the least recently used text and result entries until the cache fits DOC_CACHE_MAX_BYTES."""
+    cursor.execute("""
+        SELECT (SELECT COALESCE(SUM(size), 0) FROM document_cache)
+             + (SELECT COALESCE(SUM(size), 0) FROM result_cache)
+    """)
+    total = cursor.fetchone()[0]
+    if total <= DOC_CACHE_MAX_BYTES:
+        return 0
+
+    cursor.execute("""
+        SELECT 'document_cache', rowid, size, last_access FROM document_cache
+        UNION ALL
+        SELECT 'result_cache', rowid, size, last_access FROM result_cache
+        ORDER BY last_access ASC
+    """)
+    evicted = 0
+    for table, rowid, size, _ in cursor.fetchall():
+        if total <= DOC_CACHE_MAX_BYTES:
+            break
+        cursor.execute(f"DELETE FROM {table} WHERE rowid = ?", (rowid,))
+        total -= size
+        evicted += 1
+    return evicted
@@ -1,16 +1,63 @@
-from typing import Dict
-from src.database.db import save_regex_rule
-from src.utils.regex_library import find_matching_rule
+from collections import Counter
+from typing import Dict, List, Optional
+from src.core.config import LAYOUT_TOLERANCE
+from src.database.db import RuleUpdate, rule_writer
+from src.extractors.layout import Word, locate_value
+from src.utils.regex_library import REGEX_LIBRARY, find_matching_rule
+from src.utils.regex_synthesis import describe_example
+from src.utils.token_index import build_token_index, anchor_before, TOKEN_PATTERN
 
-def learn_from_llm(label: str, llm_results: Dict[str, str], db_conn) -> None:
+def learn_from_llm(
+    label: str,
+    llm_results: Dict[str, str],
+    words: Optional[List[Word]] = None,
+    full_text: Optional[str] = None
+) -> None:
     """
-    Learn regex rules from successful LLM extractions.
+    Learn regex rules, and positional templates when the document's words are
+    given, from successful LLM extractions.
+
+    The updates of the document are submitted to the rule writer as one
+    batch, so they are committed in a single transaction.
     
     Args:
         label (str): Document type identifier
         llm_results (Dict[str, str]): Dictionary of field names to extracted values
-        db_conn: Database connection object
+        words (Optional[List[Word]]): Words of the document with their coordinates
+        full_text (Optional[str]): Full text content of the PDF
+    """
+    updates = rule_updates_from_llm(label, llm_results, words, full_text)
+    if updates:
+        rule_writer.submit(updates)
+
+def rule_updates_from_llm(
+    label: str,
+    llm_results: Dict[str, str],
+    words: Optional[List[Word]] = None,
+    full_text: Optional[str] = None
+) -> List[RuleUpdate]:
     """
+    Build the rule updates learned from the LLM's answer for a document.
+
+    When the full text is given and a learned rule matches several tokens of
+    the document, the anchor keyword preceding the LLM's value and its
+    position among the matches are learned too, so later documents can pick
+    the right candidate without the LLM. Values that are a single token of
+    the text are also recorded as examples to synthesize a pattern from, for
+    fields no library rule fits (see regex_synthesis).
+    
+    Args:
+        label (str): Document type identifier
+        llm_results (Dict[str, str]): Dictionary of field names to extracted values
+        words (Optional[List[Word]]): Words of the document with their coordinates
+        full_text (Optional[str]): Full text content of the PDF
+
+    Returns:
+        List[RuleUpdate]: Updates to apply, in order (see apply_rule_updates)
+    """
+    updates = []
+    learned_rules = {}
+
     # Process each field and value pair from LLM results
     for field_name, value in llm_results.items():
         # Skip None or empty values
@@ -22,6 +69,56 @@ def learn_from_llm(label: str, llm_results: Dict[str, str], db_conn) -> None:
         
         # If a unique rule was found, save it
         if rule_name:
-            save_regex_rule(db_conn, label, field_name, rule_name)
+            updates.append(("regex", label, field_name, rule_name))
+            learned_rules[field_name] = (rule_name, value)
 
+        # Record where the value is, if it appears exactly once in the document
+        if words:
+            located = locate_value(words, value)
+            if located is not None:
+                region, lines = located
+                updates.append(("layout", label, field_name, region, lines, LAYOUT_TOLERANCE))
 
+    # After the rules, so a field's new rule exists when its disambiguator is applied
+    if full_text and learned_rules:
+        updates.extend(_learn_disambiguators(label, learned_rules, full_text))
+
+    # Examples are only usable with the text they are validated against
+    if full_text:
+        token_counts = Counter(TOKEN_PATTERN.findall(full_text))
+        for field_name, value in llm_results.items():
+            example = describe_example(value, token_counts) if value else None
+            if example is not None:
+                updates.append(("example", label, field_name, example))
+    return updates
+
+def _learn_disambiguators(label: str, learned_rules: Dict[str, tuple], full_text: str) -> List[RuleUpdate]:
+    """
+    Learn the anchor and ordinal of the values whose rule matches several tokens.
+    
+    Args:
+        label (str): Document type identifier
+        learned_rules (Dict[str, tuple]): Field names to (rule name, extracted value)
+        full_text (str): Full text content of the PDF
+
+    Returns:
+        List[RuleUpdate]: Disambiguator updates
+    """
+    updates = []
+    rule_names = {rule_name for rule_name, _ in learned_rules.values()}
+    token_index = build_token_index(full_text, {
+        name: pattern for name, pattern in REGEX_LIBRARY.items() if name in rule_names
+    })
+
+    for field_name, (rule_name, value) in learned_rules.items():
+        candidates = token_index.get(rule_name, [])
+        if len(candidates) < 2:
+            continue
+        # The value must be exactly one of the candidates to know which one it is
+        positions = [i for i, (_, _, word) in enumerate(candidates) if word == str(value).strip()]
+        if len(positions) != 1:
+            continue
+        ordinal = positions[0]
+        anchor = anchor_before(full_text, candidates[ordinal][0])
+        updates.append(("disambiguator", label, field_name, anchor, ordinal))
+    return updates
@@ -0,0 +1,109 @@
+import json
+import hashlib
+import threading
+import time
+from typing import Dict, Any, Optional
+from src.core.config import LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_AGE_DAYS
+from src.core.metrics import CACHE_LOOKUPS, CACHE_EVICTIONS
+from src.database.db import connection
+
+# Hit/miss counters for the current process
+cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+_LOOKUP_RESULTS = {"hits": "hit", "misses": "miss"}
+
+
+def _count(name: str, amount: int = 1) -> None:
+    with _stats_lock:
+        cache_stats[name] += amount
+    if name == "evictions":
+        CACHE_EVICTIONS.inc(amount, cache="llm")
+    else:
+        CACHE_LOOKUPS.inc(amount, cache="llm", result=_LOOKUP_RESULTS[name])
+
+
+def make_cache_key(model: str, fields: Dict[str, Any], text: str) -> str:
+    """
+    Build a content-addressed key for an LLM request.
+    
+    Args:
+        model (str): Name of the LLM model
+        fields (Dict[str, Any]): Field names and descriptions sent to the LLM
+        text (str): Document text sent to the LLM
+        
+    Returns:
+        str: SHA-256 hex digest of (model, field schema subset, text)
+    """
+    payload = json.dumps(
+        {"model": model, "fields": fields, "text": text},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_cached_response(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Retrieve a cached LLM response, ignoring entries older than the configured age.
+    
+    Args:
+        key (str): Cache key built with make_cache_key
+        
+    Returns:
+        Optional[Dict[str, Any]]: The cached response or None on a miss
+    """
+    now = time.time()
+    min_created = now - LLM_CACHE_MAX_AGE_DAYS * 86400
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT response FROM llm_cache
+            WHERE key = ? AND created_at >= ?
+        """, (key, min_created))
+        result = cursor.fetchone()
+        if result:
+            cursor.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+
+    if result:
+        _count("hits")
+        return json.loads(result[0])
+    _count("misses")
+    return None
+
+
+def store_response(key: str, model: str, response: Dict[str, Any]) -> None:
+    """
+    Store an LLM response in the cache and evict old entries.
+    
+    Args:
+        key (str): Cache key built with make_cache_key
+        model (str): Name of the LLM model
+        response (Dict[str, Any]): Parsed JSON response of the LLM
+    """
+    now = time.time()
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, last_access)
+            VALUES (?, ?, ?, ?, ?)
+        """, (key, model, json.dumps(response, ensure_ascii=False), now, now))
+        evicted = _evict(cursor, now)
+        conn.commit()
+    if evicted:
+        _count("evictions", evicted)
+
+
+def _evict(cursor, now: float) -> int:
+    """Delete expired entries and the least recently used ones above the size limit."""
+    cursor.execute("""
+        DELETE FROM llm_cache WHERE created_at < ?
+    """, (now - LLM_CACHE_MAX_AGE_DAYS * 86400,))
+    evicted = cursor.rowcount
+    cursor.execute("""
+        DELETE FROM llm_cache WHERE key IN (
+            SELECT key FROM llm_cache
+            ORDER BY last_access DESC
+            LIMIT -1 OFFSET ?
+        )
+    """, (LLM_CACHE_MAX_ENTRIES,))
+    return evicted + cursor.rowcount
@@ -0,0 +1,190 @@
+import re
+import fitz  # PyMuPDF
+from typing import Dict, Any, List, Tuple, Optional
+from unidecode import unidecode
+from src.utils.regex_library import REGEX_LIBRARY, is_valid_value
+
+# A word is (page, x0, y0, x1, y1, text, line_key), with coordinates normalized
+# to the page size (0..1) so small scale and shift differences between scans
+# of the same layout stay comparable. line_key identifies the text line
+# (block, line) the word belongs to.
+Word = Tuple[int, float, float, float, float, str, Tuple[int, int]]
+
+# A region is (page, x0, y0, x1, y1), normalized like words
+Region = Tuple[int, float, float, float, float]
+
+WORD_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def extract_words(pdf_bytes: bytes) -> List[Word]:
+    """
+    Extract the words of a PDF with their normalized coordinates, in reading order.
+
+    Args:
+        pdf_bytes (bytes): Content of the PDF file
+
+    Returns:
+        List[Word]: Words of every page
+    """
+    words = []
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf:
+        for page_number, page in enumerate(pdf):
+            width, height = page.rect.width or 1, page.rect.height or 1
+            for x0, y0, x1, y1, text, block, line, _ in page.get_text("words", sort=False):
+                words.append((page_number, x0 / width, y0 / height, x1 / width, y1 / height, text, (block, line)))
+    return words
+
+
+def _tokens(text: str) -> List[str]:
+    """Alphanumeric tokens of a text, ignoring case, accents and punctuation."""
+    return WORD_TOKEN_PATTERN.findall(unidecode(str(text)).lower())
+
+
+def locate_value(words: List[Word], value: Any) -> Optional[Tuple[Region, int]]:
+    """
+    Find the region of a value in the document.
+
+    The value must match a run of consecutive words (ignoring case, accents
+    and punctuation, so values the LLM joined across lines still match) and
+    occur exactly once in the document.
+
+    Args:
+        words (List[Word]): Words of the document
+        value (Any): Value extracted for a field
+
+    Returns:
+        Optional[Tuple[Region, int]]: Bounding region of the value and the number of
+            text lines it spans, or None if it is not found exactly once
+    """
+    target = _tokens(value)
+    if not target:
+        return None
+
+    word_tokens = [_tokens(word[5]) for word in words]
+    found = None
+    for start in range(len(words)):
+        matched = 0
+        end = start
+        while end < len(words) and matched < len(target) and words[end][0] == words[start][0]:
+            tokens = word_tokens[end]
+            if target[matched:matched + len(tokens)] != tokens:
+                break
+            matched += len(tokens)
+            end += 1
+        if matched == len(target) and end > start:
+            if found is not None:
+                # Ambiguous: the value appears more than once
+                return None
+            found = (start, end)
+
+    if found is None:
+        return None
+    span = words[found[0]:found[1]]
+    region = (
+        span[0][0],
+        min(word[1] for word in span),
+        min(word[2] for word in span),
+        max(word[3] for word in span),
+        max(word[4] for word in span)
+    )
+    return region, len({word[6] for word in span})
+
+
+def extract_at(words: List[Word], region: Region, tolerance: float, max_lines: int) -> Optional[str]:
+    """
+    Read the text found at a region of the document.
+
+    A line is a candidate if one of its words has its center inside the region
+    expanded by the tolerance; the words that follow on the same line are
+    included too, so values longer than the learned ones are read completely.
+    When the shift brings more lines than learned into the region, only the
+    max_lines lines closest to the region are kept.
+
+    Args:
+        words (List[Word]): Words of the document
+        region (Region): Learned region of the field
+        tolerance (float): Allowed shift, as a fraction of the page size
+        max_lines (int): Number of text lines the learned value spans
+
+    Returns:
+        Optional[str]: Words found at the region (lines joined by spaces), or None
+    """
+    page, x0, y0, x1, y1 = region
+    lines: Dict[Tuple[int, int], List[Word]] = {}
+    for word in words:
+        if word[0] != page:
+            continue
+        center_x, center_y = (word[1] + word[3]) / 2, (word[2] + word[4]) / 2
+        if not (y0 - tolerance <= center_y <= y1 + tolerance):
+            continue
+        if x0 - tolerance <= center_x <= x1 + tolerance:
+            lines.setdefault(word[6], []).append(word)
+        elif word[6] in lines and word[1] >= x0:
+            lines[word[6]].append(word)
+
+    if not lines:
+        return None
+
+    def distance(line_words: List[Word]) -> float:
+        top = min(word[2] for word in line_words)
+        bottom = max(word[4] for word in line_words)
+        # Zero when the line is inside the learned vertical range
+        return max(0.0, y0 - top, bottom - y1) + abs(line_words[0][1] - x0)
+
+    closest = sorted(lines.values(), key=distance)[:max_lines]
+    # Back to reading order
+    closest.sort(key=lambda line_words: (line_words[0][2], line_words[0][1]))
+    return " ".join(word[5] for line_words in closest for word in line_words)
+
+
+def apply_layout_rules(
+    fields: Dict[str, Any],
+    snapshot: Dict[str, Any],
+    words: List[Word],
+    tolerance: float,
+    min_hits: int
+) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    Extract field values by looking up their learned positions.
+
+    Only positions confirmed by at least min_hits documents are used. A
+    positional value is only accepted if it passes validation: it must have
+    at least one alphanumeric token and fully match the field's regex rule
+    when the field has one. Otherwise the field stays pending for the LLM.
+
+    Args:
+        fields (Dict[str, Any]): Fields still pending (name: description)
+        snapshot (Dict[str, Any]): Rule snapshot of the label (see get_rule_snapshot)
+        words (List[Word]): Words of the document
+        tolerance (float): Allowed shift, as a fraction of the page size
+        min_hits (int): Number of consistent observations required to use a position
+
+    Returns:
+        Tuple[Dict[str, str], Dict[str, Any]]: Tuple containing:
+            - layout_results: Dictionary of values extracted by position
+            - remaining_fields: Dictionary of fields that still need the LLM
+    """
+    layout_results = {}
+    remaining_fields = {}
+
+    for field_name, description in fields.items():
+        layout = snapshot["layouts"].get(field_name)
+        value = None
+        if layout and layout["hits"] >= min_hits:
+            value = extract_at(words, layout["region"], tolerance, layout["lines"])
+        if value is not None and _is_valid(value, snapshot["rules"].get(field_name)):
+            layout_results[field_name] = value
+        else:
+            remaining_fields[field_name] = description
+
+    return layout_results, remaining_fields
+
+
+def _is_valid(value: str, rule_name: Optional[str]) -> bool:
+    """Validate a value read by position."""
+    if not _tokens(value):
+        return False
+    if rule_name in REGEX_LIBRARY and not (REGEX_LIBRARY[rule_name].fullmatch(value)
+                                           and is_valid_value(rule_name, value)):
+        return False
+    return True
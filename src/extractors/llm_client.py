@@ -0,0 +1,210 @@
+import time
+import random
+import threading
+from typing import Callable, Optional
+from openai import OpenAI, APIStatusError, APITimeoutError, APIConnectionError
+from src.core.metrics import LLM_REQUESTS, LLM_TOKENS, LLM_IN_FLIGHT
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens are refilled continuously at `rate` per second, up to `capacity`.
+    A rate of 0 (or less) disables the limiter. The clock and sleep functions
+    can be replaced (e.g. by a fake clock in tests).
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available and consume it."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            self._sleep(wait_time)
+
+
+class LLMClient:
+    """
+    Shared chat completion client with bounded concurrency, rate limiting and retries.
+
+    A single instance is meant to be shared by all worker threads: the underlying
+    OpenAI client keeps a pool of HTTP connections, a semaphore caps the number
+    of requests in flight, and a token bucket caps the request rate. Rate limit
+    (429), server (5xx), timeout and connection errors are retried with
+    exponential backoff and jitter, honoring the Retry-After header if present.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        max_concurrency: int = 4,
+        requests_per_second: float = 0,
+        max_retries: int = 4,
+        timeout: float = 60,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20
+    ):
+        # Retries are handled here, so the SDK's own retry loop is disabled
+        self._client = OpenAI(api_key=api_key, base_url=base_url or None, max_retries=0, timeout=timeout)
+        self._semaphore = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._bucket = TokenBucket(requests_per_second, max(1, max_concurrency))
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def complete(self, model: str, prompt: str, **kwargs) -> str:
+        """
+        Send a single-message chat completion and return the content of the answer.
+
+        Args:
+            model (str): Name of the LLM model
+            prompt (str): User message
+            **kwargs: Extra arguments for chat.completions.create (e.g. response_format)
+
+        Returns:
+            str: Content of the first choice
+
+        Raises:
+            openai.OpenAIError: If the request fails with a non-retryable error
+                or the retries are exhausted
+        """
+        def send() -> str:
+            response = self._client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                timeout=self.timeout,
+                **kwargs
+            )
+            _count_tokens(response)
+            return response.choices[0].message.content
+
+        return self._with_retries(send)
+
+    def complete_stream(self, model: str, prompt: str, on_delta: Callable[[str], None], **kwargs) -> str:
+        """
+        Like complete, but streams the answer: on_delta receives each piece of its content as it arrives.
+
+        A failed attempt is only retried while no content was received, so
+        on_delta never sees the same content twice.
+
+        Args:
+            model (str): Name of the LLM model
+            prompt (str): User message
+            on_delta (Callable[[str], None]): Receives each piece of the content, in order
+            **kwargs: Extra arguments for chat.completions.create (e.g. response_format)
+
+        Returns:
+            str: Whole content of the first choice
+
+        Raises:
+            openai.OpenAIError: If the request fails with a non-retryable error, the retries
+                are exhausted or the stream breaks after content was received
+        """
+        parts = []
+
+        def send() -> str:
+            stream = self._client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                timeout=self.timeout,
+                stream=True,
+                stream_options={"include_usage": True},
+                **kwargs
+            )
+            for chunk in stream:
+                # The last chunk has no choices, only the token usage
+                _count_tokens(chunk)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    on_delta(delta)
+            return "".join(parts)
+
+        return self._with_retries(send, can_retry=lambda: not parts)
+
+    def _with_retries(self, send: Callable[[], str], can_retry: Callable[[], bool] = lambda: True) -> str:
+        """Run a request within the concurrency and rate limits, retrying transient errors."""
+        attempt = 0
+        while True:
+            self._bucket.acquire()
+            try:
+                with self._semaphore:
+                    LLM_IN_FLIGHT.inc()
+                    try:
+                        content = send()
+                    finally:
+                        LLM_IN_FLIGHT.dec()
+                LLM_REQUESTS.inc(outcome="success")
+                return content
+            except (APIStatusError, APITimeoutError, APIConnectionError) as e:
+                if attempt >= self.max_retries or not _is_retryable(e) or not can_retry():
+                    LLM_REQUESTS.inc(outcome="error")
+                    raise
+                LLM_REQUESTS.inc(outcome="retry")
+                delay = self._backoff(attempt, e)
+                print(f"LLM request failed ({_describe(e)}), retrying in {delay:.2f}s "
+                      f"(attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                attempt += 1
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Delay before the next attempt: Retry-After if given, else exponential backoff with jitter."""
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+
+def _count_tokens(response) -> None:
+    """Record the token usage reported with a completion, if any."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    LLM_TOKENS.inc(usage.prompt_tokens or 0, kind="prompt")
+    LLM_TOKENS.inc(usage.completion_tokens or 0, kind="completion")
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and connection errors are worth retrying."""
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return True
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Read the Retry-After header (in seconds) of an HTTP error, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _describe(error: Exception) -> str:
+    """Short description of an API error for logs."""
+    if isinstance(error, APIStatusError):
+        return f"HTTP {error.status_code}"
+    return type(error).__name__
@@ -1,24 +1,86 @@
 import time
 import json
-from typing import Dict, Any
-from openai import OpenAI
-from src.core.config import get_openai_api_key
-from src.utils.text import decompose
+import threading
+from typing import Dict, Any, Optional, Callable
+from src.core.config import (
+    get_openai_api_key, OPENAI_BASE_URL, LLM_MAX_CONCURRENCY,
+    LLM_REQUESTS_PER_SECOND, LLM_MAX_RETRIES, LLM_TIMEOUT, LLM_CONTEXT_TOKEN_BUDGET, LLM_STREAM
+)
+from src.core import profiling
+from src.core.metrics import LLM_SECONDS, LLM_FIRST_FIELD_SECONDS
+from src.utils.context import select_context
+from src.utils.json_stream import IncrementalJSONObject
+from src.database.llm_cache import make_cache_key, get_cached_response, store_response
 
-api_key = get_openai_api_key()
-client = OpenAI(api_key=api_key)
+LLM_MODEL = "gpt-5-mini"
 
-def query_llm_fallback(fields_for_llm: Dict[str, Any], full_text: str) -> Dict[str, str]:
+# Shared by all worker threads: pooled connections, bounded concurrency, rate limit and retries
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """
+    Return the shared LLM client, creating it on first use.
+    The OpenAI SDK is only imported and the API key only read at that point,
+    so the pipeline starts fast and runs without a key when the LLM is not needed.
+    
+    Returns:
+        LLMClient: The shared client
+        
+    Raises:
+        ValueError: If OPENAI_API_KEY is not set
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from src.extractors.llm_client import LLMClient
+                _client = LLMClient(
+                    api_key=get_openai_api_key(),
+                    base_url=OPENAI_BASE_URL,
+                    max_concurrency=LLM_MAX_CONCURRENCY,
+                    requests_per_second=LLM_REQUESTS_PER_SECOND,
+                    max_retries=LLM_MAX_RETRIES,
+                    timeout=LLM_TIMEOUT
+                )
+    return _client
+
+def query_llm_fallback(fields_for_llm: Dict[str, Any], full_text: str, use_cache: bool = True,
+                       context_budget: Optional[int] = None,
+                       on_field: Optional[Callable[[str, Any], None]] = None) -> Dict[str, str]:
     """
     Query the LLM with optimized context and schema.
+    Long documents are trimmed to the spans most relevant to the pending fields
+    (see select_context). Responses are cached locally, so repeated requests
+    for the same context and fields do not call the API again.
+    With on_field (and LLM_STREAM enabled), the answer is streamed and each
+    field is passed to on_field as soon as its value is received.
     
     Args:
         fields_for_llm (Dict[str, Any]): Dictionary of field names and descriptions
         full_text (str): Full text content of the PDF
+        use_cache (bool): Set to False to bypass the LLM response cache
+        context_budget (Optional[int]): Token budget of the context (defaults to
+            LLM_CONTEXT_TOKEN_BUDGET, 0 sends the full text)
+        on_field (Optional[Callable[[str, Any], None]]): Receives the name and value of each
+            requested field while the answer is streamed
         
     Returns:
         Dict[str, str]: Dictionary of extracted values
     """
+    if context_budget is None:
+        context_budget = LLM_CONTEXT_TOKEN_BUDGET
+    context = select_context(full_text, fields_for_llm, context_budget)
+    if len(context) < len(full_text):
+        print(f"LLM context trimmed from {len(full_text)} to {len(context)} characters")
+
+    cache_key = make_cache_key(LLM_MODEL, fields_for_llm, context)
+    if use_cache:
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            print("LLM response served from cache")
+            profiling.annotate(llm_fields=len(fields_for_llm), context_length=len(context), llm_cached=True)
+            return cached
     
     prompt = f"""
         Extraia os dados do texto abaixo, seguindo o schema JSON.
@@ -28,27 +90,53 @@ def query_llm_fallback(fields_for_llm: Dict[str, Any], full_text: str) -> Dict[s
     {json.dumps(fields_for_llm, indent=2, ensure_ascii=False)}
 
     Texto:
-    {full_text}
+    {context}
     """
+    profiling.annotate(llm_fields=len(fields_for_llm), context_length=len(context), prompt_length=len(prompt),
+                       llm_cached=False)
     try:
         # Call OpenAI API with optimized settings
         start_time = time.time()
-        response = client.chat.completions.create(
-            model="gpt-5-mini",
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"}
-        )
+        if on_field is not None and LLM_STREAM:
+            content = get_client().complete_stream(LLM_MODEL, prompt,
+                                                   _field_publisher(fields_for_llm, on_field, start_time),
+                                                   response_format={"type": "json_object"})
+        else:
+            content = get_client().complete(LLM_MODEL, prompt, response_format={"type": "json_object"})
         duration = time.time() - start_time
+        LLM_SECONDS.observe(duration)
         
         print(f"LLM execution time: {duration:.2f} seconds")
         
         # Parse JSON response
         try:
-            return json.loads(response.choices[0].message.content)
+            results = json.loads(content)
         except json.JSONDecodeError as e:
             print(f"Error decoding JSON response: {str(e)}")
             return {}
+
+        if use_cache:
+            store_response(cache_key, LLM_MODEL, results)
+        return results
             
     except Exception as e:
         print(f"Error calling OpenAI API: {str(e)}")
         return {}
+
+def _field_publisher(fields_for_llm: Dict[str, Any], on_field: Callable[[str, Any], None],
+                     start_time: float) -> Callable[[str], None]:
+    """Build the stream callback parsing the answer and passing each requested field to on_field."""
+    parser = IncrementalJSONObject()
+    received = False
+
+    def on_delta(text: str) -> None:
+        nonlocal received
+        for field_name, value in parser.feed(text):
+            if field_name not in fields_for_llm:
+                continue
+            if not received:
+                received = True
+                LLM_FIRST_FIELD_SECONDS.observe(time.time() - start_time)
+            on_field(field_name, value)
+
+    return on_delta
@@ -1,8 +1,11 @@
 import fitz  # PyMuPDF
 import random
-from typing import Dict, Any, Tuple
-from src.database.db import get_regex_rule, is_field_conflicting
+from typing import Dict, Any, Tuple, List, Optional, Iterable, Iterator
+from src.core.metrics import REGEX_LOOKUPS, PDF_PAGES
+from src.database.db import get_rule_snapshot
 from src.utils.regex_library import REGEX_LIBRARY
+from src.utils.regex_synthesis import SYNTHESIZED_PREFIX, rule_pattern
+from src.utils.token_index import build_token_index, anchor_before, Token
 
 def extract_full_text(pdf_path: str) -> str:
     """
@@ -17,11 +20,127 @@ def extract_full_text(pdf_path: str) -> str:
     with fitz.open(pdf_path) as pdf:
         return "".join(page.get_text() for page in pdf)
 
+def extract_text_from_bytes(data: bytes) -> str:
+    """
+    Extract all text from a PDF already loaded in memory.
+    
+    Args:
+        data (bytes): Content of the PDF file
+        
+    Returns:
+        str: Full text content of the PDF
+    """
+    return "".join(iter_pages_text(data))
+
+def iter_pages_text(data: bytes) -> Iterator[str]:
+    """
+    Lazily extract the text of each page of a PDF already loaded in memory.
+    A page is only parsed when it is requested, so closing the generator
+    early skips the remaining pages.
+    
+    Args:
+        data (bytes): Content of the PDF file
+        
+    Yields:
+        str: Text content of each page, in order
+    """
+    with fitz.open(stream=data, filetype="pdf") as pdf:
+        parsed = 0
+        try:
+            for page in pdf:
+                parsed += 1
+                yield page.get_text()
+        finally:
+            PDF_PAGES.inc(parsed, state="parsed")
+            PDF_PAGES.inc(pdf.page_count - parsed, state="skipped")
+
+def read_pages(
+    pages: Iterable[str],
+    viable_schema: Dict[str, Any],
+    label: str,
+    db_conn
+) -> Tuple[str, bool, Dict[str, List[Token]]]:
+    """
+    Read the text of a document page by page, stopping as soon as the learned
+    rules resolve every field for good.
+    
+    The token index is extended with each new page and the rules are checked
+    against the text read so far. A later page can add candidates to a rule,
+    turning a unique match into an ambiguous one, so a field only counts as
+    resolved when its value cannot change with the pages left (see
+    _resolved_for_good); otherwise every page is read and the result is the
+    same as reading the whole document. Only the pages read are passed on:
+    when the LLM is needed, every page was read and the context is trimmed by
+    relevance as usual.
+    
+    Args:
+        pages (Iterable[str]): Text of each page, parsed lazily (see iter_pages_text)
+        viable_schema (Dict[str, Any]): Schema of fields to process
+        label (str): Document template identifier
+        db_conn: Database connection object
+        
+    Returns:
+        Tuple[str, bool, Dict[str, List[Token]]]: Tuple containing:
+            - text: Text of the pages read
+            - complete: Whether every page was read
+            - token_index: Token index of that text (see apply_heuristic_rules)
+    """
+    snapshot = get_rule_snapshot(db_conn, label)
+    library = _schema_library(viable_schema, snapshot)
+    can_stop = all(_learned_ordinal(field_name, snapshot) is not None for field_name in viable_schema)
+
+    parts = []
+    offset = 0
+    token_index: Dict[str, List[Token]] = {}
+    for page_text in pages:
+        for rule_name, tokens in build_token_index(page_text, library).items():
+            token_index.setdefault(rule_name, []).extend(
+                (start + offset, end + offset, word) for start, end, word in tokens)
+        parts.append(page_text)
+        offset += len(page_text)
+
+        if can_stop and all(_resolved_for_good(field_name, snapshot, token_index) for field_name in viable_schema):
+            return "".join(parts), False, token_index
+
+    return "".join(parts), True, token_index
+
+def _learned_ordinal(field_name: str, snapshot: Dict[str, Any]) -> Optional[int]:
+    """Position among the candidates learned for a field's library rule, when no anchor is used instead."""
+    if _field_rule(field_name, snapshot)[0] not in REGEX_LIBRARY:
+        return None
+    anchor, ordinal = snapshot["disambiguators"].get(field_name, (None, None))
+    return ordinal if anchor is None else None
+
+def _resolved_for_good(field_name: str, snapshot: Dict[str, Any], token_index: Dict[str, List[Token]]) -> bool:
+    """
+    Whether the value of a field found in the pages read so far is the one the
+    whole document gives.
+    
+    Later pages only append candidates, so the candidate at the learned
+    position stays the chosen one once it has been read. A unique match, an
+    anchored one or a synthesized pattern can still be made ambiguous by a
+    later page.
+    """
+    ordinal = _learned_ordinal(field_name, snapshot)
+    rule_name = _field_rule(field_name, snapshot)[0]
+    return ordinal is not None and ordinal < len(token_index.get(rule_name, []))
+
+def warm_up_pdf_engine() -> None:
+    """
+    Parse a blank in-memory PDF once, so the first real request does not pay
+    for PyMuPDF's lazy initialization.
+    """
+    with fitz.open() as pdf:
+        pdf.new_page()
+        data = pdf.tobytes()
+    extract_text_from_bytes(data)
+
 def apply_heuristic_rules(
     viable_schema: Dict[str, Any], 
     label: str, 
     full_text: str,
-    db_conn
+    db_conn,
+    token_index: Optional[Dict[str, List[Token]]] = None
 ) -> Tuple[Dict[str, str], Dict[str, Any]]:
     """
     Apply regex-based heuristic rules to extract field values.
@@ -31,6 +150,8 @@ def apply_heuristic_rules(
         label (str): Document template identifier
         full_text (str): Full text content of the PDF
         db_conn: Database connection object
+        token_index (Optional[Dict[str, List[Token]]]): Prebuilt token index of full_text,
+            built on demand if not provided
         
     Returns:
         Tuple[Dict[str, str], Dict[str, Any]]: Tuple containing:
@@ -40,35 +161,106 @@ def apply_heuristic_rules(
     # Initialize results
     heuristic_results = {}
     fields_for_llm = {}
+
+    # Load (or reuse) the rules of this label once for the whole document
+    snapshot = get_rule_snapshot(db_conn, label)
+
+    # Tokenize and classify the document once, shared by all fields.
+    # Only the rules used by this schema need to be classified.
+    if token_index is None:
+        token_index = build_token_index(full_text, _schema_library(viable_schema, snapshot))
     
     # Process each field in the viable schema
     for field_name, description in viable_schema.items():
-        # Skip fields that have been marked as having conflicting patterns
-        if is_field_conflicting(db_conn, label, field_name):
-            fields_for_llm[field_name] = description
-            continue
-            
-        # Get the saved regex rule for this field
-        rule_name = get_regex_rule(db_conn, label, field_name)
-        
-        if rule_name and rule_name in REGEX_LIBRARY:
-            # Get the compiled pattern for this rule
-            pattern = REGEX_LIBRARY[rule_name]
-            
-            # Split text into words and check each word against the pattern
-            matches = []
-            for word in full_text.split():
-                if pattern.fullmatch(word.strip()):
-                    matches.append(word.strip())
-            
-            if len(matches) == 1:
-                # Choose the match
-                heuristic_results[field_name] = matches[0]
-            else:
-                # Rule failed to find matches, send to LLM
-                fields_for_llm[field_name] = description
+        value, outcome = _match_field(field_name, snapshot, token_index, full_text)
+        if value is not None:
+            heuristic_results[field_name] = value
         else:
-            # No rule exists, send to LLM
+            # Conflicting field, no rule or the rule failed to find a single match: send to LLM
             fields_for_llm[field_name] = description
+        REGEX_LOOKUPS.inc(label=label, field=field_name, outcome=outcome)
     
     return heuristic_results, fields_for_llm
+
+def _schema_library(viable_schema: Dict[str, Any], snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """Patterns of the rules learned for the fields of a schema."""
+    rule_names = {_field_rule(field_name, snapshot)[0] for field_name in viable_schema}
+    return {name: rule_pattern(name) for name in rule_names if name is not None}
+
+def _field_rule(field_name: str, snapshot: Dict[str, Any]) -> Tuple[Optional[str], str]:
+    """
+    Rule used to look up a field: its learned library rule, or else the
+    pattern synthesized from its values (for fields no library rule fits).
+    
+    Returns:
+        Tuple[Optional[str], str]: The rule name (None if the field has no usable rule)
+            and, when there is none, the lookup outcome (no_rule or conflict)
+    """
+    rule_name = snapshot["rules"].get(field_name)
+    if field_name not in snapshot["conflicts"] and rule_name in REGEX_LIBRARY:
+        return rule_name, "hit"
+    pattern = snapshot.get("patterns", {}).get(field_name)
+    if pattern is not None:
+        return SYNTHESIZED_PREFIX + pattern, "hit"
+    return None, "conflict" if field_name in snapshot["conflicts"] else "no_rule"
+
+def _match_field(
+    field_name: str,
+    snapshot: Dict[str, Any],
+    token_index: Dict[str, List[Token]],
+    full_text: str
+) -> Tuple[Optional[str], str]:
+    """
+    Look up the value of a field with its learned rule.
+    
+    Returns:
+        Tuple[Optional[str], str]: The value (None if not resolved) and the lookup
+            outcome (hit, miss, no_rule or conflict)
+    """
+    # Get the saved regex rule for this field (conflicting fields only have a synthesized one)
+    rule_name, outcome = _field_rule(field_name, snapshot)
+    if rule_name is None:
+        return None, outcome
+
+    # Words of the document that fully match this rule
+    matches = token_index.get(rule_name, [])
+    if len(matches) > 1 and rule_name in REGEX_LIBRARY:
+        # Several candidates: use the learned anchor / position, if any.
+        # Synthesized patterns were validated to match a single token of their documents.
+        matches = _disambiguate(matches, snapshot["disambiguators"].get(field_name), full_text)
+    if len(matches) == 1:
+        return matches[0][2], "hit"
+    return None, "miss"
+
+def _disambiguate(
+    matches: List[Token],
+    disambiguator: Optional[Tuple[Optional[str], Optional[int]]],
+    full_text: str
+) -> List[Token]:
+    """
+    Narrow down the candidates of a rule that matches several tokens.
+    
+    The learned anchor is preferred: the candidate it precedes is taken if it
+    precedes exactly one. The learned position is only used when there is no
+    consistent anchor (e.g. unlabeled values), and only if it exists in this
+    document.
+    
+    Args:
+        matches (List[Token]): Tokens matching the field's rule, in document order
+        disambiguator (Optional[Tuple[Optional[str], Optional[int]]]): Learned (anchor, ordinal)
+        full_text (str): Full text content of the PDF
+        
+    Returns:
+        List[Token]: The chosen token alone, or all matches if none could be chosen
+    """
+    if disambiguator is None:
+        return matches
+    anchor, ordinal = disambiguator
+
+    if anchor is not None:
+        anchored = [token for token in matches if anchor_before(full_text, token[0]) == anchor]
+        return anchored if len(anchored) == 1 else matches
+
+    if ordinal is not None and 0 <= ordinal < len(matches):
+        return [matches[ordinal]]
+    return matches
@@ -2,162 +2,701 @@ import os
 import json
 import time
 import argparse
-import sqlite3
-from typing import Dict, Any
-from src.extractors.text_extractor import extract_full_text, apply_heuristic_rules
+import contextvars
+from collections import Counter
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, Future, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Iterator, Tuple, List, Optional, Callable
+from src.extractors.text_extractor import iter_pages_text, read_pages, apply_heuristic_rules
+from src.extractors.layout import extract_words, apply_layout_rules
 from src.extractors.llm_extractor import query_llm_fallback
-from src.database.db import init_db, DB_PATH
+from src.core.config import (
+    LAYOUT_TOLERANCE, LAYOUT_MIN_HITS, LLM_MAX_CONCURRENCY, DOCUMENT_DEADLINE_SECONDS,
+    NEAR_DUP_THRESHOLD, NEAR_DUP_MAX_DOCS, PROFILE_DIR, PROFILE_SLOW_SECONDS
+)
+from src.core import metrics, profiling
+from src.database.db import init_db, connection, get_rule_snapshot, rule_writer
 from src.database.learner import learn_from_llm
+from src.database.llm_cache import cache_stats
+from src.utils.dataset_io import find_dataset, iter_dataset, ResultWriter, parse_shard, shard_of, SHARD_KEYS
+from src.utils.minhash import NearDuplicateIndex, minhash_signature, reuse_verbatim_values
+from src.database.document_cache import (
+    doc_cache_stats, hash_content, hash_schema,
+    get_cached_text, store_text, get_cached_result, store_result
+)
 
+# Runs the LLM fallback of documents with a deadline, so the call can outlive
+# the document. Calls beyond the LLM client's concurrency limit would only wait
+# on its semaphore, so a few more threads than that are enough.
+_llm_executor = ThreadPoolExecutor(max_workers=2 * max(1, LLM_MAX_CONCURRENCY), thread_name_prefix="llm")
 
-def process_dataset(base_directory: str, progress_queue=None, output_path: str = None) -> list:
+# Extracted data of the recent documents of each label, found by text similarity
+near_duplicates = NearDuplicateIndex(NEAR_DUP_THRESHOLD, NEAR_DUP_MAX_DOCS)
+
+
+def process_item(item: Dict[str, Any], base_directory: str, db_conn, use_llm_cache: bool = True,
+                 use_doc_cache: bool = True, use_result_cache: bool = True, deadline: Optional[float] = None,
+                 on_update: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 background: Optional[List[Future]] = None, offline: bool = False,
+                 on_field: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
     """
-    Process a dataset from a directory containing 'dataset.json' and PDF files.
-    Implements the new 9-step Regex-First pipeline.
-    
+    Run the extraction pipeline for a single dataset item.
+    Byte-identical PDFs reuse the cached text, and the cached final result
+    when the same (label, schema) pair was already extracted.
+
     Args:
+        item (Dict[str, Any]): Dataset entry with 'pdf_path', 'label' and 'extraction_schema'
         base_directory (str): Path to the directory containing dataset.json
-        
+        db_conn: Database connection used to read the rules (see connection())
+        use_llm_cache (bool): Set to False to bypass the LLM response cache
+        use_doc_cache (bool): Set to False to bypass the text and result caches
+        use_result_cache (bool): Set to False to bypass only the final result cache
+        deadline (Optional[float]): Seconds after which the document is returned without
+            waiting for the LLM (see extract_document)
+        on_update (Optional[Callable[[Dict[str, Any]], None]]): Receives the complete result
+            (with metadata) when a late LLM answer arrives
+        background (Optional[List[Future]]): Receives the late LLM completions still running
+        offline (bool): Only use the learned rules, never the LLM (see extract_document)
+        on_field (Optional[Callable[[Dict[str, Any]], None]]): Receives each field of the LLM
+            answer as soon as it is streamed ('pdf_path', 'label', 'field' and 'value')
+
     Returns:
-        list: List of processing results with metadata
+        Dict[str, Any]: Result with metadata ('pdf_path', 'label', 'duration', 'extracted_data'),
+            the seconds spent in each stage ('timings'), the number of fields
+            resolved by each source ('sources': regex, near_dup, layout, llm, cache, pending
+            or unresolved), when the deadline was hit, the fields still waiting for the LLM
+            ('pending') and, in offline mode, the fields left unresolved ('unresolved')
+    """
+    pdf_path = item.get("pdf_path")
+    schema = item.get("extraction_schema")
+    label = item.get("label")
+
+    full_pdf_path = os.path.join(base_directory, "files", pdf_path)
+    print(f"\n--- Processing: {pdf_path} (Label: {label}) ---")
+
+    # Handle string schema
+    if isinstance(schema, str):
+        schema = json.loads(schema)
+
+    start_time = time.time()
+
+    # Step 3: Extract full text from PDF (cached by content hash)
+    with open(full_pdf_path, 'rb') as f:
+        pdf_bytes = f.read()
+
+    def publish_update(complete_result: Dict[str, Any], timings: Dict[str, float], sources: Dict[str, int]) -> None:
+        if on_update is not None:
+            on_update(_result_with_meta(pdf_path, label, start_time, complete_result, timings, sources))
+
+    def publish_field(field_name: str, value: Any) -> None:
+        on_field({"pdf_path": pdf_path, "label": label, "field": field_name, "value": value})
+
+    with profiling.document(pdf_path, label):
+        final_result, timings, sources, pending = extract_document(
+            pdf_bytes, label, schema, db_conn, use_llm_cache, use_doc_cache, use_result_cache,
+            deadline=deadline, on_update=publish_update, background=background, offline=offline,
+            on_field=publish_field if on_field is not None else None)
+
+    result = _result_with_meta(pdf_path, label, start_time, final_result, timings, sources)
+    if pending:
+        result["unresolved" if offline else "pending"] = pending
+    return result
+
+
+def extract_document(pdf_bytes: bytes, label: str, schema: Dict[str, Any], db_conn, use_llm_cache: bool = True,
+                     use_doc_cache: bool = True, use_result_cache: bool = True, deadline: Optional[float] = None,
+                     on_update: Optional[Callable[..., None]] = None,
+                     background: Optional[List[Future]] = None, offline: bool = False,
+                     on_field: Optional[Callable[[str, Any], None]] = None
+                     ) -> Tuple[Dict[str, Any], Dict[str, float], Dict[str, int], List[str]]:
+    """
+    Run the extraction pipeline on a PDF already loaded in memory.
+
+    With a deadline, the LLM fallback runs in the background: if it has not
+    answered when the deadline is reached, the heuristic and positional
+    results are returned right away, with the remaining fields set to None and
+    listed as pending. The LLM call keeps running; when it answers, the
+    learner still runs, the complete result is cached and passed to on_update.
+
+    In offline mode the LLM is never called: fields the learned rules, positions
+    and near-duplicates cannot resolve are set to None and listed as unresolved.
+
+    Args:
+        pdf_bytes (bytes): Content of the PDF file
+        label (str): Document type identifier
+        schema (Dict[str, Any]): Fields to extract (name: description)
+        db_conn: Database connection used to read the rules (see connection())
+        use_llm_cache (bool): Set to False to bypass the LLM response cache
+        use_doc_cache (bool): Set to False to bypass the text and result caches
+        use_result_cache (bool): Set to False to bypass only the final result cache
+        deadline (Optional[float]): Seconds the document may take (None or 0 waits for the LLM)
+        on_update (Optional[Callable[..., None]]): Called with the complete extracted data,
+            timings and sources when a late LLM answer arrives
+        background (Optional[List[Future]]): Receives a future for each late LLM answer,
+            resolved once it was learned from and published
+        offline (bool): Only use the learned rules, never the LLM
+        on_field (Optional[Callable[[str, Any], None]]): Receives the name and value of each
+            field of the LLM answer as soon as it is streamed (see query_llm_fallback)
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, float], Dict[str, int], List[str]]: Tuple containing:
+            - extracted_data: Dictionary of field names to values
+            - timings: Seconds spent in each stage
+            - sources: Number of fields resolved by each source (regex, near_dup, layout, llm, cache,
+              pending or unresolved)
+            - pending: Fields left without a value: waiting for a late LLM answer when the deadline
+              was hit, or unresolved in offline mode (empty otherwise)
+    """
+    # Time spent in each stage of the pipeline, and where each field came from
+    timings = {}
+    sources = {}
+    start_time = stage_start = time.perf_counter()
+
+    def end_stage(stage: str) -> None:
+        nonlocal stage_start
+        now = time.perf_counter()
+        timings[stage] = now - stage_start
+        metrics.STAGE_SECONDS.observe(timings[stage], stage=stage)
+        profiling.record_span(stage, stage_start, now)
+        stage_start = now
+
+    content_hash = hash_content(pdf_bytes)
+    schema_hash = hash_schema(schema)
+    end_stage("read")
+
+    if use_doc_cache and use_result_cache:
+        cached_result = get_cached_result(content_hash, label, schema_hash)
+        end_stage("cache")
+        if cached_result is not None:
+            print("Result served from document cache")
+            sources["cache"] = len(cached_result)
+            _observe_document(start_time, sources)
+            return cached_result, timings, sources, []
+
+    viable_schema = schema
+
+    full_text = get_cached_text(content_hash) if use_doc_cache else None
+    token_index = None
+    profiling.annotate(pdf_bytes=len(pdf_bytes), text_cached=full_text is not None)
+    if full_text is None:
+        # Pages are parsed lazily, and only until the learned rules resolve every field
+        with closing(iter_pages_text(pdf_bytes)) as pages:
+            full_text, complete, token_index = read_pages(pages, viable_schema, label, db_conn)
+        if not complete:
+            print("Every field resolved before the last page, remaining pages skipped")
+        elif use_doc_cache:
+            store_text(content_hash, full_text)
+    profiling.annotate(text_length=len(full_text))
+    end_stage("text")
+
+    # Step 6: Apply heuristic regex rules
+    heuristic_results, fields_for_llm = apply_heuristic_rules(
+        viable_schema, label, full_text, db_conn, token_index)
+    print(f"Fields extracted by regex: {len(heuristic_results)}")
+    end_stage("regex")
+
+    # Step 6a: Reuse the values of a near-duplicate document (e.g. a re-scan) of the
+    # same label, when they appear verbatim in this text. The signature is only computed
+    # for documents with pending fields: only those are looked up and indexed.
+    signature = None
+    near_dup_results = {}
+    if use_doc_cache and NEAR_DUP_THRESHOLD > 0 and fields_for_llm:
+        signature = minhash_signature(full_text)
+        if signature is not None:
+            match = near_duplicates.query(label, signature)
+            metrics.CACHE_LOOKUPS.inc(cache="near_dup", result="miss" if match is None else "hit")
+            if match is not None:
+                similarity, previous = match
+                near_dup_results, fields_for_llm = reuse_verbatim_values(fields_for_llm, previous, full_text)
+                print(f"Fields reused from a near-duplicate document (similarity {similarity:.2f}): "
+                      f"{len(near_dup_results)}")
+        end_stage("near_dup")
+
+    # Step 6b: Look up learned positions for the remaining fields.
+    # Word coordinates are only parsed when some field is still pending.
+    words = None
+    layout_results = {}
+    if fields_for_llm:
+        words = extract_words(pdf_bytes)
+        snapshot = get_rule_snapshot(db_conn, label)
+        layout_results, fields_for_llm = apply_layout_rules(
+            fields_for_llm, snapshot, words, LAYOUT_TOLERANCE, LAYOUT_MIN_HITS)
+        print(f"Fields extracted by position: {len(layout_results)}")
+        end_stage("layout")
+
+    partial_result = {
+        **heuristic_results,
+        **near_dup_results,
+        **layout_results
+    }
+    sources.update(regex=len(heuristic_results), near_dup=len(near_dup_results), layout=len(layout_results))
+
+    def complete(llm_results: Dict[str, Any]) -> Dict[str, Any]:
+        # # Step 9: Combine results
+        final_result = {**partial_result, **llm_results}
+        # Only complete results are cached (a failed LLM call returns no fields)
+        if use_doc_cache and use_result_cache and (llm_results or not fields_for_llm):
+            store_result(content_hash, label, schema_hash, final_result)
+        if signature is not None and (llm_results or not fields_for_llm):
+            evicted = near_duplicates.add(label, content_hash, signature, final_result)
+            if evicted:
+                metrics.CACHE_EVICTIONS.inc(evicted, cache="near_dup")
+        return final_result
+
+    # # Steps 7 and 8: LLM fallback if needed, and learning from its answer
+    llm_results = {}
+    pending = []
+    unresolved = []
+    if fields_for_llm and offline:
+        unresolved = list(fields_for_llm)
+        print(f"Offline mode, fields unresolved: {len(unresolved)}")
+    elif fields_for_llm and deadline:
+        # Run in the document's context, so the LLM call is still traced when profiling.
+        # The call gets its own timings: after the deadline it still adds them, but only to the late result.
+        llm_timings = dict(timings)
+        future = _llm_executor.submit(contextvars.copy_context().run, _complete_with_llm, label, fields_for_llm, full_text, words,
+                                      use_llm_cache, llm_timings, on_field)
+        try:
+            llm_results = future.result(timeout=max(0.0, deadline - (time.perf_counter() - start_time)))
+            timings.update(llm_timings)
+        except FutureTimeoutError:
+            pending = list(fields_for_llm)
+            print(f"Deadline of {deadline}s reached, fields pending: {len(pending)}")
+            metrics.DEADLINE_MISSES.inc()
+            late_sources = {**sources, "llm": len(pending)}
+            # Resolved once the late answer was learned from and published
+            published = Future()
+            if background is not None:
+                background.append(published)
+            future.add_done_callback(
+                lambda done: _publish_late_result(done, complete, on_update, llm_timings, late_sources, published))
+    elif fields_for_llm:
+        llm_results = _complete_with_llm(label, fields_for_llm, full_text, words, use_llm_cache, timings, on_field)
+
+    if pending:
+        sources["pending"] = len(pending)
+        final_result = {**partial_result, **{field_name: None for field_name in pending}}
+    elif unresolved:
+        # Incomplete, so not cached
+        sources["unresolved"] = len(unresolved)
+        final_result = {**partial_result, **{field_name: None for field_name in unresolved}}
+    else:
+        sources["llm"] = len(fields_for_llm)
+        final_result = complete(llm_results)
+
+    _observe_document(start_time, sources)
+    return final_result, timings, sources, pending or unresolved
+
+
+def _complete_with_llm(label: str, fields_for_llm: Dict[str, Any], full_text: str, words,
+                       use_llm_cache: bool, timings: Dict[str, float],
+                       on_field: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+    """Query the LLM for the pending fields and learn from its answer (steps 7 and 8)."""
+    stage_start = time.perf_counter()
+    llm_results = query_llm_fallback(fields_for_llm, full_text, use_cache=use_llm_cache, on_field=on_field)
+    print(f"Fields processed by LLM: {len(llm_results)}")
+    stage_end = time.perf_counter()
+    timings["llm"] = stage_end - stage_start
+    metrics.STAGE_SECONDS.observe(timings["llm"], stage="llm")
+    profiling.record_span("llm", stage_start, stage_end)
+
+    if llm_results:
+        stage_start = time.perf_counter()
+        learn_from_llm(label, llm_results, words, full_text)
+        stage_end = time.perf_counter()
+        timings["learn"] = stage_end - stage_start
+        metrics.STAGE_SECONDS.observe(timings["learn"], stage="learn")
+        profiling.record_span("learn", stage_start, stage_end)
+    return llm_results
+
+
+def _publish_late_result(future: Future, complete: Callable[[Dict[str, Any]], Dict[str, Any]],
+                         on_update: Optional[Callable[..., None]], timings: Dict[str, float],
+                         sources: Dict[str, int], published: Future) -> None:
+    """
+    Combine a late LLM answer with the partial result of its document and publish it.
+    Its pending fields are counted here (see _observe_document), once their source is known.
     """
-    dataset_path = os.path.join(base_directory, "dataset.json")
-    resultados_totais = []
-    
     try:
-        with open(dataset_path, 'r', encoding='utf-8') as f:
-            dataset = json.load(f)
-    except FileNotFoundError:
-        print(f"Error: 'dataset.json' not found in '{base_directory}'")
-        return
-    except json.JSONDecodeError:
-        print(f"Error: Failed to decode JSON file at '{dataset_path}'")
-        return
+        final_result = complete(future.result())
+        metrics.FIELDS.inc(sources["llm"], source="llm")
+        if on_update is not None:
+            on_update(final_result, dict(timings), sources)
+    except Exception as e:
+        metrics.FIELDS.inc(sources["llm"], source="unresolved")
+        print(f"Error completing document in background: {str(e)}")
+    finally:
+        published.set_result(None)
+
+
+def _observe_document(start_time: float, sources: Dict[str, int]) -> None:
+    """
+    Record the duration and field sources of a document in the metrics.
+    Fields pending past the deadline are only counted once the late answer is
+    published (see _publish_late_result), so each field is counted once.
+    """
+    metrics.DOCUMENT_SECONDS.observe(time.perf_counter() - start_time)
+    for source, count in sources.items():
+        if source != "pending":
+            metrics.FIELDS.inc(count, source=source)
+    profiling.annotate(sources=dict(sources))
+
+
+def _result_with_meta(pdf_path: str, label: str, start_time: float, final_result: Dict[str, Any],
+                      timings: Dict[str, float], sources: Dict[str, int]) -> Dict[str, Any]:
+    """Log the extracted data of a document and wrap it with its metadata."""
+    duration = time.time() - start_time
+    print(f"\nData extracted from {pdf_path} (in {duration:.2f}s):")
+    print(json.dumps(final_result, indent=2, ensure_ascii=False))
+
+    # # Add metadata to result
+    return {
+        "pdf_path": pdf_path,
+        "label": label,
+        "duration": duration,
+        "timings": timings,
+        "sources": sources,
+        "extracted_data": final_result
+    }
+
+
+def _is_valid_item(item: Dict[str, Any]) -> bool:
+    """Check that a dataset item has the information required by the pipeline."""
+    return all([item.get("pdf_path"), item.get("extraction_schema"), item.get("label")])
+
+
+def iter_dataset_results(base_directory: str, progress_queue=None, workers: int = 1,
+                         use_llm_cache: bool = True, use_doc_cache: bool = True,
+                         use_result_cache: bool = True,
+                         deadline: Optional[float] = DOCUMENT_DEADLINE_SECONDS,
+                         offline: bool = False, shard: Tuple[int, int] = (0, 1),
+                         shard_by: str = "index") -> Iterator[Dict[str, Any]]:
+    """
+    Stream the results of a dataset directory, in dataset order.
+
+    Items are read lazily from 'dataset.jsonl' or 'dataset.json' and at most
+    2 * workers documents are in flight or waiting to be yielded at any time,
+    so memory stays flat no matter how many items the dataset has.
+
+    With workers > 1, documents are processed concurrently so that PDF parsing,
+    heuristics and LLM calls of different documents overlap. Progress events are
+    emitted as documents finish, while the yielded results keep the dataset order.
+
+    With a deadline, documents whose LLM call takes longer are yielded with
+    their pending fields set to None; when the LLM answers, an "update" event
+    with the complete result is put on the progress queue. The iteration only
+    ends once every late answer was received and learned from.
+
+    While the LLM answer of a document is streamed, a "field" event is put on
+    the progress queue for each field as soon as its value is received, before
+    the "item" event of the document.
+
+    Args:
+        base_directory (str): Path to the directory containing the dataset
+        progress_queue: Optional queue receiving progress events
+        workers (int): Number of documents processed concurrently
+        use_llm_cache (bool): Set to False to bypass the LLM response cache
+        use_doc_cache (bool): Set to False to bypass the text and result caches
+        use_result_cache (bool): Set to False to bypass only the final result cache
+        deadline (Optional[float]): Seconds each document may take before it is returned
+            without waiting for the LLM (None or 0 waits)
+        offline (bool): Only use the learned rules, never the LLM; the fields left
+            unresolved are listed in each result ('unresolved')
+        shard (Tuple[int, int]): Only process the items of shard I of N, given as (I, N)
+        shard_by (str): How items are assigned to shards, 'index' or 'label' (see shard_of)
+
+    Yields:
+        Dict[str, Any]: Processing results with metadata
+
+    Raises:
+        FileNotFoundError: If the directory has no dataset file
+        json.JSONDecodeError: If the dataset file cannot be decoded
+    """
+    dataset_path = find_dataset(base_directory)
+    if dataset_path is None:
+        raise FileNotFoundError(f"No dataset file found in '{base_directory}'")
+
+    shard_index, shard_count = shard
+
+    def shard_items():
+        for position, item in enumerate(iter_dataset(dataset_path)):
+            if shard_of(position, item, shard_count, shard_by) == shard_index:
+                yield item
+
+    # Count the valid items up front (streaming) so progress events carry a total
+    total = sum(1 for item in shard_items() if _is_valid_item(item))
 
     # Initialize database
     init_db()
-    
-    # Create DB connection for the processing session
-    # check_same_thread=False allows this connection to be used safely in Flask threads
-    with sqlite3.connect(DB_PATH, check_same_thread=False) as db_conn:
-        total = len(dataset)
-        processed = 0
-        for item in dataset:
-            pdf_path = item.get("pdf_path")
-            schema = item.get("extraction_schema")
-            label = item.get("label")
-
-            if not all([pdf_path, schema, label]):
+
+    processed = 0
+    # Late LLM answers of documents that hit the deadline
+    background = []
+
+    def valid_items():
+        for item in shard_items():
+            if not _is_valid_item(item):
                 print("Error: Dataset item missing required information.")
                 continue
+            yield item
 
-            full_pdf_path = os.path.join(base_directory, "files", pdf_path)
-            print(f"\n--- Processing: {pdf_path} (Label: {label}) ---")
-
-            try:
-                # Handle string schema
-                if isinstance(schema, str):
-                    schema = json.loads(schema)
-
-                start_time = time.time()
-
-                # Step 3: Extract full text from PDF
-                full_text = extract_full_text(full_pdf_path)
-
-                viable_schema = schema
-
-                # Step 6: Apply heuristic regex rules
-                heuristic_results, fields_for_llm = apply_heuristic_rules(
-                    viable_schema, label, full_text, db_conn)
-                print(f"Fields extracted by regex: {len(heuristic_results)}")
-
-                # # Step 7: LLM fallback if needed
-                llm_results = {}
-                if fields_for_llm:
-                    llm_results = query_llm_fallback(fields_for_llm, full_text)
-                    print(f"Fields processed by LLM: {len(llm_results)}")
-
-                # # Step 8: Learn from successful LLM extractions
-                if llm_results:
-                    learn_from_llm(label, llm_results, db_conn)
-
-                # # Step 9: Combine results
-                final_result = {
-                    **heuristic_results,
-                    **llm_results
-                }
-
-                duration = time.time() - start_time
-                print(f"\nData extracted (in {duration:.2f}s):")
-                print(json.dumps(final_result, indent=2, ensure_ascii=False))
-                
-                # # Add metadata to result
-                result_with_meta = {
-                    "pdf_path": pdf_path,
-                    "label": label,
-                    "duration": duration,
-                    "extracted_data": final_result
-                }
-                resultados_totais.append(result_with_meta)
-                # push progress update if queue is provided
-                processed += 1
-                if progress_queue is not None:
-                    progress_queue.put({
-                        "type": "item",
-                        "pdf_path": pdf_path,
-                        "label": label,
-                        "duration": duration,
-                        "extracted_data": final_result,
-                        "processed": processed,
-                        "total": total
-                    })
-                
-            except FileNotFoundError:
-                print(f"Error: PDF file not found at '{full_pdf_path}'")
-                if progress_queue is not None:
-                    progress_queue.put({"type": "error", "pdf_path": pdf_path, "error": "file_not_found"})
-            except Exception as e:
-                print(f"Unexpected error processing file {pdf_path}: {str(e)}")
-                if progress_queue is not None:
-                    progress_queue.put({"type": "error", "pdf_path": pdf_path, "error": str(e)})
-            
-            print("-" * 40)
-
-    # Optionally write results to output_path
-    if output_path:
+    def run(item: Dict[str, Any]):
         try:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(resultados_totais, f, indent=2, ensure_ascii=False)
+            # Each worker reads the rules through its own pooled connection
+            with connection() as db_conn:
+                return process_item(item, base_directory, db_conn, use_llm_cache,
+                                    use_doc_cache, use_result_cache, deadline, publish_update, background,
+                                    offline, publish_field if progress_queue is not None else None), None
+        except FileNotFoundError:
+            full_pdf_path = os.path.join(base_directory, "files", item["pdf_path"])
+            print(f"Error: PDF file not found at '{full_pdf_path}'")
+            return None, "file_not_found"
         except Exception as e:
-            print(f"Error writing output file {output_path}: {e}")
+            print(f"Unexpected error processing file {item['pdf_path']}: {str(e)}")
+            return None, str(e)
+        finally:
+            print("-" * 40)
+
+    def report(item: Dict[str, Any], result, error) -> None:
+        nonlocal processed
+        metrics.DOCUMENTS.inc(status="ok" if error is None else "error")
+        if error is not None:
+            if progress_queue is not None:
+                progress_queue.put({"type": "error", "pdf_path": item["pdf_path"], "error": error})
+            return
+
+        # push progress update if queue is provided
+        processed += 1
+        if progress_queue is not None:
+            progress_queue.put({
+                "type": "item",
+                **result,
+                "processed": processed,
+                "total": total
+            })
+
+    def publish_update(result: Dict[str, Any]) -> None:
+        # Called from the LLM threads; queue.Queue and Job are thread-safe
+        if progress_queue is not None:
+            progress_queue.put({"type": "update", **result})
+
+    def publish_field(event: Dict[str, Any]) -> None:
+        # Called from the thread running the LLM call, while its answer is streamed
+        progress_queue.put({"type": "field", **event})
+
+    try:
+        yield from _iter_results(valid_items(), run, report, workers)
+    finally:
+        # Late LLM answers still learn, and learned rules may still be queued
+        wait(background)
+        rule_writer.flush()
+
+
+def _iter_results(items: Iterator[Dict[str, Any]], run: Callable, report: Callable,
+                  workers: int) -> Iterator[Dict[str, Any]]:
+    """Run the items sequentially or in a bounded window of workers, yielding in dataset order."""
+    if workers <= 1:
+        for item in items:
+            result, error = run(item)
+            report(item, result, error)
+            if result is not None:
+                yield result
+        return
+
+    window = 2 * workers
+    # Futures still running, and finished results waiting for their turn,
+    # indexed by dataset position so the output order does not depend on
+    # which document finishes first
+    running = {}
+    finished = {}
+    next_index = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        items = enumerate(items)
+        exhausted = False
+        while not exhausted or running:
+            # Keep the pipeline full, but never hold more than `window` documents
+            while not exhausted and len(running) + len(finished) < window:
+                entry = next(items, None)
+                if entry is None:
+                    exhausted = True
+                    break
+                index, item = entry
+                running[executor.submit(run, item)] = (index, item)
+            metrics.QUEUE_DEPTH.set(len(running), state="running")
+
+            if not running:
+                continue
+
+            # Item and error events are emitted from this thread only, in completion order
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, item = running.pop(future)
+                result, error = future.result()
+                report(item, result, error)
+                finished[index] = result
+
+            while next_index in finished:
+                result = finished.pop(next_index)
+                next_index += 1
+                if result is not None:
+                    yield result
+            metrics.QUEUE_DEPTH.set(len(running), state="running")
+            metrics.QUEUE_DEPTH.set(len(finished), state="waiting")
+
+
+def process_dataset(base_directory: str, progress_queue=None, output_path: str = None, workers: int = 1,
+                    use_llm_cache: bool = True, use_doc_cache: bool = True, use_result_cache: bool = True,
+                    keep_results: bool = True, deadline: Optional[float] = DOCUMENT_DEADLINE_SECONDS,
+                    offline: bool = False) -> list:
+    """
+    Process a dataset from a directory containing 'dataset.json' (or 'dataset.jsonl') and PDF files.
+    Implements the new 9-step Regex-First pipeline.
+
+    Results are appended to output_path as soon as each document is done
+    (see iter_dataset_results for ordering and concurrency).
+    
+    Args:
+        base_directory (str): Path to the directory containing the dataset
+        progress_queue: Optional queue receiving progress events
+        output_path (str): Optional path where the results are written ('.jsonl' for JSON lines)
+        workers (int): Number of documents processed concurrently
+        use_llm_cache (bool): Set to False to bypass the LLM response cache
+        use_doc_cache (bool): Set to False to bypass the text and result caches
+        use_result_cache (bool): Set to False to bypass only the final result cache
+        keep_results (bool): Set to False to only stream results to output_path
+        deadline (Optional[float]): Seconds each document may take before it is returned
+            without waiting for the LLM; late answers are published as "update" events
+        offline (bool): Only use the learned rules, never the LLM
+        
+    Returns:
+        list: List of processing results with metadata (empty if keep_results is False)
+    """
+    resultados_totais = []
+    count = 0
+    writer = None
+
+    try:
+        if output_path:
+            writer = ResultWriter(output_path)
+        for result in iter_dataset_results(base_directory, progress_queue, workers,
+                                           use_llm_cache, use_doc_cache, use_result_cache, deadline, offline):
+            count += 1
+            if writer is not None:
+                writer.write(result)
+            if keep_results:
+                resultados_totais.append(result)
+    except FileNotFoundError:
+        print(f"Error: dataset file not found in '{base_directory}'")
+        return
+    except json.JSONDecodeError:
+        print(f"Error: Failed to decode dataset file in '{base_directory}'")
+        return
+    except OSError as e:
+        print(f"Error writing output file {output_path}: {e}")
+        return
+    finally:
+        if writer is not None:
+            writer.close()
     
     # final progress message - send this so the client knows processing is complete
     if progress_queue is not None:
-        progress_queue.put({"type": "finished", "count": len(resultados_totais)})
+        progress_queue.put({"type": "finished", "count": count})
 
     return resultados_totais
 
+class LateResultPrinter:
+    """Progress sink of the CLI: prints the results completed after their deadline."""
+
+    def put(self, event: Dict[str, Any]) -> None:
+        if event.get("type") == "update":
+            print(f"\nResultado atualizado após o prazo: {event['pdf_path']}")
+            print(json.dumps(event["extracted_data"], indent=2, ensure_ascii=False))
+
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Extrai dados de PDFs com base em um dataset.json.")
-    parser.add_argument("directory", type=str, help="O caminho para o diretório de teste contendo 'dataset.json' e os arquivos PDF.")
-    parser.add_argument("--output", type=str, help="Caminho para salvar o JSON com os resultados.", default="resultados.json")
+    parser = argparse.ArgumentParser(description="Extrai dados de PDFs com base em um dataset.json (ou dataset.jsonl).")
+    parser.add_argument("directory", type=str, help="O caminho para o diretório de teste contendo 'dataset.json' (ou 'dataset.jsonl') e os arquivos PDF.")
+    parser.add_argument("--output", type=str, help="Caminho para salvar o JSON com os resultados ('.jsonl' grava um resultado por linha).", default="resultados.json")
+    parser.add_argument("--workers", type=int, help="Número de documentos processados em paralelo.", default=1)
+    parser.add_argument("--no-llm-cache", action="store_true", help="Ignora o cache de respostas da LLM.")
+    parser.add_argument("--no-doc-cache", action="store_true", help="Ignora o cache de textos e resultados por conteúdo do PDF.")
+    parser.add_argument("--no-result-cache", action="store_true", help="Ignora apenas o cache de resultados finais.")
+    parser.add_argument("--deadline", type=float, default=DOCUMENT_DEADLINE_SECONDS,
+                        help="Prazo por documento, em segundos: depois dele o documento é gravado sem esperar a LLM "
+                             "(campos pendentes ficam null) e a resposta tardia ainda é usada para aprender (0 desativa).")
+    parser.add_argument("--offline", action="store_true",
+                        help="Usa apenas as regras aprendidas, sem chamar a LLM (não precisa de OPENAI_API_KEY); "
+                             "os campos não resolvidos ficam null e são listados no resumo.")
+    parser.add_argument("--shard", type=parse_shard, default=(0, 1), metavar="I/N",
+                        help="Processa apenas a parte I de N do dataset (ex: 0/4), para dividir um lote entre "
+                             "processos ou máquinas (veja python -m src.shard).")
+    parser.add_argument("--shard-by", choices=SHARD_KEYS, default="index",
+                        help="Divide o dataset por posição dos itens ou por label (padrão: index).")
+    parser.add_argument("--profile", action="store_true",
+                        help="Mede cada etapa de cada documento e gera um relatório do cProfile por função em "
+                             "--profile-dir; documentos mais lentos que --slow-threshold têm o trace detalhado salvo.")
+    parser.add_argument("--profile-dir", type=str, default=PROFILE_DIR,
+                        help=f"Diretório dos relatórios de --profile (padrão: {PROFILE_DIR}).")
+    parser.add_argument("--slow-threshold", type=float, default=PROFILE_SLOW_SECONDS,
+                        help="Latência, em segundos, a partir da qual o trace de um documento é salvo em "
+                             "<profile-dir>/slow/ (0 desativa).")
     args = parser.parse_args()
 
     if not os.path.isdir(args.directory):
         print(f"Erro: O diretório '{args.directory}' não foi encontrado.")
         exit(1)
 
+    if args.profile:
+        profiling.enable(args.profile_dir, args.slow_threshold)
+
     print("Iniciando processamento...")
     start_time = time.time()
     
-    resultados = process_dataset(args.directory)
-    
-    if resultados:
-        # Salva os resultados em um arquivo JSON
-        with open(args.output, 'w', encoding='utf-8') as f:
-            json.dump(resultados, f, indent=2, ensure_ascii=False)
-        print(f"\nResultados salvos em: {args.output}")
+    # Cada resultado é gravado assim que o documento termina, sem manter a lista em memória
+    unresolved = Counter()
+    try:
+        with ResultWriter(args.output) as writer:
+            for resultado in iter_dataset_results(args.directory, progress_queue=LateResultPrinter(),
+                                                  workers=args.workers,
+                                                  use_llm_cache=not args.no_llm_cache,
+                                                  use_doc_cache=not args.no_doc_cache,
+                                                  use_result_cache=not args.no_result_cache,
+                                                  deadline=args.deadline,
+                                                  offline=args.offline,
+                                                  shard=args.shard, shard_by=args.shard_by):
+                writer.write(resultado)
+                unresolved.update((resultado["label"], field_name) for field_name in resultado.get("unresolved", []))
+    except FileNotFoundError:
+        print(f"Erro: Nenhum 'dataset.json' ou 'dataset.jsonl' encontrado em '{args.directory}'.")
+        exit(1)
+    except json.JSONDecodeError:
+        print(f"Erro: Falha ao decodificar o dataset em '{args.directory}'.")
+        exit(1)
+    print(f"\nResultados salvos em: {args.output}")
 
     duration = time.time() - start_time
     print(f"\nProcesso completo em: {duration:.2f}s")
-    print(f"Total de documentos processados: {len(resultados) if resultados else 0}")
+    print(f"Total de documentos processados: {writer.count}")
+    if args.offline:
+        print(f"Campos não resolvidos sem a LLM: {sum(unresolved.values())}")
+        for (label, field_name), count in unresolved.most_common():
+            print(f"  {label}.{field_name}: {count} documento(s)")
+    print(f"Cache da LLM: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['evictions']} evictions")
+    print(f"Cache de documentos: textos {doc_cache_stats['text_hits']} hits / {doc_cache_stats['text_misses']} misses, "
+          f"resultados {doc_cache_stats['result_hits']} hits / {doc_cache_stats['result_misses']} misses, "
+          f"{doc_cache_stats['evictions']} evictions")
+    print("\nMétricas:")
+    print(json.dumps(metrics.summary(), indent=2, ensure_ascii=False))
+
+    if args.profile:
+        profile_summary = profiling.profiler.summary()
+        print("\nPerfil por etapa (s):")
+        for stage, values in profile_summary["stages"].items():
+            print(f"  {stage:<10} total {values['total']:.3f}  média {values['mean']:.3f}")
+        print("Funções com maior tempo próprio:")
+        for row in profile_summary["functions"][:10]:
+            print(f"  {row['tottime']:>9.3f}s {row['calls']:>8} chamadas  {row['function']}")
+        if profile_summary["slow_traces"]:
+            print(f"Documentos lentos (>= {args.slow_threshold}s): {len(profile_summary['slow_traces'])}")
+        print(f"Relatórios salvos em: {', '.join(profiling.profiler.save())}")
@@ -0,0 +1,222 @@
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Dict, Any, List, Optional, Tuple
+from src.core.config import LAYOUT_TOLERANCE
+from src.database.db import DB_PATH, RuleUpdate, init_db, connection, apply_rule_updates, rule_updates_from_store
+from src.database.learner import rule_updates_from_llm
+from src.extractors.layout import extract_words
+from src.extractors.text_extractor import extract_text_from_bytes
+from src.utils.dataset_io import iter_dataset
+from src.utils.regex_library import REGEX_LIBRARY
+
+PACK_FORMAT = "rule-pack"
+PACK_VERSION = 1
+
+# Attributes of each kind of rule in a pack, after "kind", "label" and "field"
+PACK_FIELDS = {
+    "regex": ("rule",),
+    "conflict": (),
+    "disambiguator": ("anchor", "ordinal"),
+    "layout": ("region", "lines", "hits", "conflicting"),
+    "examples": ("examples",),
+}
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_example(example: Any) -> bool:
+    return (isinstance(example, dict) and isinstance(example.get("value"), str) and _is_int(example.get("documents"))
+            and isinstance(example.get("competitors"), list)
+            and all(isinstance(lengths, list) and all(_is_int(length) for length in lengths)
+                    for lengths in example["competitors"]))
+
+
+# Check of each attribute of a pack rule, so a malformed pack is rejected before anything is applied
+PACK_CHECKS = {
+    "rule": lambda value: isinstance(value, str),
+    "anchor": lambda value: value is None or isinstance(value, str),
+    "ordinal": lambda value: value is None or _is_int(value),
+    "region": lambda value: (isinstance(value, (list, tuple)) and len(value) == 5 and _is_int(value[0])
+                             and all(_is_number(coordinate) for coordinate in value[1:])),
+    "lines": lambda value: _is_int(value) and value >= 1,
+    "hits": lambda value: _is_int(value) and value >= 0,
+    "conflicting": lambda value: isinstance(value, bool),
+    "examples": lambda value: isinstance(value, list) and all(_is_example(example) for example in value),
+}
+
+
+def export_rule_pack(conn, labels: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Export the learned rules, conflicts, disambiguators, positional templates and
+    synthesis examples as a rule pack.
+
+    Args:
+        conn: Database connection object
+        labels (Optional[List[str]]): Only export these document types (all by default)
+
+    Returns:
+        Dict[str, Any]: JSON-serializable rule pack
+    """
+    rules = []
+    for kind, label, field_name, *args in rule_updates_from_store(conn, LAYOUT_TOLERANCE):
+        if labels and label not in labels:
+            continue
+        # Layout templates are stored without the tolerance, which is a setting of the importing node
+        kind = "layout" if kind == "layout_rule" else kind
+        values = args[:len(PACK_FIELDS[kind])]
+        rules.append({"kind": kind, "label": label, "field": field_name, **dict(zip(PACK_FIELDS[kind], values))})
+    return {
+        "format": PACK_FORMAT,
+        "version": PACK_VERSION,
+        "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "labels": sorted({rule["label"] for rule in rules}),
+        "rules": rules
+    }
+
+
+def rule_updates_from_pack(pack: Dict[str, Any], tolerance: float) -> List[RuleUpdate]:
+    """
+    Convert a rule pack into rule updates.
+    Applying them (see apply_rule_updates) merges the pack into the store with
+    the usual conflict semantics, so importing the same pack twice changes nothing.
+
+    Args:
+        pack (Dict[str, Any]): Rule pack (see export_rule_pack)
+        tolerance (float): Allowed shift between positions, as a fraction of the page size
+
+    Returns:
+        List[RuleUpdate]: Updates to apply, in order
+
+    Raises:
+        ValueError: If the data is not a rule pack of a supported version, or a rule
+            is malformed (missing attributes or attributes of the wrong type)
+    """
+    if not isinstance(pack, dict) or pack.get("format") != PACK_FORMAT:
+        raise ValueError("Not a rule pack")
+    if pack.get("version") != PACK_VERSION:
+        raise ValueError(f"Unsupported rule pack version: {pack.get('version')}")
+    if not isinstance(pack.get("rules", []), list):
+        raise ValueError("Invalid rule pack: 'rules' is not a list")
+
+    updates = []
+    for rule in pack.get("rules", []):
+        kind = rule.get("kind") if isinstance(rule, dict) else None
+        if (kind not in PACK_FIELDS or not isinstance(rule.get("label"), str) or not isinstance(rule.get("field"), str)
+                or not all(name in rule and PACK_CHECKS[name](rule[name]) for name in PACK_FIELDS[kind])):
+            raise ValueError(f"Invalid rule in pack: {rule}")
+        if kind == "regex" and rule["rule"] not in REGEX_LIBRARY:
+            print(f"Skipping unknown regex rule '{rule['rule']}' for field '{rule['field']}' in label '{rule['label']}'")
+            continue
+        values = [rule.get(name) for name in PACK_FIELDS[kind]]
+        if kind == "layout":
+            region, lines, hits, conflicting = values
+            updates.append(("layout_rule", rule["label"], rule["field"], tuple(region), lines, hits,
+                            bool(conflicting), tolerance))
+        else:
+            updates.append((kind, rule["label"], rule["field"], *values))
+    return updates
+
+
+def rule_updates_from_results(results_path: str, files_dir: str) -> Tuple[List[RuleUpdate], int, int]:
+    """
+    Learn rules offline from a labeled results file (e.g. test/resultados.json),
+    as if each result had been answered by the LLM.
+
+    Values are matched against the regex library (see find_matching_rule).
+    When the PDF of a result is found in files_dir, positional templates and
+    disambiguators are learned from it too.
+
+    Args:
+        results_path (str): Results file with 'pdf_path', 'label' and 'extracted_data'
+        files_dir (str): Directory containing the PDF files
+
+    Returns:
+        Tuple[List[RuleUpdate], int, int]: Updates to apply, number of results learned
+            from and number of them whose PDF was not found
+    """
+    updates = []
+    learned = 0
+    missing = 0
+    for result in iter_dataset(results_path):
+        label = result.get("label")
+        extracted_data = result.get("extracted_data")
+        if not label or not isinstance(extracted_data, dict):
+            continue
+
+        words = None
+        full_text = None
+        pdf_path = os.path.join(files_dir, result.get("pdf_path") or "")
+        if os.path.isfile(pdf_path):
+            with open(pdf_path, 'rb') as f:
+                pdf_bytes = f.read()
+            full_text = extract_text_from_bytes(pdf_bytes)
+            words = extract_words(pdf_bytes)
+        else:
+            missing += 1
+        updates.extend(rule_updates_from_llm(label, extracted_data, words, full_text))
+        learned += 1
+    return updates, learned, missing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta, importa e aprende regras offline, para que novas "
+                                                 "instalações comecem com as regras já aprendidas.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help=f"Exporta as regras de {DB_PATH} para um pacote JSON.")
+    export_parser.add_argument("pack", type=str, help="Arquivo do pacote de regras a criar.")
+    export_parser.add_argument("--labels", nargs="+", help="Exporta apenas estes labels.")
+
+    import_parser = commands.add_parser("import", help="Incorpora pacotes de regras ao banco; regras divergentes "
+                                                       "viram conflito, como no aprendizado normal.")
+    import_parser.add_argument("packs", nargs="+", help="Pacotes de regras a importar.")
+
+    learn_parser = commands.add_parser("learn", help="Aprende regras de um arquivo de resultados já rotulado "
+                                                     "(ex: test/resultados.json), sem chamar a LLM.")
+    learn_parser.add_argument("results", type=str, help="Arquivo de resultados ('.json' ou '.jsonl').")
+    learn_parser.add_argument("--files", type=str,
+                              help="Diretório dos PDFs, para aprender também as posições (padrão: files/ ao lado "
+                                   "do arquivo de resultados).")
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "export":
+        with connection() as conn:
+            pack = export_rule_pack(conn, args.labels)
+        with open(args.pack, 'w', encoding='utf-8') as f:
+            json.dump(pack, f, indent=2, ensure_ascii=False)
+        print(f"{len(pack['rules'])} regras de {len(pack['labels'])} labels exportadas para {args.pack}")
+
+    elif args.command == "import":
+        for path in args.packs:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    updates = rule_updates_from_pack(json.load(f), LAYOUT_TOLERANCE)
+            except (OSError, ValueError) as e:
+                print(f"Erro: não foi possível importar '{path}': {e}")
+                sys.exit(1)
+            # One transaction per pack
+            with connection() as conn:
+                changed = apply_rule_updates(conn, updates)
+            print(f"{path}: {len(updates)} regras lidas, {changed} alterações no banco")
+
+    else:
+        files_dir = args.files or os.path.join(os.path.dirname(os.path.abspath(args.results)), "files")
+        try:
+            updates, learned, missing = rule_updates_from_results(args.results, files_dir)
+        except (OSError, ValueError) as e:
+            print(f"Erro: não foi possível ler '{args.results}': {e}")
+            sys.exit(1)
+        with connection() as conn:
+            changed = apply_rule_updates(conn, updates)
+        print(f"{learned} resultados lidos ({missing} sem o PDF, apenas regex), {len(updates)} regras aprendidas, "
+              f"{changed} alterações no banco")
@@ -0,0 +1,173 @@
+import os
+import sys
+import sqlite3
+import argparse
+import tempfile
+import subprocess
+from typing import List, Tuple
+from src.core.config import LAYOUT_TOLERANCE
+from src.database.db import DB_PATH, init_db, connection, apply_rule_updates, rule_updates_from_store
+from src.utils.dataset_io import find_dataset, iter_dataset, shard_of, ResultWriter, SHARD_KEYS
+
+
+def merge_results(dataset_path: str, result_paths: List[str], shard_by: str, output_path: str) -> int:
+    """
+    Merge the outputs of the shards of a dataset into one results file, in dataset order.
+
+    Each shard writes its results in dataset order, so the outputs are merged
+    while streaming: every dataset item takes the next result of its shard.
+    Items that failed in their shard have no result and are skipped.
+
+    Args:
+        dataset_path (str): Dataset file that was sharded
+        result_paths (List[str]): Output of each shard, in shard order ('.json' or '.jsonl')
+        shard_by (str): How items were assigned to shards ('index' or 'label')
+        output_path (str): Merged results file ('.jsonl' for JSON lines)
+
+    Returns:
+        int: Number of results written
+    """
+    shards = [iter_dataset(path) if os.path.exists(path) else iter(()) for path in result_paths]
+    heads = [next(shard, None) for shard in shards]
+    with ResultWriter(output_path) as writer:
+        for position, item in enumerate(iter_dataset(dataset_path)):
+            index = shard_of(position, item, len(shards), shard_by)
+            head = heads[index]
+            if head is not None and head.get("pdf_path") == item.get("pdf_path"):
+                writer.write(head)
+                heads[index] = next(shards[index], None)
+    return writer.count
+
+
+def merge_rules(rule_paths: List[str]) -> int:
+    """
+    Merge the rules learned in other databases into the rule store.
+
+    Rules are merged with the usual conflict semantics (see rule_updates_from_store),
+    each database in one transaction, so it is safe while other processes use the store.
+
+    Args:
+        rule_paths (List[str]): Databases to merge (e.g. one per shard or machine)
+
+    Returns:
+        int: Number of rule updates read
+    """
+    init_db()
+    total = 0
+    for path in rule_paths:
+        with sqlite3.connect(path) as source:
+            updates = rule_updates_from_store(source, LAYOUT_TOLERANCE)
+        with connection() as conn:
+            apply_rule_updates(conn, updates)
+        print(f"[shard] Regras de '{path}' incorporadas: {len(updates)} atualizações")
+        total += len(updates)
+    return total
+
+
+def copy_rule_store(target_path: str) -> None:
+    """Copy the rule store (consistently, even while in use) to start a shard from the learned rules."""
+    with connection() as conn, sqlite3.connect(target_path) as target:
+        conn.backup(target)
+
+
+def run_shards(directory: str, shards: int, shard_by: str, output_path: str, separate_db: bool,
+               main_args: List[str]) -> Tuple[int, List[int]]:
+    """
+    Process a dataset in several processes, one per shard, and merge their outputs.
+
+    By default every shard uses the rule store directly: WAL mode and the
+    transactions of the rule writer make concurrent learning safe on one
+    machine. With separate_db, each shard learns in a copy of the store,
+    merged back at the end (as shards on other machines would be).
+
+    Args:
+        directory (str): Directory containing the dataset and files/
+        shards (int): Number of processes
+        shard_by (str): How items are assigned to shards ('index' or 'label')
+        output_path (str): Merged results file
+        separate_db (bool): Give each shard its own copy of the rule store
+        main_args (List[str]): Extra arguments for each `python -m src.main` process
+
+    Returns:
+        Tuple[int, List[int]]: Number of results merged and the exit code of each shard
+    """
+    dataset_path = find_dataset(directory)
+    if dataset_path is None:
+        raise FileNotFoundError(f"No dataset file found in '{directory}'")
+    init_db()
+
+    work_dir = tempfile.mkdtemp(prefix="shards-", dir=os.path.dirname(os.path.abspath(output_path)))
+    result_paths = [os.path.join(work_dir, f"shard-{index}.jsonl") for index in range(shards)]
+    rule_paths = [os.path.join(work_dir, f"rules-{index}.db") for index in range(shards)]
+
+    processes = []
+    for index in range(shards):
+        env = dict(os.environ)
+        if separate_db:
+            copy_rule_store(rule_paths[index])
+            env["TEMPLATE_DB_PATH"] = rule_paths[index]
+        log = open(os.path.join(work_dir, f"shard-{index}.log"), 'w', encoding='utf-8')
+        command = [sys.executable, "-m", "src.main", directory, "--shard", f"{index}/{shards}",
+                   "--shard-by", shard_by, "--output", result_paths[index], *main_args]
+        processes.append((subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env), log))
+        print(f"[shard] Parte {index}/{shards} iniciada (log: {log.name})")
+
+    exit_codes = []
+    for index, (process, log) in enumerate(processes):
+        exit_codes.append(process.wait())
+        log.close()
+        if exit_codes[-1] != 0:
+            print(f"[shard] Parte {index}/{shards} falhou (código {exit_codes[-1]}), veja {log.name}")
+
+    if separate_db:
+        merge_rules([path for path in rule_paths if os.path.exists(path)])
+    count = merge_results(dataset_path, result_paths, shard_by, output_path)
+    if all(code == 0 for code in exit_codes):
+        for name in os.listdir(work_dir):
+            os.remove(os.path.join(work_dir, name))
+        os.rmdir(work_dir)
+    return count, exit_codes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Divide um dataset entre vários processos e junta os resultados "
+                                                 "e as regras aprendidas.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Processa o dataset em N processos nesta máquina.")
+    run_parser.add_argument("directory", type=str, help="Diretório com o dataset e files/.")
+    run_parser.add_argument("--shards", type=int, required=True, help="Número de processos.")
+    run_parser.add_argument("--by", choices=SHARD_KEYS, default="index",
+                            help="Divide o dataset por posição dos itens ou por label (padrão: index).")
+    run_parser.add_argument("--output", type=str, default="resultados.json", help="Arquivo com os resultados juntados.")
+    run_parser.add_argument("--separate-db", action="store_true",
+                            help="Cada processo aprende em uma cópia do banco de regras, incorporada ao final.")
+
+    merge_parser = commands.add_parser("merge", help="Junta as saídas e os bancos de regras de partes já executadas "
+                                                     "(ex: em outras máquinas).")
+    merge_parser.add_argument("directory", type=str, help="Diretório com o dataset que foi dividido.")
+    merge_parser.add_argument("--results", nargs="+", required=True,
+                              help="Saída de cada parte, na ordem das partes (0, 1, ...).")
+    merge_parser.add_argument("--by", choices=SHARD_KEYS, default="index", help="Como o dataset foi dividido.")
+    merge_parser.add_argument("--rules", nargs="*", default=[],
+                              help="Bancos de regras das partes, incorporados a " + DB_PATH + ".")
+    merge_parser.add_argument("--output", type=str, default="resultados.json", help="Arquivo com os resultados juntados.")
+
+    # Arguments after '--' are passed to each `python -m src.main` process (e.g. -- --workers 4 --offline)
+    argv = sys.argv[1:]
+    main_args = argv[argv.index("--") + 1:] if "--" in argv else []
+    args = parser.parse_args(argv[:len(argv) - len(main_args) - (1 if "--" in argv else 0)])
+
+    if args.command == "run":
+        count, exit_codes = run_shards(args.directory, args.shards, args.by, args.output, args.separate_db, main_args)
+        print(f"[shard] {count} resultados juntados em {args.output}")
+        sys.exit(0 if all(code == 0 for code in exit_codes) else 1)
+
+    dataset_path = find_dataset(args.directory)
+    if dataset_path is None:
+        print(f"[shard] Nenhum 'dataset.json' ou 'dataset.jsonl' encontrado em '{args.directory}'.")
+        sys.exit(1)
+    if args.rules:
+        merge_rules(args.rules)
+    count = merge_results(dataset_path, args.results, args.by, args.output)
+    print(f"[shard] {count} resultados juntados em {args.output}")
@@ -0,0 +1,134 @@
+import math
+from collections import Counter
+from typing import Dict, Any, List
+from src.utils.text import decompose
+
+# Generic Portuguese stopwords (articles, prepositions, pronouns, conjunctions and
+# forms of ser/estar/ter/haver), normalized like the text. Words that are common in
+# the field descriptions but not in general are left to the IDF of BM25.
+STOPWORDS = set(decompose("""
+    a o as os um uma uns umas de da do das dos em no na nos nas num numa ao aos à às
+    pelo pela pelos pelas para por com sem sob sobre entre até após desde contra
+    e ou mas nem que se como quando onde porque pois também já só mais menos muito
+    não sim eu tu ele ela nós vós eles elas você vocês me te lhe lhes nos vos se
+    meu minha meus minhas teu tua teus tuas seu sua seus suas nosso nossa nossos nossas
+    dele dela deles delas este esta estes estas esse essa esses essas aquele aquela
+    aqueles aquelas isto isso aquilo qual quais quem cujo cuja mesmo mesma outro outra
+    é são era eram foi foram ser sido sendo está estão estava estar estado
+    tem têm tinha ter tido há havia haver pode podem poder deve devem
+"""))
+
+# Punctuation stripped from the edges of each token before matching
+PUNCTUATION = ".,:;()[]?!/\"'<>"
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def _terms(text: str) -> List[str]:
+    """Normalized tokens of a text, without edge punctuation."""
+    return [term for term in (token.strip(PUNCTUATION) for token in decompose(text)) if term]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count of a text (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def build_query(fields: Dict[str, Any]) -> List[str]:
+    """
+    Build the relevance query of a set of fields from their names and descriptions.
+
+    Args:
+        fields (Dict[str, Any]): Dictionary of field names and descriptions
+
+    Returns:
+        List[str]: Normalized query tokens (without stopwords)
+    """
+    tokens = []
+    for field_name, description in fields.items():
+        tokens.extend(_terms(field_name))
+        if isinstance(description, str):
+            tokens.extend(_terms(description))
+    return [token for token in tokens if token not in STOPWORDS]
+
+
+def select_context(full_text: str, fields: Dict[str, Any], token_budget: int, window_lines: int = 4) -> str:
+    """
+    Keep only the spans of the document most relevant to the pending fields.
+
+    The text is split into overlapping windows of lines, each window is scored
+    with BM25 against the field names and descriptions (normalized with
+    decompose), and the best windows are kept, in document order, until the
+    token budget is used. Documents that already fit the budget are returned
+    unchanged.
+
+    Args:
+        full_text (str): Full text content of the PDF
+        fields (Dict[str, Any]): Dictionary of field names and descriptions
+        token_budget (int): Maximum estimated tokens of the returned context (0 disables trimming)
+        window_lines (int): Number of lines per window
+
+    Returns:
+        str: The selected context
+    """
+    if token_budget <= 0 or estimate_tokens(full_text) <= token_budget:
+        return full_text
+
+    lines = full_text.splitlines()
+    query = set(build_query(fields))
+    if not lines or not query:
+        return full_text
+
+    # Windows overlap by half, so a label and the value on the next lines stay together
+    stride = max(1, window_lines // 2)
+    windows = [(start, min(len(lines), start + window_lines)) for start in range(0, len(lines), stride)]
+    scores = _bm25_scores([_terms("\n".join(lines[start:end])) for start, end in windows], query)
+
+    selected = set()
+    used = 0
+    for score, (start, end) in sorted(zip(scores, windows), key=lambda entry: -entry[0]):
+        if score <= 0:
+            break
+        new_lines = [i for i in range(start, end) if i not in selected]
+        cost = sum(estimate_tokens(lines[i]) for i in new_lines)
+        if used + cost > token_budget:
+            continue
+        selected.update(new_lines)
+        used += cost
+
+    if not selected:
+        return full_text[:token_budget * 4]
+
+    # Rebuild the context in document order, marking the gaps between spans
+    spans = []
+    previous = None
+    for i in sorted(selected):
+        if previous is not None and i != previous + 1:
+            spans.append("[...]")
+        spans.append(lines[i])
+        previous = i
+    return "\n".join(spans)
+
+
+def _bm25_scores(documents: List[List[str]], query: set) -> List[float]:
+    """Score each tokenized document against the query terms with BM25."""
+    if not documents:
+        return []
+    average_length = sum(len(document) for document in documents) / len(documents) or 1
+    document_frequency = Counter(term for document in documents for term in set(document) if term in query)
+
+    scores = []
+    for document in documents:
+        frequencies = Counter(document)
+        score = 0.0
+        for term in query:
+            frequency = frequencies.get(term, 0)
+            if not frequency:
+                continue
+            idf = math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+            norm = frequency + BM25_K1 * (1 - BM25_B + BM25_B * len(document) / average_length)
+            score += idf * frequency * (BM25_K1 + 1) / norm
+        scores.append(score)
+    return scores
@@ -0,0 +1,197 @@
+import os
+import json
+import zlib
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+# Dataset file names looked up in the base directory, in order of preference
+DATASET_FILES = ("dataset.jsonl", "dataset.json")
+
+# Size of the chunks read when streaming a JSON array
+CHUNK_SIZE = 64 * 1024
+
+# How dataset items are assigned to shards
+SHARD_KEYS = ("index", "label")
+
+# Characters that may continue a JSON number
+_NUMBER_CHARS = frozenset("0123456789.eE+-")
+
+
+def find_dataset(base_directory: str) -> Optional[str]:
+    """
+    Locate the dataset file of a directory.
+
+    Args:
+        base_directory (str): Path to the directory containing the dataset
+
+    Returns:
+        Optional[str]: Path to 'dataset.jsonl' or 'dataset.json', or None if neither exists
+    """
+    for name in DATASET_FILES:
+        path = os.path.join(base_directory, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def iter_dataset(dataset_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the items of a dataset without loading the whole file in memory.
+
+    JSONL files ('.jsonl') hold one item per line. Other files are read as a
+    JSON array, decoded one element at a time.
+
+    Args:
+        dataset_path (str): Path to the dataset file
+
+    Yields:
+        Dict[str, Any]: Dataset items, in file order
+
+    Raises:
+        json.JSONDecodeError: If the file is not valid JSON / JSONL
+    """
+    with open(dataset_path, 'r', encoding='utf-8') as f:
+        if dataset_path.endswith(".jsonl"):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_array(f)
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Parse a shard given as 'I/N' (shard I of N, counting from 0).
+
+    Args:
+        value (str): Shard specification
+
+    Returns:
+        Tuple[int, int]: Shard index and number of shards
+
+    Raises:
+        ValueError: If the specification is not valid
+    """
+    index, _, count = value.partition("/")
+    index, count = int(index), int(count)
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{value}'")
+    return index, count
+
+
+def shard_of(position: int, item: Dict[str, Any], count: int, by: str = "index") -> int:
+    """
+    Find the shard a dataset item belongs to.
+
+    By index, items are dealt round-robin by their position in the dataset.
+    By label, every item of a label goes to the same shard, so the rules of a
+    label are only learned by one shard. The assignment is the same in every
+    process and machine.
+
+    Args:
+        position (int): Position of the item in the dataset file
+        item (Dict[str, Any]): Dataset item
+        count (int): Number of shards
+        by (str): 'index' or 'label'
+
+    Returns:
+        int: Shard index, from 0 to count - 1
+    """
+    if count <= 1:
+        return 0
+    if by == "label":
+        return zlib.crc32(str(item.get("label")).encode("utf-8")) % count
+    return position % count
+
+
+def _iter_json_array(f) -> Iterator[Any]:
+    """Decode the elements of a top-level JSON array incrementally."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer and not eof:
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        if not buffer.startswith("["):
+            raise json.JSONDecodeError("Expected a JSON array", buffer, 0)
+        buffer = buffer[1:]
+        break
+
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(","):
+            buffer = buffer[1:]
+            continue
+        if buffer.startswith("]"):
+            return
+
+        try:
+            element, end = decoder.raw_decode(buffer)
+            # A number at the end of the buffer may continue in the next chunk
+            complete = eof or (end < len(buffer) and buffer[end] not in _NUMBER_CHARS)
+        except json.JSONDecodeError:
+            # The element may continue in the next chunk
+            if eof:
+                raise
+            complete = False
+
+        if not complete:
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+
+        yield element
+        buffer = buffer[end:]
+
+
+class ResultWriter:
+    """
+    Append results to the output file as soon as each document is done.
+
+    Paths ending in '.jsonl' get one result per line. Any other path gets a
+    JSON array that is kept valid once the writer is closed; every result is
+    flushed to disk when written, so a crash only loses documents in flight.
+    """
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.jsonl = output_path.endswith(".jsonl")
+        self.count = 0
+        self._file = open(output_path, 'w', encoding='utf-8')
+        if not self.jsonl:
+            self._file.write("[")
+
+    def write(self, result: Dict[str, Any]) -> None:
+        """Append one result and flush it to disk."""
+        if self.jsonl:
+            self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        else:
+            separator = "," if self.count else ""
+            self._file.write(separator + "\n" + _indent(json.dumps(result, indent=2, ensure_ascii=False)))
+        self._file.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        """Terminate the output file."""
+        if self._file.closed:
+            return
+        if not self.jsonl:
+            self._file.write("\n]" if self.count else "]")
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _indent(text: str) -> str:
+    """Indent a JSON document one level, matching json.dump(indent=2) of a list."""
+    return "\n".join("  " + line for line in text.splitlines())
@@ -0,0 +1,74 @@
+import json
+from typing import Any, List, Tuple
+
+
+class IncrementalJSONObject:
+    """
+    Incremental parser of a JSON object received in pieces (e.g. a streamed LLM answer).
+
+    feed() returns the members of the top-level object completed by the new
+    text, so each key can be used as soon as its value is closed instead of
+    after the whole object arrived. Text before the opening brace and after
+    the closing one is ignored.
+    """
+
+    def __init__(self):
+        # Text of the member being received, between the separators of the top-level object
+        self._member: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.done = False
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        Consume the next piece of the JSON text.
+
+        Args:
+            text (str): Next piece of the text (any size, may split tokens)
+
+        Returns:
+            List[Tuple[str, Any]]: Key and decoded value of each member completed by this piece
+        """
+        members = []
+        for char in text:
+            if self.done:
+                break
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    members.extend(self._close_member())
+                    self.done = True
+                    continue
+            elif char == "," and self._depth == 1:
+                members.extend(self._close_member())
+                continue
+            self._member.append(char)
+        return members
+
+    def _close_member(self) -> List[Tuple[str, Any]]:
+        """Decode the member received so far (nothing if it is empty or malformed)."""
+        text = "".join(self._member).strip()
+        self._member = []
+        if not text:
+            return []
+        try:
+            return list(json.loads("{" + text + "}").items())
+        except json.JSONDecodeError:
+            return []
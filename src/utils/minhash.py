@@ -0,0 +1,222 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Tuple, Optional, Set
+from src.utils.text import decompose
+from src.utils.token_index import TOKEN_PATTERN
+
+# Number of values of a signature, split into LSH bands of ROWS_PER_BAND values.
+# Two documents become candidates when a whole band is equal, which happens often
+# from a Jaccard similarity of about (1 / BANDS) ** (1 / ROWS_PER_BAND) = 0.5;
+# candidates are then checked against the configured threshold.
+SIGNATURE_SIZE = 64
+ROWS_PER_BAND = 4
+BANDS = SIGNATURE_SIZE // ROWS_PER_BAND
+
+# Consecutive tokens per shingle
+SHINGLE_SIZE = 3
+
+_HASH_MASK = (1 << 64) - 1
+# Offset added to a value borrowed by an empty bin per bin of distance, above any bin value
+_BORROW_OFFSET = (1 << 64) // SIGNATURE_SIZE
+
+Signature = Tuple[int, ...]
+
+# Shortest value reused from a near-duplicate: shorter ones (e.g. "PR", "2") appear
+# in almost any document of the same template, whoever it belongs to
+MIN_REUSED_LENGTH = 3
+
+
+def shingles(text: str) -> Set[str]:
+    """
+    Split a text into overlapping runs of SHINGLE_SIZE normalized tokens.
+
+    Args:
+        text (str): Text of the document
+
+    Returns:
+        Set[str]: Shingles of the text (its tokens when it is shorter than a shingle)
+    """
+    tokens = decompose(text)
+    if len(tokens) < SHINGLE_SIZE:
+        return set(tokens)
+    return {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(text: str) -> Optional[Signature]:
+    """
+    Compute the MinHash signature of a text.
+
+    The share of equal positions in the signatures of two texts estimates
+    the Jaccard similarity of their shingle sets. The signature is built
+    with one permutation hashing: each shingle is hashed once, the hash
+    picks one of SIGNATURE_SIZE bins and each bin keeps its minimum, so
+    the cost is one hash per shingle instead of one per shingle and value.
+    Empty bins (short texts) borrow the value of the next non-empty bin.
+
+    Args:
+        text (str): Text of the document
+
+    Returns:
+        Optional[Signature]: Signature of SIGNATURE_SIZE values, or None for a text without tokens
+    """
+    bins: List[Optional[int]] = [None] * SIGNATURE_SIZE
+    for shingle in shingles(text):
+        bin_index, value = divmod(hash(shingle) & _HASH_MASK, _BORROW_OFFSET)
+        if bins[bin_index] is None or value < bins[bin_index]:
+            bins[bin_index] = value
+    filled = [index for index, value in enumerate(bins) if value is not None]
+    if not filled:
+        return None
+    for index in range(SIGNATURE_SIZE):
+        if bins[index] is None:
+            source = next((j for j in filled if j > index), filled[0])
+            distance = (source - index) % SIGNATURE_SIZE
+            bins[index] = bins[source] + distance * _BORROW_OFFSET
+    return tuple(bins)
+
+
+def similarity(first: Signature, second: Signature) -> float:
+    """Estimated Jaccard similarity of the texts of two signatures."""
+    return sum(1 for x, y in zip(first, second) if x == y) / SIGNATURE_SIZE
+
+
+class NearDuplicateIndex:
+    """
+    LSH index of the extracted data of documents, scoped per label.
+
+    Holds at most max_entries documents; the least recently added or matched
+    one is evicted first. Safe to use from several threads.
+    """
+
+    def __init__(self, threshold: float, max_entries: int):
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        # Document key to (label, signature, extracted data), in LRU order
+        self._entries: "OrderedDict[str, Tuple[str, Signature, Dict[str, Any]]]" = OrderedDict()
+        # (label, band number, band values) to the keys of the documents sharing that band
+        self._buckets: Dict[Tuple[str, int, Signature], Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, label: str, key: str, signature: Signature, extracted_data: Dict[str, Any]) -> int:
+        """
+        Index the extracted data of a document.
+
+        Args:
+            label (str): Document type identifier
+            key (str): Identifier of the document (e.g. its content hash)
+            signature (Signature): MinHash signature of its text
+            extracted_data (Dict[str, Any]): Values extracted from it
+
+        Returns:
+            int: Number of documents evicted to stay within max_entries
+        """
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (label, signature, dict(extracted_data))
+            for band in self._bands(label, signature):
+                self._buckets.setdefault(band, set()).add(key)
+
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                evicted += 1
+            return evicted
+
+    def query(self, label: str, signature: Signature) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """
+        Find the most similar indexed document of the same label.
+
+        Args:
+            label (str): Document type identifier
+            signature (Signature): MinHash signature of the new document's text
+
+        Returns:
+            Optional[Tuple[float, Dict[str, Any]]]: Estimated similarity and extracted data of the
+                closest document, or None if no document reaches the threshold
+        """
+        with self._lock:
+            candidates = set()
+            for band in self._bands(label, signature):
+                candidates.update(self._buckets.get(band, ()))
+
+            best_key, best_similarity = None, 0.0
+            for key in candidates:
+                score = similarity(signature, self._entries[key][1])
+                if score >= self.threshold and score > best_similarity:
+                    best_key, best_similarity = key, score
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            return best_similarity, dict(self._entries[best_key][2])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        """Drop a document and its buckets (lock held)."""
+        label, signature, _ = self._entries.pop(key)
+        for band in self._bands(label, signature):
+            keys = self._buckets.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._buckets[band]
+
+    @staticmethod
+    def _bands(label: str, signature: Signature) -> List[Tuple[str, int, Signature]]:
+        return [(label, band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]) for band in range(BANDS)]
+
+
+def reuse_verbatim_values(fields: Dict[str, Any], previous: Dict[str, Any],
+                          full_text: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Reuse the values of a near-duplicate document that appear verbatim in the new text.
+
+    A value must match a run of whole tokens of the text, so a value that is
+    only part of a word or number is not reused. Values shorter than
+    MIN_REUSED_LENGTH and numbers (digits and separators only) are never
+    reused: near duplicates of the same template often belong to different
+    people, and those values are found in any of them.
+
+    Args:
+        fields (Dict[str, Any]): Fields still pending (name: description)
+        previous (Dict[str, Any]): Extracted data of the near-duplicate document
+        full_text (str): Text of the new document
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, Any]]: Tuple containing:
+            - reused: Dictionary of field names to reused values
+            - remaining_fields: Dictionary of fields that still need the LLM
+    """
+    tokens = TOKEN_PATTERN.findall(full_text)
+    positions: Dict[str, List[int]] = {}
+    for position, token in enumerate(tokens):
+        positions.setdefault(token, []).append(position)
+
+    reused = {}
+    remaining_fields = {}
+    for field_name, description in fields.items():
+        value = previous.get(field_name)
+        if _is_reusable(value) and _contains_run(tokens, positions, TOKEN_PATTERN.findall(str(value))):
+            reused[field_name] = value
+        else:
+            remaining_fields[field_name] = description
+    return reused, remaining_fields
+
+
+def _is_reusable(value: Any) -> bool:
+    """Whether a value is specific enough to be reused (see reuse_verbatim_values)."""
+    if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+        return False
+    text = str(value).strip()
+    return len(text) >= MIN_REUSED_LENGTH and not re.sub(r"\W", "", text).isdigit()
+
+
+def _contains_run(tokens: List[str], positions: Dict[str, List[int]], run: List[str]) -> bool:
+    """Whether run occurs as consecutive tokens of the text."""
+    if not run:
+        return False
+    return any(tokens[start:start + len(run)] == run for start in positions.get(run[0], []))
@@ -1,5 +1,6 @@
 import re
-from typing import Optional, Any
+import datetime
+from typing import Optional, Any, Callable, Dict, Iterable
 
 # Dictionary of compiled regex patterns for common fields
 REGEX_LIBRARY = {
@@ -72,6 +73,75 @@ REGEX_LIBRARY = {
 
 }
 
+# Area codes (DDD) in use in Brazil
+AREA_CODES = {
+    "11", "12", "13", "14", "15", "16", "17", "18", "19", "21", "22", "24", "27", "28",
+    "31", "32", "33", "34", "35", "37", "38", "41", "42", "43", "44", "45", "46", "47",
+    "48", "49", "51", "53", "54", "55", "61", "62", "63", "64", "65", "66", "67", "68",
+    "69", "71", "73", "74", "75", "77", "79", "81", "82", "83", "84", "85", "86", "87",
+    "88", "89", "91", "92", "93", "94", "95", "96", "97", "98", "99",
+}
+
+def _digits(value: str) -> str:
+    return re.sub(r"\D", "", value)
+
+def _check_digit(digits: str, weights: Iterable[int]) -> int:
+    """Modulo 11 check digit used by CPF and CNPJ."""
+    remainder = sum(int(digit) * weight for digit, weight in zip(digits, weights)) % 11
+    return 0 if remainder < 2 else 11 - remainder
+
+def _valid_cpf(value: str) -> bool:
+    digits = _digits(value)
+    # Repeated digits (e.g. 111.111.111-11) pass the check but are not issued
+    if len(digits) != 11 or len(set(digits)) == 1:
+        return False
+    return (_check_digit(digits, range(10, 1, -1)) == int(digits[9])
+            and _check_digit(digits, range(11, 1, -1)) == int(digits[10]))
+
+def _valid_cnpj(value: str) -> bool:
+    digits = _digits(value)
+    if len(digits) != 14 or len(set(digits)) == 1:
+        return False
+    weights = [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
+    return (_check_digit(digits, weights[1:]) == int(digits[12])
+            and _check_digit(digits, weights) == int(digits[13]))
+
+def _valid_date(value: str) -> bool:
+    # The pattern only bounds day and month separately (e.g. accepts 31/02/2024)
+    day, month, year = (int(part) for part in re.findall(r"\d+", value)[:3])
+    try:
+        datetime.date(year, month, day)
+    except ValueError:
+        return False
+    return True
+
+def _valid_phone(value: str) -> bool:
+    area_code = REGEX_LIBRARY["TELEFONE_BR"].fullmatch(value).group(3)
+    return area_code in AREA_CODES
+
+# Semantic checks of the values a rule's pattern matches, run after the pattern
+RULE_VALIDATORS: Dict[str, Callable[[str], bool]] = {
+    "CPF": _valid_cpf,
+    "CNPJ": _valid_cnpj,
+    "DATA_BR": _valid_date,
+    "TELEFONE_BR": _valid_phone,
+}
+
+def is_valid_value(rule_name: str, value: str) -> bool:
+    """
+    Check a value that fully matches a rule's pattern against the rule's validator, if any
+    (check digits of CPF/CNPJ, calendar dates, phone area codes).
+    
+    Args:
+        rule_name (str): Name of the rule the value matches
+        value (str): The value, already stripped
+        
+    Returns:
+        bool: Whether the value is valid (always True for rules without a validator)
+    """
+    validator = RULE_VALIDATORS.get(rule_name)
+    return validator is None or validator(value)
+
 def find_matching_rule(value: Any) -> Optional[str]:
     """
     Tests a value against all patterns in REGEX_LIBRARY and returns the matching rule name.
@@ -94,9 +164,10 @@ def find_matching_rule(value: Any) -> Optional[str]:
         
     matches = []
     
-    # Test value against each pattern
+    # Test value against each pattern; values failing a rule's validator (e.g. a CPF
+    # with wrong check digits) do not match it, so no false rule is learned from them
     for rule_name, pattern in REGEX_LIBRARY.items():
-        if pattern.fullmatch(str_value):
+        if pattern.fullmatch(str_value) and is_valid_value(rule_name, str_value):
             matches.append(rule_name)
     
     # Return rule name only if there's exactly one match
@@ -0,0 +1,186 @@
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+from src.utils.regex_library import REGEX_LIBRARY
+
+# Rule names of synthesized patterns are the pattern itself with this prefix,
+# so they share the token index and lookups with the library rules
+SYNTHESIZED_PREFIX = "re:"
+
+# Character classes a value is generalized to; any other character is kept literally
+CHAR_CLASSES = (
+    ("digit", re.compile(r"[0-9]"), "[0-9]"),
+    ("upper", re.compile(r"[A-ZÀ-ÖØ-Þ]"), "[A-ZÀ-ÖØ-Þ]"),
+    ("lower", re.compile(r"[a-zß-öø-ÿ]"), "[a-zß-öø-ÿ]"),
+)
+_CLASS_PATTERNS = {name: pattern for name, _, pattern in CHAR_CLASSES}
+
+# Longest value a pattern is synthesized from
+MAX_VALUE_LENGTH = 64
+
+# An example is {"value": str, "documents": int, "competitors": [run lengths, ...]}: a value
+# the LLM returned, the number of documents it was seen in, and the run lengths of the other
+# tokens of those documents with the same shape
+Example = Dict[str, Any]
+
+
+def _char_class(char: str) -> str:
+    for name, pattern, _ in CHAR_CLASSES:
+        if pattern.fullmatch(char):
+            return name
+    return "=" + char
+
+
+def runs(token: str) -> List[Tuple[str, int]]:
+    """
+    Split a token into runs of characters of the same class.
+
+    Args:
+        token (str): Token without whitespace
+
+    Returns:
+        List[Tuple[str, int]]: Class ('digit', 'upper', 'lower', or '=' and the literal
+            character) and length of each run
+    """
+    result = []
+    for char in token:
+        char_class = _char_class(char)
+        if result and result[-1][0] == char_class:
+            result[-1] = (char_class, result[-1][1] + 1)
+        else:
+            result.append((char_class, 1))
+    return result
+
+
+@lru_cache(maxsize=65536)
+def _split(token: str) -> Tuple[Tuple[str, ...], Tuple[int, ...]]:
+    """Shape (run classes) and run lengths of a token; every field of a document scans the same tokens."""
+    token_runs = runs(token)
+    return tuple(char_class for char_class, _ in token_runs), tuple(length for _, length in token_runs)
+
+
+def _shape(token: str) -> Tuple[str, ...]:
+    return _split(token)[0]
+
+
+def _lengths(token: str) -> Tuple[int, ...]:
+    return _split(token)[1]
+
+
+def describe_example(value: Any, token_counts: Counter) -> Optional[Example]:
+    """
+    Describe a value extracted from a document as an example for synthesis.
+
+    Only values found exactly once as a token of the document are usable:
+    that is what the heuristic matcher looks for. The run lengths of the
+    other tokens with the same shape are kept, so any pattern synthesized
+    later can be validated against this document without storing it.
+
+    Args:
+        value (Any): Value extracted for a field
+        token_counts (Counter): Occurrences of each token of the document (see TOKEN_PATTERN)
+
+    Returns:
+        Optional[Example]: The example, or None if the value is not a single token of the document
+    """
+    text = str(value).strip()
+    if not text or len(text) > MAX_VALUE_LENGTH or token_counts.get(text) != 1:
+        return None
+    shape = _shape(text)
+    competitors = sorted({_lengths(token) for token in token_counts
+                          if token != text and len(token) <= MAX_VALUE_LENGTH and _shape(token) == shape})
+    return {"value": text, "documents": 1, "competitors": [list(lengths) for lengths in competitors]}
+
+
+def merge_examples(saved: List[Example], new: List[Example], max_examples: int, accumulate: bool) -> List[Example]:
+    """
+    Add examples to the saved ones, keeping the max_examples most recent values.
+
+    The competitors of a repeated value are combined. Its documents are added
+    up when the new examples come from new documents (accumulate), or the
+    highest count is kept when they come from another store that may share
+    history with this one, so merging it twice changes nothing.
+    """
+    merged = {example["value"]: example for example in saved}
+    for example in new:
+        previous = merged.pop(example["value"], None)
+        competitors = {tuple(lengths) for lengths in example["competitors"]}
+        documents = example["documents"]
+        if previous is not None:
+            competitors.update(tuple(lengths) for lengths in previous["competitors"])
+            documents = previous["documents"] + documents if accumulate else max(previous["documents"], documents)
+        merged[example["value"]] = {"value": example["value"], "documents": documents,
+                                    "competitors": [list(lengths) for lengths in sorted(competitors)]}
+    return list(merged.values())[-max(1, max_examples):]
+
+
+def synthesize_pattern(examples: List[Example], min_examples: int) -> Optional[str]:
+    """
+    Generalize the values of a field into a pattern.
+
+    At least min_examples distinct values are needed to generalize: a value
+    seen in many documents says nothing about the values it stands for. A
+    field that only ever had one value, in min_examples documents, gets
+    that value as a literal pattern instead.
+
+    Every value must have the same shape (sequence of character classes and
+    literals); the length of each run becomes the range seen in the values
+    (e.g. "OAB-12345" and "OAB-123456" give [A-ZÀ-ÖØ-Þ]{3}\\-[0-9]{5,6}).
+    The pattern is rejected if it would also match another token of any
+    document the values came from, since the matcher could pick it instead.
+
+    Args:
+        examples (List[Example]): Examples of the field (see describe_example)
+        min_examples (int): Number of distinct values (or of documents, for a single value) needed
+
+    Returns:
+        Optional[str]: The pattern, or None if there are too few values, the values have
+            different shapes or the pattern is ambiguous in their documents
+    """
+    min_examples = max(1, min_examples)
+    if len(examples) == 1 and examples[0]["documents"] >= min_examples:
+        # The value occurs once in each of its documents, so the literal is never ambiguous there
+        return re.escape(examples[0]["value"])
+    if len(examples) < min_examples:
+        return None
+    shapes = {_shape(example["value"]) for example in examples}
+    if len(shapes) != 1:
+        return None
+    shape = shapes.pop()
+
+    all_lengths = [_lengths(example["value"]) for example in examples]
+    bounds = [(min(lengths), max(lengths)) for lengths in zip(*all_lengths)]
+    for example in examples:
+        for competitor in example["competitors"]:
+            if all(low <= length <= high for length, (low, high) in zip(competitor, bounds)):
+                return None
+
+    parts = []
+    for char_class, (low, high) in zip(shape, bounds):
+        parts.append(_CLASS_PATTERNS.get(char_class) or re.escape(char_class[1:]))
+        if (low, high) != (1, 1):
+            parts.append(f"{{{low}}}" if low == high else f"{{{low},{high}}}")
+    return "".join(parts)
+
+
+@lru_cache(maxsize=1024)
+def _compile(pattern: str) -> re.Pattern:
+    return re.compile(pattern)
+
+
+def rule_pattern(rule_name: str) -> Optional[re.Pattern]:
+    """
+    Compiled pattern of a rule: a REGEX_LIBRARY rule or a synthesized one.
+
+    Args:
+        rule_name (str): Library rule name, or SYNTHESIZED_PREFIX and the pattern
+
+    Returns:
+        Optional[re.Pattern]: The pattern, or None for an unknown rule
+    """
+    if rule_name in REGEX_LIBRARY:
+        return REGEX_LIBRARY[rule_name]
+    if rule_name.startswith(SYNTHESIZED_PREFIX):
+        return _compile(rule_name[len(SYNTHESIZED_PREFIX):])
+    return None
@@ -0,0 +1,87 @@
+import re
+from typing import Dict, List, Tuple, Optional
+from unidecode import unidecode
+from src.utils.regex_library import REGEX_LIBRARY, is_valid_value
+
+# A token is (start offset, end offset, text) in the document text
+Token = Tuple[int, int, str]
+
+# Same tokenization as str.split(): runs of non-whitespace characters
+TOKEN_PATTERN = re.compile(r"\S+")
+
+
+def build_token_index(full_text: str, library: Optional[Dict[str, re.Pattern]] = None) -> Dict[str, List[Token]]:
+    """
+    Tokenize a document once and classify every token against the regex library.
+    
+    Each distinct token text is tested against the patterns only once, no matter
+    how often it repeats in the document or how many fields use the same rule.
+    Tokens that match a pattern but fail its rule's validator (see
+    is_valid_value) are not candidates of that rule.
+    
+    Args:
+        full_text (str): Full text content of the PDF
+        library (Optional[Dict[str, re.Pattern]]): Patterns to classify against (defaults to REGEX_LIBRARY)
+        
+    Returns:
+        Dict[str, List[Token]]: Dictionary of rule names to the tokens that fully match them,
+            in document order
+    """
+    if library is None:
+        library = REGEX_LIBRARY
+
+    index: Dict[str, List[Token]] = {}
+    classified: Dict[str, List[str]] = {}
+
+    for match in TOKEN_PATTERN.finditer(full_text):
+        word = match.group()
+        rule_names = classified.get(word)
+        if rule_names is None:
+            rule_names = [name for name, pattern in library.items()
+                          if pattern.fullmatch(word) and is_valid_value(name, word)]
+            classified[word] = rule_names
+        for rule_name in rule_names:
+            index.setdefault(rule_name, []).append((match.start(), match.end(), word))
+
+    return index
+
+
+# Number of previous lines searched for an anchor, and number of words kept
+ANCHOR_MAX_LINES_BACK = 3
+ANCHOR_MAX_WORDS = 4
+
+# Anchors are made of words only (no digits or punctuation)
+ANCHOR_WORD_PATTERN = re.compile(r"[a-z]+")
+
+
+def anchor_before(full_text: str, offset: int) -> Optional[str]:
+    """
+    Find the label keyword that precedes a position of the document.
+
+    The anchor is the text before the position on the same line if it has
+    any word, otherwise the closest of the previous lines that has one (for
+    layouts where labels and values are on separate lines). Only the last
+    words are kept, normalized (lowercase, no accents or punctuation).
+
+    Args:
+        full_text (str): Full text content of the PDF
+        offset (int): Character offset of the token
+
+    Returns:
+        Optional[str]: Normalized anchor, or None if no word precedes the token
+    """
+    line_start = full_text.rfind("\n", 0, offset) + 1
+    candidates = [full_text[line_start:offset]]
+    end = line_start - 1
+    for _ in range(ANCHOR_MAX_LINES_BACK):
+        if end < 0:
+            break
+        start = full_text.rfind("\n", 0, end) + 1
+        candidates.append(full_text[start:end])
+        end = start - 1
+
+    for text in candidates:
+        words = ANCHOR_WORD_PATTERN.findall(unidecode(text).lower())
+        if words:
+            return " ".join(words[-ANCHOR_MAX_WORDS:])
+    return None
@@ -1,23 +1,70 @@
-from flask import Flask, render_template, request, Response, send_file, jsonify
+from flask import Flask, Request, render_template, request, Response, send_file, jsonify
+import argparse
+import fitz  # PyMuPDF
+import io
 import json
-import threading
-import queue
 import os
 import time
 import logging
+import threading
 from pathlib import Path
-from src.main import process_dataset
-import traceback
+from src.main import process_dataset, extract_document
+from src.extractors.llm_extractor import get_client
+from src.extractors.text_extractor import warm_up_pdf_engine
+from src.database.db import init_db, connection, preload_rule_snapshots
+from src.core.config import (
+    JOB_MAX_WORKERS, JOB_MAX_QUEUED, JOB_RETENTION_SECONDS, EXTRACT_MAX_UPLOAD_BYTES, DOCUMENT_DEADLINE_SECONDS,
+    PROFILE_DIR, PROFILE_SLOW_SECONDS
+)
+from src.core.jobs import JobManager, JobConflict, JobQueueFull
+from src.core.metrics import render_prometheus
+from src.core import profiling
+
+class InMemoryRequest(Request):
+    """Request that keeps uploaded files in memory instead of spooling them to temp files."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
 
 app = Flask(__name__, template_folder=str(Path(__file__).parent / "templates"), static_folder=str(Path(__file__).parent / "static"))
+app.request_class = InMemoryRequest
+# Uploads are held in memory, so their size is capped
+app.config['MAX_CONTENT_LENGTH'] = EXTRACT_MAX_UPLOAD_BYTES
 
 # Disable Flask's request logging
 log = logging.getLogger('werkzeug')
 log.setLevel(logging.ERROR)
 
-# Shared storage for results (simpler than queues)
-processing_results = {}
-processing_status = {}
+# Longest time a /poll request waits for new events (seconds)
+POLL_MAX_WAIT = 25
+
+jobs = JobManager(max_workers=JOB_MAX_WORKERS, max_queued=JOB_MAX_QUEUED,
+                  retention_seconds=JOB_RETENTION_SECONDS)
+
+_warmed_up = False
+_warm_up_lock = threading.Lock()
+
+def warm_up() -> None:
+    """
+    Prepare the state reused by every /extract request: the database and a
+    pooled connection, the rule snapshots of every known label, PyMuPDF and,
+    unless the server is offline, the shared LLM client.
+    """
+    global _warmed_up
+    with _warm_up_lock:
+        if not _warmed_up:
+            init_db()
+            with connection() as conn:
+                labels = preload_rule_snapshots(conn)
+            warm_up_pdf_engine()
+            if not app.config.get('OFFLINE', False):
+                try:
+                    get_client()
+                except ValueError as e:
+                    print(f"LLM client not created: {e}")
+            print(f"Warm-up done: rules of {labels} labels loaded")
+            _warmed_up = True
 
 @app.route('/')
 def index():
@@ -30,77 +77,149 @@ def start():
     if not directory or not os.path.isdir(directory):
         return ("Invalid directory", 400)
 
-    session_id = str(os.getpid())
-    
-    # Initialize storage for this session
-    processing_results[session_id] = []
-    processing_status[session_id] = {"done": False, "error": None}
+    try:
+        workers = max(1, int(data.get('workers') or app.config.get('WORKERS', 1)))
+        deadline = _deadline(data)
+    except ValueError:
+        return ("Invalid workers or deadline", 400)
+
+    # Jobs on the same directory would write to the same output file
+    directory = os.path.abspath(directory)
 
     # output file path
     output_path = os.path.join(directory, 'resultados.json')
 
-    def worker():
-        try:
-            # Create a queue to collect results
-            q = queue.Queue()
-            
-            # Start a background thread to collect results as they arrive
-            def collector():
-                while True:
-                    try:
-                        item = q.get(timeout=0.1)
-                        if item.get('type') in ('finished', 'done'):
-                            processing_status[session_id]["done"] = True
-                            break
-                        processing_results[session_id].append(item)
-                    except queue.Empty:
-                        # Check if processing is done
-                        if processing_status[session_id].get("done"):
-                            break
-                        continue
-            
-            collector_thread = threading.Thread(target=collector, daemon=True)
-            collector_thread.start()
-            
-            # Process in main worker thread
-            process_dataset(directory, progress_queue=q, output_path=output_path)
-            
-            # Wait for collector to finish
-            collector_thread.join(timeout=5)
-            
-        except Exception as e:
-            print("\n" + "="*50)
-            print(">>> ERROR IN WORKER THREAD <<<")
-            print(f"Error type: {type(e).__name__}")
-            print(f"Error message: {str(e)}")
-            print(traceback.format_exc())
-            print("="*50 + "\n")
-            processing_status[session_id]["error"] = str(e)
-            processing_status[session_id]["done"] = True
-
-    thread = threading.Thread(target=worker, daemon=True)
-    thread.start()
-
-    return jsonify({"session_id": session_id, "status": "started"})
+    def run(job):
+        # The job receives the progress events directly, no collector thread needed
+        process_dataset(directory, progress_queue=job, output_path=output_path, workers=workers,
+                        use_llm_cache=app.config.get('USE_LLM_CACHE', True),
+                        use_doc_cache=app.config.get('USE_DOC_CACHE', True),
+                        keep_results=False, deadline=deadline, offline=app.config.get('OFFLINE', False))
+
+    try:
+        job = jobs.submit(run, directory=directory)
+    except JobConflict:
+        return ("A job is already running for this directory", 409)
+    except JobQueueFull:
+        return ("Too many jobs, try again later", 429)
+
+    return jsonify({"job_id": job.id, "status": job.status})
+
+def _deadline(form) -> float:
+    """Per-document deadline of a request (seconds), defaulting to the server's."""
+    value = form.get('deadline')
+    if not value:
+        return app.config.get('DEADLINE', DOCUMENT_DEADLINE_SECONDS)
+    return max(0.0, float(value))
 
 @app.route('/poll')
 def poll():
-    """Simple polling endpoint - much more reliable than SSE"""
-    session_id = str(os.getpid())
-    
-    if session_id not in processing_status:
-        return jsonify({"error": "No active session"}), 404
-    
-    status = processing_status[session_id]
-    results = processing_results.get(session_id, [])
-    
+    """
+    Incremental polling: returns only the events after the `since` cursor.
+
+    With `wait` (seconds), the request waits for new events instead of
+    returning an empty list, so clients do not need to poll in a tight loop.
+    """
+    job = jobs.get(request.args.get('job', ''))
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+
+    try:
+        since = int(request.args.get('since', 0))
+        wait = min(POLL_MAX_WAIT, max(0.0, float(request.args.get('wait', 0))))
+    except ValueError:
+        return ("Invalid since/wait", 400)
+
+    events, cursor, done = job.events_since(since, timeout=wait)
     return jsonify({
-        "done": status["done"],
-        "error": status["error"],
-        "results": results,
-        "count": len(results)
+        "job_id": job.id,
+        "status": job.status,
+        "done": done,
+        "error": job.error,
+        "events": events,
+        "next": cursor
     })
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job.describe())
+
+@app.route('/extract', methods=['POST'])
+def extract():
+    """
+    Extract the fields of a single uploaded PDF, synchronously.
+
+    Expects a multipart form with the file in `pdf`, the document type in
+    `label` and the fields in `schema` (JSON object of name: description).
+    The PDF is parsed from memory; no file is written.
+
+    With a `deadline` (seconds), fields the LLM has not answered by then are
+    returned as null and listed in `pending`. The LLM call still completes in
+    the background: the rules are learned and the complete result is cached,
+    so the same request sent again is answered in full.
+    """
+    upload = request.files.get('pdf')
+    label = request.form.get('label')
+    if upload is None or not label:
+        return jsonify({"error": "Missing 'pdf' file or 'label'"}), 400
+    try:
+        schema = json.loads(request.form.get('schema') or "")
+    except json.JSONDecodeError:
+        return jsonify({"error": "'schema' must be a JSON object"}), 400
+    try:
+        deadline = _deadline(request.form)
+    except ValueError:
+        return jsonify({"error": "'deadline' must be a number of seconds"}), 400
+    if not isinstance(schema, dict) or not schema:
+        return jsonify({"error": "'schema' must be a non-empty JSON object"}), 400
+
+    warm_up()
+    offline = app.config.get('OFFLINE', False)
+    start_time = time.time()
+    try:
+        with connection() as db_conn, profiling.document(upload.filename or "upload", label):
+            extracted_data, timings, sources, pending = extract_document(
+                upload.read(), label, schema, db_conn,
+                use_llm_cache=app.config.get('USE_LLM_CACHE', True),
+                use_doc_cache=app.config.get('USE_DOC_CACHE', True),
+                deadline=deadline, offline=offline)
+    except fitz.FileDataError as e:
+        # Raised when PyMuPDF cannot open the upload; any other error is a server error (500)
+        return jsonify({"error": f"Invalid PDF: {e}"}), 422
+
+    return jsonify({
+        "label": label,
+        "duration": time.time() - start_time,
+        "timings": timings,
+        "sources": sources,
+        "pending": [] if offline else pending,
+        "unresolved": pending if offline else [],
+        "extracted_data": extracted_data
+    })
+
+@app.route('/metrics')
+def metrics():
+    """Pipeline metrics in the Prometheus text format."""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/profile')
+def profile():
+    """
+    Profile of the documents processed since the server started with --profile:
+    stage totals, slowest documents and top functions (JSON), or the aggregated
+    cProfile report with `format=text`. `save=1` also writes the reports to disk.
+    """
+    if profiling.profiler is None:
+        return jsonify({"error": "Profiling is off (start the server with --profile)"}), 404
+    if request.args.get('save'):
+        profiling.profiler.save()
+    if request.args.get('format') == 'text':
+        return Response(profiling.profiler.report(), mimetype='text/plain')
+    return jsonify(profiling.profiler.summary())
+
 @app.route('/download')
 def download():
     directory = request.args.get('dir')
@@ -112,6 +231,31 @@ def download():
     return send_file(path, as_attachment=True)
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Interface web para extração de dados de PDFs.")
+    parser.add_argument("--workers", type=int, help="Número padrão de documentos processados em paralelo.", default=1)
+    parser.add_argument("--no-llm-cache", action="store_true", help="Ignora o cache de respostas da LLM.")
+    parser.add_argument("--no-doc-cache", action="store_true", help="Ignora o cache de textos e resultados por conteúdo do PDF.")
+    parser.add_argument("--deadline", type=float, default=DOCUMENT_DEADLINE_SECONDS,
+                        help="Prazo padrão por documento, em segundos (0 desativa).")
+    parser.add_argument("--offline", action="store_true",
+                        help="Usa apenas as regras aprendidas, sem chamar a LLM (não precisa de OPENAI_API_KEY).")
+    parser.add_argument("--profile", action="store_true",
+                        help="Mede cada etapa de cada documento e agrega um perfil do cProfile, consultado em /profile.")
+    parser.add_argument("--profile-dir", type=str, default=PROFILE_DIR,
+                        help=f"Diretório dos relatórios de --profile (padrão: {PROFILE_DIR}).")
+    parser.add_argument("--slow-threshold", type=float, default=PROFILE_SLOW_SECONDS,
+                        help="Latência, em segundos, a partir da qual o trace de um documento é salvo em "
+                             "<profile-dir>/slow/ (0 desativa).")
+    args, _ = parser.parse_known_args()
+    app.config['WORKERS'] = args.workers
+    app.config['USE_LLM_CACHE'] = not args.no_llm_cache
+    app.config['USE_DOC_CACHE'] = not args.no_doc_cache
+    app.config['DEADLINE'] = args.deadline
+    app.config['OFFLINE'] = args.offline
+    if args.profile:
+        profiling.enable(args.profile_dir, args.slow_threshold)
+
+    warm_up()
     print("Starting Flask server...")
     print("Server running on http://0.0.0.0:5000")
     app.run(debug=True, use_reloader=False, threaded=True, host='0.0.0.0', port=5000)
\ No newline at end of file
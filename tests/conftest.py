@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# Point the rule store at a scratch database before src is imported
+os.environ["TEMPLATE_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="enter-tests-"), "template_cache.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,95 @@
+import io
+import json
+import pytest
+from src.utils import dataset_io
+from src.utils.dataset_io import ResultWriter, _iter_json_array, iter_dataset
+
+ITEMS = [
+    {"label": "oab", "pdf_path": "oab_1.pdf", "extraction_schema": {"nome": "Nome do profissional"}},
+    {"label": "tela", "pdf_path": "tela [1].pdf", "extraction_schema": {"total": "Valor ] total, em R$"}},
+    {"label": "cnh", "pdf_path": "cnh.pdf", "extraction_schema": {}, "extra": [1, 23, 456, [], {}]},
+]
+
+
+def _decode(text, chunk_size):
+    dataset_io.CHUNK_SIZE = chunk_size
+    return list(_iter_json_array(io.StringIO(text)))
+
+
+@pytest.fixture(autouse=True)
+def chunk_size():
+    original = dataset_io.CHUNK_SIZE
+    yield
+    dataset_io.CHUNK_SIZE = original
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_array_split_at_every_boundary(chunk_size):
+    text = "  \n[ \n" + " ,\n  ".join(json.dumps(item) for item in ITEMS) + "\n , ]\n"
+    assert _decode(text, chunk_size) == ITEMS
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5])
+def test_numbers_split_across_reads(chunk_size):
+    assert _decode("[12, 3456,7.25e1 ,-8]", chunk_size) == [12, 3456, 72.5, -8]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4])
+def test_string_with_closing_bracket(chunk_size):
+    assert _decode('["a]", "]", {"k": "]]"}]', chunk_size) == ["a]", "]", {"k": "]]"}]
+
+
+@pytest.mark.parametrize("text", ["[]", "  [ ]  ", "[\n]\n"])
+def test_empty_array(text):
+    assert _decode(text, 1) == []
+
+
+@pytest.mark.parametrize("text", ['[{"a": 1}, {"b"', '[{"a": 1}', '[{"a": 1},', "["])
+def test_truncated_file(text):
+    dataset_io.CHUNK_SIZE = 2
+    elements = _iter_json_array(io.StringIO(text))
+    with pytest.raises(json.JSONDecodeError):
+        for _ in elements:
+            pass
+
+
+@pytest.mark.parametrize("text", ["", '{"a": 1}', "  \n"])
+def test_not_an_array(text):
+    with pytest.raises(json.JSONDecodeError):
+        _decode(text, 1)
+
+
+@pytest.mark.parametrize("name", ["dataset.json", "dataset.jsonl"])
+def test_result_writer_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    with ResultWriter(path) as writer:
+        for item in ITEMS:
+            writer.write(item)
+
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    if name.endswith(".jsonl"):
+        assert [json.loads(line) for line in text.splitlines()] == ITEMS
+    else:
+        assert json.loads(text) == ITEMS
+        assert text == json.dumps(ITEMS, indent=2, ensure_ascii=False)
+    assert list(iter_dataset(path)) == ITEMS
+
+
+@pytest.mark.parametrize("name", ["out.json", "out.jsonl"])
+def test_result_writer_empty(tmp_path, name):
+    path = str(tmp_path / name)
+    ResultWriter(path).close()
+    assert list(iter_dataset(path)) == []
+
+
+def test_result_writer_valid_while_open(tmp_path):
+    path = str(tmp_path / "out.json")
+    writer = ResultWriter(path)
+    writer.write(ITEMS[0])
+    # Every result is flushed, so a crash keeps everything written so far
+    with open(path, encoding='utf-8') as f:
+        assert json.loads(f.read() + "\n]") == ITEMS[:1]
+    writer.close()
+    writer.close()
+    assert writer.count == 1
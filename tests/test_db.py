@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import pytest
+from src.database.db import (DB_PATH, RuleWriter, apply_rule_updates, connection, get_rule_snapshot, init_db,
+                             CONFLICTING_ANCHOR)
+
+TOLERANCE = 0.03
+
+
+@pytest.fixture(autouse=True)
+def store():
+    init_db()
+
+
+def _apply(*updates) -> int:
+    with connection() as conn:
+        return apply_rule_updates(conn, list(updates))
+
+
+def _snapshot(label):
+    with connection() as conn:
+        return get_rule_snapshot(conn, label)
+
+
+def _layout(label, field_name):
+    with connection() as conn:
+        return conn.execute("SELECT page, x0, y0, x1, y1, lines, hits, conflicting FROM layout_rules "
+                            "WHERE label = ? AND field_name = ?", (label, field_name)).fetchone()
+
+
+def test_same_regex_rule_twice_changes_nothing():
+    assert _apply(("regex", "db_same", "cpf", "CPF")) == 1
+    assert _apply(("regex", "db_same", "cpf", "CPF")) == 0
+    assert _snapshot("db_same")["rules"] == {"cpf": "CPF"}
+
+
+def test_regex_disagreement_marks_the_field_conflicting():
+    assert _apply(("regex", "db_conflict", "data", "DATA_BR"), ("regex", "db_conflict", "data", "CPF")) == 2
+    snapshot = _snapshot("db_conflict")
+    assert "data" in snapshot["conflicts"]
+    # A conflicting field stays conflicting, whatever is learned later
+    assert _apply(("regex", "db_conflict", "data", "DATA_BR")) == 0
+    assert "data" in _snapshot("db_conflict")["conflicts"]
+
+
+def test_disagreeing_disambiguators_are_dropped_separately():
+    _apply(("regex", "db_disamb", "data", "DATA_BR"), ("disambiguator", "db_disamb", "data", "vencimento", 1))
+    assert _snapshot("db_disamb")["disambiguators"] == {"data": ("vencimento", 1)}
+    _apply(("disambiguator", "db_disamb", "data", "emissao", 1))
+    assert _snapshot("db_disamb")["disambiguators"] == {"data": (None, 1)}
+    with connection() as conn:
+        anchor = conn.execute("SELECT anchor FROM regex_rules WHERE label = 'db_disamb'").fetchone()[0]
+    assert anchor == CONFLICTING_ANCHOR
+
+
+def test_layout_hits_accumulate_in_the_same_place():
+    region = (0, 0.10, 0.20, 0.30, 0.25)
+    _apply(("layout", "db_layout", "nome", region, 1, TOLERANCE))
+    _apply(("layout", "db_layout", "nome", (0, 0.11, 0.21, 0.35, 0.26), 2, TOLERANCE))
+    # The region grows to cover both observations
+    assert _layout("db_layout", "nome") == (0, 0.10, 0.20, 0.35, 0.26, 2, 2, 0)
+    assert _snapshot("db_layout")["layouts"]["nome"]["hits"] == 2
+
+
+def test_layout_in_another_place_is_conflicting():
+    _apply(("layout", "db_layout_conflict", "nome", (0, 0.1, 0.2, 0.3, 0.25), 1, TOLERANCE))
+    _apply(("layout", "db_layout_conflict", "nome", (0, 0.1, 0.6, 0.3, 0.65), 1, TOLERANCE))
+    assert _layout("db_layout_conflict", "nome")[-1] == 1
+    assert "nome" not in _snapshot("db_layout_conflict")["layouts"]
+    # Later observations no longer count
+    assert _apply(("layout", "db_layout_conflict", "nome", (0, 0.1, 0.2, 0.3, 0.25), 1, TOLERANCE)) == 0
+
+
+def test_layout_rule_merge_keeps_the_highest_hits():
+    region = (0, 0.1, 0.2, 0.3, 0.25)
+    _apply(("layout_rule", "db_layout_rule", "nome", region, 1, 3, False, TOLERANCE))
+    assert _apply(("layout_rule", "db_layout_rule", "nome", region, 1, 3, False, TOLERANCE)) == 0
+    _apply(("layout_rule", "db_layout_rule", "nome", region, 1, 2, False, TOLERANCE))
+    assert _layout("db_layout_rule", "nome")[6] == 3
+
+
+def test_snapshot_is_reused_until_the_rule_version_changes():
+    _apply(("regex", "db_version", "cpf", "CPF"))
+    snapshot = _snapshot("db_version")
+    assert _snapshot("db_version") is snapshot
+
+    _apply(("regex", "db_version", "cnpj", "CNPJ"))
+    reloaded = _snapshot("db_version")
+    assert reloaded["version"] == snapshot["version"] + 1
+    assert reloaded["rules"] == {"cpf": "CPF", "cnpj": "CNPJ"}
+
+
+def test_snapshot_sees_changes_made_by_another_process():
+    _apply(("regex", "db_other", "cpf", "CPF"))
+    snapshot = _snapshot("db_other")
+    # Another process writes directly to the store, bumping the version as apply_rule_updates does
+    with sqlite3.connect(DB_PATH) as other:
+        other.execute("INSERT INTO regex_rules (label, field_name, rule_name) VALUES ('db_other', 'cep', 'CEP')")
+        other.execute("UPDATE rule_versions SET version = version + 1 WHERE label = 'db_other'")
+    assert _snapshot("db_other")["rules"] == {"cpf": "CPF", "cep": "CEP"}
+    assert snapshot["rules"] == {"cpf": "CPF"}
+
+
+def test_rule_writer_flush_commits_queued_updates():
+    writer = RuleWriter(interval=60)
+    writer.submit([("regex", "db_writer", "cpf", "CPF")])
+    writer.submit([("regex", "db_writer", "cpf", "CNPJ")])
+    assert _snapshot("db_writer")["rules"] == {}
+
+    writer.flush()
+    snapshot = _snapshot("db_writer")
+    assert "cpf" in snapshot["conflicts"]
+
+
+def test_rule_writer_without_interval_waits_for_the_commit():
+    RuleWriter().submit([("regex", "db_writer_sync", "cep", "CEP")])
+    assert _snapshot("db_writer_sync")["rules"] == {"cep": "CEP"}
+
+
+def test_queued_updates_are_written_at_exit():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = ("from src.database.db import init_db, rule_writer\n"
+            "init_db()\n"
+            "rule_writer.submit([('regex', 'db_exit', 'cpf', 'CPF')])\n")
+    env = dict(os.environ, TEMPLATE_DB_PATH=DB_PATH, RULE_WRITE_INTERVAL="60")
+    subprocess.run([sys.executable, "-c", code], cwd=root, env=env, check=True, capture_output=True, timeout=60)
+    assert _snapshot("db_exit")["rules"] == {"cpf": "CPF"}
@@ -0,0 +1,129 @@
+import threading
+import pytest
+from src.core.jobs import Job, JobConflict, JobManager, JobQueueFull
+
+TIMEOUT = 5
+
+
+@pytest.fixture
+def release():
+    """Event the blocking jobs wait on; set at the end so no worker is left hanging."""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def _blocking(release, started=None):
+    def run(job):
+        if started is not None:
+            started.release()
+        assert release.wait(TIMEOUT)
+    return run
+
+
+def _wait_done(job):
+    """Long-poll the job until it finishes."""
+    cursor, done = 0, False
+    for _ in range(100):
+        _, cursor, done = job.events_since(cursor, timeout=TIMEOUT)
+        if done:
+            return
+    pytest.fail(f"Job {job.id} did not finish")
+
+
+def test_rejects_when_workers_and_queue_are_full(release):
+    manager = JobManager(max_workers=2, max_queued=1)
+    started = threading.Semaphore(0)
+    jobs = [manager.submit(_blocking(release, started), directory=f"dir_{index}") for index in range(3)]
+    for _ in range(2):
+        assert started.acquire(timeout=TIMEOUT)
+
+    with pytest.raises(JobQueueFull):
+        manager.submit(_blocking(release), directory="dir_3")
+    assert sorted(job.status for job in jobs) == ["queued", "running", "running"]
+
+    release.set()
+    for job in jobs:
+        _wait_done(job)
+    # Finished jobs free their slot
+    _wait_done(manager.submit(lambda job: None, directory="dir_3"))
+
+
+def test_rejects_same_parameters_while_active(release):
+    manager = JobManager(max_workers=1, max_queued=4)
+    first = manager.submit(_blocking(release), directory="out")
+    with pytest.raises(JobConflict):
+        manager.submit(_blocking(release), directory="out")
+    manager.submit(lambda job: None, directory="other")
+
+    release.set()
+    _wait_done(first)
+    _wait_done(manager.submit(lambda job: None, directory="out"))
+
+
+def test_failed_job_reports_error():
+    manager = JobManager(max_workers=1, max_queued=0)
+
+    def run(job):
+        raise ValueError("boom")
+
+    job = manager.submit(run, directory="out")
+    _wait_done(job)
+    assert job.status == "error"
+    assert job.error == "boom"
+    assert job.describe()["done"]
+
+
+def test_cursor_is_done_only_at_the_end():
+    job = Job("job", {})
+    job.put({"type": "item", "n": 0})
+    job.put({"type": "item", "n": 1})
+
+    events, cursor, done = job.events_since(0)
+    assert [event["n"] for event in events] == [0, 1]
+    assert (cursor, done) == (2, False)
+
+    job.put({"type": "item", "n": 2})
+    job.finish()
+    # Finished, but the caller has not read the last event yet
+    events, cursor, done = job.events_since(1)
+    assert [event["n"] for event in events] == [1, 2]
+    assert (cursor, done) == (3, True)
+
+    assert job.events_since(2)[1:] == (3, True)
+    assert job.events_since(0)[2] is True
+    assert job.events_since(-5)[1] == 3
+    assert job.events_since(3) == ([], 3, True)
+
+
+def test_long_poll_waits_for_new_events():
+    job = Job("job", {})
+    assert job.events_since(0, timeout=0.05) == ([], 0, False)
+
+    timer = threading.Timer(0.05, job.put, args=({"type": "item"},))
+    timer.start()
+    events, cursor, done = job.events_since(0, timeout=TIMEOUT)
+    timer.join()
+    assert (events, cursor, done) == ([{"type": "item"}], 1, False)
+
+    # A finished job wakes the readers up even without new events
+    timer = threading.Timer(0.05, job.finish)
+    timer.start()
+    assert job.events_since(1, timeout=TIMEOUT) == ([], 1, True)
+    timer.join()
+
+
+def test_evicts_finished_jobs_after_retention(release):
+    manager = JobManager(max_workers=2, max_queued=0, retention_seconds=60)
+    finished = manager.submit(lambda job: None, directory="a")
+    _wait_done(finished)
+    running = manager.submit(_blocking(release), directory="b")
+
+    assert manager.get(finished.id) is finished
+    finished.finished_at -= 59
+    assert manager.get(finished.id) is finished
+    finished.finished_at -= 2
+    assert manager.get(finished.id) is None
+    # Active jobs are never evicted
+    assert manager.get(running.id) is running
+    assert manager.get("unknown") is None
@@ -0,0 +1,100 @@
+import json
+import pytest
+from src.utils.json_stream import IncrementalJSONObject
+
+ANSWER = {
+    "nome": "JOANA \"JOJO\" D'ARC",
+    "cidade": "S\u00e3o Paulo",
+    "chaves": "{abre} e [fecha]",
+    "barra": "C:\\temp\\",
+    "endereco": {"rua": "Av. Paulista, 2300", "cep": ["01310", "300"]},
+    "parcelas": [1, 2, {"n": 3}],
+    "vazio": None,
+    "valor": 12.5,
+}
+
+
+def _feed(chunks):
+    parser = IncrementalJSONObject()
+    members = []
+    for chunk in chunks:
+        members.extend(parser.feed(chunk))
+    return parser, members
+
+
+def _cut(text, *positions):
+    bounds = [0, *positions, len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_every_split_point_gives_the_whole_object(ensure_ascii):
+    text = "Resposta: " + json.dumps(ANSWER, ensure_ascii=ensure_ascii) + " fim"
+    for position in range(len(text) + 1):
+        parser, members = _feed(_cut(text, position))
+        assert dict(members) == ANSWER, position
+        assert parser.done
+
+
+def test_one_character_at_a_time():
+    parser, members = _feed(json.dumps(ANSWER))
+    assert members == list(ANSWER.items())
+    assert parser.done
+
+
+def test_chunk_inside_an_escaped_quote():
+    text = '{"a": "x\\"y", "b": 1}'
+    parser, members = _feed(_cut(text, text.index("\\") + 1))
+    assert members == [("a", 'x"y'), ("b", 1)]
+
+
+def test_chunk_inside_a_unicode_escape():
+    text = '{"a": "S\\u00e3o", "b": 2}'
+    parser, members = _feed(_cut(text, text.index("\\u") + 4))
+    assert members == [("a", "São"), ("b", 2)]
+
+
+def test_chunk_after_braces_inside_a_string():
+    text = '{"a": "{", "b": "}", "c": 3}'
+    parser, members = _feed(_cut(text, text.index("{", 1) + 1, text.index("}") + 1))
+    assert members == [("a", "{"), ("b", "}"), ("c", 3)]
+    assert parser.done
+
+
+def test_members_are_returned_as_soon_as_they_close():
+    parser = IncrementalJSONObject()
+    assert parser.feed('{"a": {"x": [1, 2') == []
+    assert parser.feed(']}, "b"') == [("a", {"x": [1, 2]})]
+    assert parser.feed(': "c"}') == [("b", "c")]
+
+
+def test_truncated_stream_keeps_the_completed_members():
+    parser, members = _feed(['{"a": 1, "b": "trun'])
+    assert members == [("a", 1)]
+    assert not parser.done
+
+
+def test_text_after_the_object_is_ignored():
+    parser, members = _feed(['{"a": 1}', ', "b": 2}'])
+    assert members == [("a", 1)]
+
+
+def test_streamed_answer_from_the_mock_server(monkeypatch):
+    from src.bench.mock_llm_server import start_mock_server
+    from src.extractors import llm_extractor
+    from src.extractors.llm_client import LLMClient
+
+    text = "CARTEIRA DE IDENTIDADE DE ADVOGADO\nNome JOANA D'ARC\nEndereço Av. Paulista, 2300"
+    server = start_mock_server(answers=[(text, ANSWER)], stream_chunk=1)
+    try:
+        monkeypatch.setattr(llm_extractor, "LLM_STREAM", True)
+        monkeypatch.setattr(llm_extractor, "_client", LLMClient(api_key="test", base_url=server.base_url, max_retries=0))
+        fields = {name: f"Campo {name}" for name in ANSWER}
+        streamed = []
+        results = llm_extractor.query_llm_fallback(fields, text, use_cache=False,
+                                                   on_field=lambda name, value: streamed.append((name, value)))
+    finally:
+        server.shutdown()
+
+    assert results == ANSWER
+    assert streamed == list(ANSWER.items())
@@ -0,0 +1,116 @@
+import openai
+import pytest
+from src.bench.mock_llm_server import start_mock_server
+from src.extractors import llm_client
+from src.extractors.llm_client import LLMClient, TokenBucket
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """Backoff delays of the client, recorded instead of slept."""
+    recorded = []
+    monkeypatch.setattr(llm_client.time, "sleep", recorded.append)
+    return recorded
+
+
+@pytest.fixture
+def server_factory():
+    servers = []
+
+    def start(**options):
+        servers.append(start_mock_server(**options))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def _client(server, **options):
+    return LLMClient(api_key="test", base_url=server.base_url, **options)
+
+
+def test_rate_limited_requests_are_retried_with_backoff(server_factory, delays):
+    server = server_factory(fail_first=2, fail_status=429)
+    assert _client(server, backoff_base=0.5).complete("mock", "prompt") == "{}"
+    assert server.stats["requests"] == 3
+    assert server.stats["failures"] == 2
+    # Exponential backoff with jitter: base * 2 ** attempt, scaled by 0.5..1
+    assert len(delays) == 2
+    assert 0.25 <= delays[0] <= 0.5
+    assert 0.5 <= delays[1] <= 1.0
+
+
+def test_retry_after_is_honored(server_factory, delays):
+    server = server_factory(fail_first=2, fail_status=503, retry_after=3)
+    assert _client(server).complete("mock", "prompt") == "{}"
+    assert delays == [3.0, 3.0]
+
+
+def test_retry_after_is_capped(server_factory, delays):
+    server = server_factory(fail_first=1, fail_status=429, retry_after=120)
+    assert _client(server, backoff_max=20).complete("mock", "prompt") == "{}"
+    assert delays == [20]
+
+
+def test_client_errors_are_not_retried(server_factory, delays):
+    server = server_factory(fail_first=1, fail_status=400)
+    with pytest.raises(openai.BadRequestError):
+        _client(server).complete("mock", "prompt")
+    assert server.stats["requests"] == 1
+    assert delays == []
+
+
+def test_retries_are_bounded(server_factory, delays):
+    server = server_factory(fail_first=10, fail_status=429)
+    with pytest.raises(openai.RateLimitError):
+        _client(server, max_retries=2).complete("mock", "prompt")
+    assert server.stats["requests"] == 3
+    assert len(delays) == 2
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.sleeps == pytest.approx([0.5] * 4)
+    assert clock.now == pytest.approx(102.0)
+
+
+def test_token_bucket_refills_while_idle():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=2, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 10
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == pytest.approx([1.0])
+
+
+def test_token_bucket_disabled():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=0, capacity=1, clock=clock, sleep=clock.sleep)
+    for _ in range(100):
+        bucket.acquire()
+    assert clock.sleeps == []
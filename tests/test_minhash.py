@@ -0,0 +1,71 @@
+from src.utils.minhash import (NearDuplicateIndex, SIGNATURE_SIZE, minhash_signature, reuse_verbatim_values,
+                               shingles, similarity)
+
+TEXT = " ".join(f"palavra{index} campo{index % 7}" for index in range(300))
+
+
+def _jaccard(first: str, second: str) -> float:
+    first, second = shingles(first), shingles(second)
+    return len(first & second) / len(first | second)
+
+
+def test_signature_estimates_jaccard_similarity():
+    edited = TEXT.replace("palavra5 ", "outra5 ").replace("palavra50 ", "outra50 ")
+    signature = minhash_signature(TEXT)
+    assert len(signature) == SIGNATURE_SIZE
+    assert similarity(signature, minhash_signature(TEXT)) == 1.0
+    assert abs(similarity(signature, minhash_signature(edited)) - _jaccard(TEXT, edited)) < 0.15
+    assert similarity(signature, minhash_signature("texto totalmente diferente de qualquer outro")) < 0.2
+
+
+def test_signature_of_short_and_empty_texts():
+    assert len(minhash_signature("dois tokens")) == SIGNATURE_SIZE
+    assert minhash_signature("  \n ") is None
+
+
+def test_index_returns_the_closest_document_of_the_label():
+    index = NearDuplicateIndex(threshold=0.8, max_entries=10)
+    signature = minhash_signature(TEXT)
+    index.add("oab", "a", signature, {"nome": "JOANA"})
+    index.add("oab", "b", minhash_signature("outro documento sem relação nenhuma com o primeiro"), {"nome": "X"})
+
+    assert index.query("oab", signature) == (1.0, {"nome": "JOANA"})
+    assert index.query("tela", signature) is None
+    assert index.query("oab", minhash_signature("texto totalmente diferente de qualquer outro")) is None
+
+
+def test_index_evicts_the_least_recently_used_document():
+    index = NearDuplicateIndex(threshold=0.8, max_entries=2)
+    signatures = {key: minhash_signature(f"{TEXT} {key}" * 2 if key == "a" else f"documento {key} " * 50 + key)
+                  for key in "abc"}
+    assert index.add("oab", "a", signatures["a"], {"k": "a"}) == 0
+    assert index.add("oab", "b", signatures["b"], {"k": "b"}) == 0
+    # Matching "a" makes "b" the least recently used
+    assert index.query("oab", signatures["a"])[1] == {"k": "a"}
+    assert index.add("oab", "c", signatures["c"], {"k": "c"}) == 1
+
+    assert len(index) == 2
+    assert index.query("oab", signatures["b"]) is None
+    assert index.query("oab", signatures["a"])[1] == {"k": "a"}
+    assert index.query("oab", signatures["c"])[1] == {"k": "c"}
+
+
+def test_reuse_requires_whole_tokens():
+    text = "Nome JOANA D'ARC\nSubseção CONSELHO SECCIONAL - PARANÁ\nCidade CURITIBANOS"
+    fields = {"nome": "", "subsecao": "", "cidade": "", "sobrenome": ""}
+    previous = {"nome": "JOANA D'ARC", "subsecao": "CONSELHO SECCIONAL - PARANÁ", "cidade": "CURITIBA",
+                "sobrenome": "ARC"}
+    reused, remaining = reuse_verbatim_values(fields, previous, text)
+    assert reused == {"nome": "JOANA D'ARC", "subsecao": "CONSELHO SECCIONAL - PARANÁ"}
+    assert set(remaining) == {"cidade", "sobrenome"}
+
+
+def test_reuse_skips_short_and_numeric_values():
+    text = "Seccional PR Inscrição 101943 Data 05/09/2025 Situação 2 Valor 0 Categoria SUPLEMENTAR"
+    fields = {"seccional": "", "inscricao": "", "data": "", "situacao": "", "valor": "", "categoria": "",
+              "flag": ""}
+    previous = {"seccional": "PR", "inscricao": "101943", "data": "05/09/2025", "situacao": 2, "valor": 0,
+                "categoria": "SUPLEMENTAR", "flag": True}
+    reused, remaining = reuse_verbatim_values(fields, previous, text)
+    assert reused == {"categoria": "SUPLEMENTAR"}
+    assert set(remaining) == set(fields) - {"categoria"}
@@ -0,0 +1,43 @@
+from src.utils.regex_library import _valid_cpf, _valid_cnpj, _valid_date, _valid_phone, find_matching_rule
+from src.utils.token_index import build_token_index
+
+
+def test_valid_cpf():
+    assert _valid_cpf("529.982.247-25")
+    assert _valid_cpf("52998224725")
+    assert not _valid_cpf("529.982.247-24")
+    assert not _valid_cpf("111.111.111-11")
+
+
+def test_valid_cnpj():
+    assert _valid_cnpj("11.222.333/0001-81")
+    assert _valid_cnpj("11222333000181")
+    assert not _valid_cnpj("11.222.333/0001-82")
+    assert not _valid_cnpj("00.000.000/0000-00")
+
+
+def test_valid_date():
+    assert _valid_date("29/02/2024")
+    assert _valid_date("05/09/2025")
+    assert not _valid_date("29/02/2023")
+    assert not _valid_date("31/04/2025")
+
+
+def test_valid_phone():
+    assert _valid_phone("(11)91234-5678")
+    assert _valid_phone("+5541988887777")
+    assert not _valid_phone("(10)91234-5678")
+    assert not _valid_phone("(20)3333-4444")
+
+
+def test_find_matching_rule_rejects_invalid_values():
+    assert find_matching_rule("529.982.247-25") == "CPF"
+    assert find_matching_rule("529.982.247-24") is None
+    assert find_matching_rule("31/02/2024") is None
+
+
+def test_build_token_index_drops_invalid_candidates():
+    text = "CPF 529.982.247-25 e 529.982.247-24\nDatas 31/02/2024 05/09/2025"
+    index = build_token_index(text)
+    assert [word for _, _, word in index["CPF"]] == ["529.982.247-25"]
+    assert [word for _, _, word in index["DATA_BR"]] == ["05/09/2025"]
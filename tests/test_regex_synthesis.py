@@ -0,0 +1,19 @@
+from src.utils.regex_synthesis import synthesize_pattern
+
+
+def _example(value, documents=1, competitors=()):
+    return {"value": value, "documents": documents, "competitors": [list(lengths) for lengths in competitors]}
+
+
+def test_distinct_values_are_generalized():
+    assert synthesize_pattern([_example("OAB-12345"), _example("OAB-123456")], 2) == "[A-ZÀ-ÖØ-Þ]{3}\\-[0-9]{5,6}"
+
+
+def test_single_value_becomes_a_literal_not_a_class():
+    assert synthesize_pattern([_example("SUPLEMENTAR", documents=1)], 2) is None
+    assert synthesize_pattern([_example("SUPLEMENTAR", documents=3)], 2) == "SUPLEMENTAR"
+
+
+def test_pattern_matching_a_competitor_is_rejected():
+    examples = [_example("OAB-12345", competitors=[(3, 1, 6)]), _example("OAB-123456")]
+    assert synthesize_pattern(examples, 2) is None
@@ -0,0 +1,110 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from src.database.db import DB_PATH, apply_rule_updates, connection, init_db
+from src.rules import PACK_FORMAT, PACK_VERSION, export_rule_pack, rule_updates_from_pack
+
+TOLERANCE = 0.03
+
+
+@pytest.fixture(autouse=True)
+def store():
+    init_db()
+
+
+def _apply(updates) -> int:
+    with connection() as conn:
+        return apply_rule_updates(conn, updates)
+
+
+def _export(label):
+    with connection() as conn:
+        # Through JSON, as the pack is written to and read from a file
+        return json.loads(json.dumps(export_rule_pack(conn, [label])))
+
+
+def _relabel(pack, label):
+    pack = json.loads(json.dumps(pack))
+    for rule in pack["rules"]:
+        rule["label"] = label
+    pack["labels"] = [label]
+    return pack
+
+
+def _learn(label):
+    example = {"value": "OAB-12345", "documents": 1, "competitors": [[3, 1, 4]]}
+    _apply([
+        ("regex", label, "cpf", "CPF"),
+        ("regex", label, "data", "DATA_BR"),
+        ("disambiguator", label, "data", "vencimento", 1),
+        ("regex", label, "valor", "VALOR"),
+        ("regex", label, "valor", "N4"),
+        ("layout", label, "nome", (0, 0.1, 0.2, 0.3, 0.25), 1, TOLERANCE),
+        ("layout", label, "nome", (0, 0.1, 0.2, 0.3, 0.25), 1, TOLERANCE),
+        ("example", label, "inscricao", example),
+        ("example", label, "inscricao", dict(example, value="OAB-123456")),
+        ("example", label, "inscricao", example),
+    ])
+
+
+def _rules(pack):
+    return sorted((json.dumps(rule, sort_keys=True) for rule in pack["rules"]))
+
+
+def test_export_import_round_trip_into_a_fresh_label():
+    _learn("pack_source")
+    pack = _export("pack_source")
+    assert {rule["kind"] for rule in pack["rules"]} == {"regex", "conflict", "disambiguator", "layout", "examples"}
+
+    _apply(rule_updates_from_pack(_relabel(pack, "pack_copy"), TOLERANCE))
+    assert _rules(_export("pack_copy")) == _rules(_relabel(pack, "pack_copy"))
+
+
+def test_importing_the_same_pack_twice_changes_nothing():
+    _learn("pack_twice")
+    pack = _relabel(_export("pack_twice"), "pack_twice_copy")
+    assert _apply(rule_updates_from_pack(pack, TOLERANCE)) > 0
+    exported = _export("pack_twice_copy")
+
+    assert _apply(rule_updates_from_pack(pack, TOLERANCE)) == 0
+    # Neither layout hits nor example documents are added up again
+    assert _rules(_export("pack_twice_copy")) == _rules(exported)
+
+
+def _pack(*rules):
+    return {"format": PACK_FORMAT, "version": PACK_VERSION, "rules": list(rules)}
+
+
+@pytest.mark.parametrize("rule", [
+    {"kind": "layout", "label": "l", "field": "f", "region": [0, 0.1, 0.2, 0.3], "lines": 1, "hits": 2,
+     "conflicting": False},
+    {"kind": "layout", "label": "l", "field": "f", "region": [0, 0.1, 0.2, 0.3, 0.4], "lines": 1, "hits": 2},
+    {"kind": "disambiguator", "label": "l", "field": "f", "anchor": "x", "ordinal": "1"},
+    {"kind": "regex", "label": "l", "field": "f"},
+    {"kind": "examples", "label": "l", "field": "f", "examples": [{"value": "x", "documents": 1}]},
+    {"kind": "unknown", "label": "l", "field": "f"},
+    {"kind": "conflict", "label": "l"},
+    "regex",
+])
+def test_malformed_rules_are_rejected(rule):
+    with pytest.raises(ValueError):
+        rule_updates_from_pack(_pack(rule), TOLERANCE)
+
+
+def test_unknown_regex_rules_are_skipped():
+    updates = rule_updates_from_pack(_pack({"kind": "regex", "label": "l", "field": "f", "rule": "NOPE"},
+                                           {"kind": "regex", "label": "l", "field": "g", "rule": "CPF"}), TOLERANCE)
+    assert updates == [("regex", "l", "g", "CPF")]
+
+
+def test_cli_reports_a_malformed_pack(tmp_path):
+    path = tmp_path / "pack.json"
+    path.write_text(json.dumps(_pack({"kind": "layout", "label": "l", "field": "f", "region": [0, 1],
+                                      "lines": 1, "hits": 1, "conflicting": False})))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-m", "src.rules", "import", str(path)], cwd=root,
+                            env=dict(os.environ, TEMPLATE_DB_PATH=DB_PATH), capture_output=True, text=True, timeout=60)
+    assert result.returncode == 1
+    assert "Invalid rule in pack" in result.stdout
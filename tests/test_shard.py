@@ -0,0 +1,98 @@
+import json
+import sqlite3
+import pytest
+from src.database.db import apply_rule_updates, connection, get_rule_snapshot, init_db, rule_updates_from_store
+from src.shard import copy_rule_store, merge_results, merge_rules
+from src.utils.dataset_io import iter_dataset, shard_of
+
+TOLERANCE = 0.03
+DATASET = [{"pdf_path": f"doc_{index}.pdf", "label": label, "extraction_schema": {"nome": ""}}
+           for index, label in enumerate(["oab", "tela", "oab", "tela", "cnh", "oab"])]
+
+
+@pytest.fixture(autouse=True)
+def store():
+    init_db()
+
+
+def _write(path, items):
+    with open(path, 'w', encoding='utf-8') as f:
+        for item in items:
+            f.write(json.dumps(item) + "\n")
+
+
+def _shard_outputs(tmp_path, count, by, failed=()):
+    """Output of each shard: its items, in dataset order, without the failed ones."""
+    paths = []
+    for index in range(count):
+        items = [{"pdf_path": item["pdf_path"], "label": item["label"], "extracted_data": {"nome": item["pdf_path"]}}
+                 for position, item in enumerate(DATASET)
+                 if shard_of(position, item, count, by) == index and item["pdf_path"] not in failed]
+        paths.append(str(tmp_path / f"shard-{index}.jsonl"))
+        _write(paths[-1], items)
+    return paths
+
+
+@pytest.mark.parametrize("by", ["index", "label"])
+def test_merge_results_keeps_the_dataset_order(tmp_path, by):
+    dataset = tmp_path / "dataset.jsonl"
+    _write(dataset, DATASET)
+    output = tmp_path / "merged.json"
+
+    assert merge_results(str(dataset), _shard_outputs(tmp_path, 2, by), by, str(output)) == len(DATASET)
+    merged = list(iter_dataset(str(output)))
+    assert [result["pdf_path"] for result in merged] == [item["pdf_path"] for item in DATASET]
+    assert all(result["extracted_data"]["nome"] == result["pdf_path"] for result in merged)
+
+
+def test_merge_results_skips_failed_items(tmp_path):
+    dataset = tmp_path / "dataset.jsonl"
+    _write(dataset, DATASET)
+    output = tmp_path / "merged.jsonl"
+    failed = {"doc_0.pdf", "doc_4.pdf"}
+    paths = _shard_outputs(tmp_path, 3, "index", failed)
+    # A shard that failed as a whole left no output (doc_2.pdf and doc_5.pdf)
+    paths[2] = str(tmp_path / "missing-shard.jsonl")
+
+    assert merge_results(str(dataset), paths, "index", str(output)) == 2
+    assert [result["pdf_path"] for result in iter_dataset(str(output))] == ["doc_1.pdf", "doc_3.pdf"]
+
+
+def _scratch_store(path, updates):
+    copy_rule_store(path)
+    with sqlite3.connect(path) as conn:
+        apply_rule_updates(conn, updates)
+    return path
+
+
+def _state(label):
+    with connection() as conn:
+        updates = [update for update in rule_updates_from_store(conn, TOLERANCE) if update[1] == label]
+        return updates, get_rule_snapshot(conn, label)["version"]
+
+
+def test_merge_rules_twice_is_idempotent(tmp_path):
+    region = (0, 0.1, 0.2, 0.3, 0.25)
+    first = _scratch_store(str(tmp_path / "rules-0.db"), [
+        ("regex", "shard_merge", "cpf", "CPF"),
+        ("regex", "shard_merge", "data", "DATA_BR"),
+        ("layout", "shard_merge", "nome", region, 1, TOLERANCE),
+        ("layout", "shard_merge", "nome", region, 1, TOLERANCE),
+    ])
+    second = _scratch_store(str(tmp_path / "rules-1.db"), [
+        ("regex", "shard_merge", "cpf", "CPF"),
+        ("regex", "shard_merge", "data", "CPF"),
+        ("layout", "shard_merge", "nome", region, 1, TOLERANCE),
+    ])
+
+    merge_rules([first, second])
+    updates, version = _state("shard_merge")
+    with connection() as conn:
+        snapshot = get_rule_snapshot(conn, "shard_merge")
+    assert snapshot["rules"] == {"cpf": "CPF"}
+    assert snapshot["conflicts"] == {"data"}
+    # Both shards saw the same two documents' worth of hits at most: the highest count is kept
+    assert snapshot["layouts"]["nome"]["hits"] == 2
+
+    merge_rules([first, second])
+    assert _state("shard_merge") == (updates, version)
@@ -0,0 +1,46 @@
+import fitz  # PyMuPDF
+from src.database.db import init_db, connection, apply_rule_updates
+from src.extractors.text_extractor import iter_pages_text, read_pages, apply_heuristic_rules
+
+SCHEMA = {"cpf": "CPF do titular"}
+
+
+def _pdf(*pages: str) -> bytes:
+    with fitz.open() as pdf:
+        for text in pages:
+            pdf.new_page().insert_text((72, 72), text)
+        return pdf.tobytes()
+
+
+def _learn(label: str, *updates) -> None:
+    init_db()
+    with connection() as conn:
+        apply_rule_updates(conn, [("regex", label, "cpf", "CPF"), *updates])
+
+
+def test_read_pages_reads_on_when_a_later_page_has_another_candidate():
+    _learn("two_pages")
+    data = _pdf("CPF 529.982.247-25", "CPF 111.444.777-35")
+
+    with connection() as conn:
+        text, complete, token_index = read_pages(iter_pages_text(data), SCHEMA, "two_pages", conn)
+        results, fields_for_llm = apply_heuristic_rules(SCHEMA, "two_pages", text, conn, token_index)
+
+    assert complete
+    assert "111.444.777-35" in text
+    # Ambiguous in the whole document, as without page-by-page reading
+    assert results == {}
+    assert fields_for_llm == SCHEMA
+
+
+def test_read_pages_stops_once_the_learned_position_is_read():
+    _learn("two_pages_ordinal", ("disambiguator", "two_pages_ordinal", "cpf", None, 0))
+    data = _pdf("CPF 529.982.247-25", "CPF 111.444.777-35")
+
+    with connection() as conn:
+        text, complete, token_index = read_pages(iter_pages_text(data), SCHEMA, "two_pages_ordinal", conn)
+        results, _ = apply_heuristic_rules(SCHEMA, "two_pages_ordinal", text, conn, token_index)
+
+    assert not complete
+    assert "111.444.777-35" not in text
+    assert results == {"cpf": "529.982.247-25"}
@@ -0,0 +1,33 @@
+import io
+import json
+import pytest
+from src import webapp
+
+SCHEMA = json.dumps({"nome": "Nome do profissional"})
+
+
+@pytest.fixture
+def client():
+    webapp.app.config['OFFLINE'] = True
+    yield webapp.app.test_client()
+    webapp.app.config.pop('OFFLINE')
+
+
+def _extract(client, data):
+    return client.post('/extract', content_type='multipart/form-data',
+                       data={"pdf": (io.BytesIO(data), "doc.pdf"), "label": "oab", "schema": SCHEMA})
+
+
+@pytest.mark.parametrize("data", [b"", b"not a pdf", b"%PDF-1.4 truncated"])
+def test_unreadable_pdf_is_rejected(client, data):
+    response = _extract(client, data)
+    assert response.status_code == 422
+    assert response.get_json()["error"].startswith("Invalid PDF")
+
+
+def test_other_errors_are_server_errors(client, monkeypatch):
+    def extract_document(*args, **kwargs):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(webapp, "extract_document", extract_document)
+    assert _extract(client, b"%PDF-1.4").status_code == 500